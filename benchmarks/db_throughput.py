@@ -0,0 +1,101 @@
+"""
+Inserts and lookups per second against the episode catalog, from several threads at once, as
+download workers and the list do it.
+
+"legacy" is the previous data access: a new sqlite3.connect() per call, the default rollback
+journal, and a commit per call. "layer" is database.Database: WAL, one writer connection whose
+queue commits concurrent writes together, and pooled read connections.
+Each insert is one episode row in its own call; each lookup reads one description by key.
+Run from the repository root:
+
+    python benchmarks/db_throughput.py --rows 5000 --threads 8
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from podcast_downloader import data_manager as db  # noqa: E402
+from podcast_downloader.database import Database  # noqa: E402
+
+INSERT = """
+    INSERT INTO episodes (podcast_id, episode_key, title, description, download_url, filename, added_at)
+    VALUES (1, ?, ?, ?, ?, ?, ?)
+"""
+LOOKUP = "SELECT description FROM episodes WHERE podcast_id = 1 AND episode_key = ?"
+
+
+def row(n):
+    return (f"urn:uuid:{n:032d}", f"Episode {n}", "Show notes " * 40,
+            f"https://cdn.example.com/{n}.mp3", f"{n}.mp3", time.time())
+
+
+class Legacy:
+    def __init__(self, path):
+        self.path = path
+        with sqlite3.connect(path) as conn:
+            conn.execute("PRAGMA journal_mode = DELETE")
+
+    def insert(self, n):
+        with sqlite3.connect(self.path) as conn:
+            conn.execute(INSERT, row(n))
+            conn.commit()
+
+    def lookup(self, n):
+        with sqlite3.connect(self.path) as conn:
+            return conn.execute(LOOKUP, (f"urn:uuid:{n:032d}",)).fetchone()
+
+
+class Layer:
+    def __init__(self, path):
+        self.database = Database(path)
+
+    def insert(self, n):
+        self.database.execute(INSERT, row(n))
+
+    def lookup(self, n):
+        with self.database.reader() as conn:
+            return conn.execute(LOOKUP, (f"urn:uuid:{n:032d}",)).fetchone()
+
+
+def in_threads(func, rows, threads):
+    """Calls func(n) for every n in range(rows), spread over `threads` threads. Returns calls per second."""
+    workers = [
+        threading.Thread(target=lambda offset=offset: [func(n) for n in range(offset, rows, threads)])
+        for offset in range(threads)
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return rows / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=3000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{args.rows} rows, {args.threads} threads")
+    with tempfile.TemporaryDirectory() as folder:
+        for label, make in (("legacy", Legacy), ("layer", Layer)):
+            db.DB_NAME = os.path.join(folder, f"{label}.db")
+            db.db_init()
+            db.database().close()
+            store = make(db.DB_NAME)
+            inserts = in_threads(store.insert, args.rows, args.threads)
+            lookups = in_threads(store.lookup, args.rows, args.threads)
+            print(f"{label:>8}: {inserts:9.0f} inserts/s  {lookups:9.0f} lookups/s")
+            if isinstance(store, Layer):
+                store.database.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Memory held per episode: the previous model (instance dict, its own threading.Event, a copy
+of every string and of the full description) against models.Episode, with its description in
+memory (unsaved feed) and released to the catalog (saved podcast).
+
+Feed fields are built as fresh strings per item, as they come out of the XML parser or SQLite.
+Run from the repository root:
+
+    python benchmarks/episode_memory.py --episodes 20000
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import threading
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from podcast_downloader.models import Episode  # noqa: E402
+
+
+class LegacyEpisode:
+    """The episode model before slots, interning and lazy descriptions."""
+    def __init__(self, ep_number, title, description, image_src, download_url, filename, download_dir,
+                 pub_date, link, duration, author, guid, podcast_id=None):
+        self.ep_number = ep_number
+        self.title = title
+        self.description = description
+        self.image_src = image_src
+        self.download_url = download_url
+        self.filename = filename
+        self.download_dir = download_dir
+        self.pub_date = pub_date
+        self.link = link
+        self.duration = duration
+        self.author = author
+        self.guid = guid
+        self.podcast_id = podcast_id
+
+        self.full_file_path = os.path.join(download_dir, filename)
+        self.status = "new"
+        self.progress = 0.0
+        self.bytes_done = 0
+        self.bytes_total = None
+        self.error = None
+        self.show_cancel = False
+        self.cancel_event = threading.Event()
+        self.view = None
+
+
+def fresh(text):
+    """A new string object with the same value, as each parsed item or database row has."""
+    return "".join(list(text))
+
+
+def make_mappings(count, description_size):
+    paragraph = "In this episode we talk about podcasts, feeds and the people who make them. "
+    description = (paragraph * (description_size // len(paragraph) + 1))[:description_size]
+    mappings = []
+    for n in range(count):
+        mappings.append({
+            "ep_number": n,
+            "title": f"Episode {n}: a title of a typical length",
+            "description": fresh(description),
+            "image_src": fresh("https://cdn.example.com/podcast/artwork/channel-3000x3000.jpg"),
+            "download_url": f"https://cdn.example.com/podcast/audio/episode-{n}.mp3",
+            "filename": f"episode-{n}.mp3",
+            "pub_date": f"Mon, {n % 28 + 1:02d} Jan 2024 10:00:00 +0000",
+            "link": f"https://example.com/episodes/{n}",
+            "duration": fresh("01:02:03"),
+            "author": fresh("The Example Podcast Network"),
+            "guid": f"urn:uuid:00000000-0000-0000-0000-{n:012d}",
+        })
+    return mappings
+
+
+def measure(build, count, description_size, download_dir):
+    gc.collect()
+    tracemalloc.start()
+    mappings = make_mappings(count, description_size)
+    episodes = [build(mapping, fresh(download_dir)) for mapping in mappings]
+    del mappings
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del episodes
+    return held / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--episodes", type=int, default=10000)
+    parser.add_argument("--description-size", type=int, default=3000, help="Characters per description.")
+    args = parser.parse_args()
+
+    def legacy(mapping, download_dir):
+        return LegacyEpisode(download_dir=download_dir, **mapping)
+
+    def kept(mapping, download_dir):
+        return Episode.from_mapping(mapping, download_dir)
+
+    def released(mapping, download_dir):
+        return Episode.from_mapping(mapping, download_dir, podcast_id=1, keep_description=False)
+
+    with tempfile.TemporaryDirectory() as download_dir:
+        print(f"{args.episodes} episodes, {args.description_size}-character descriptions")
+        for label, build in (("legacy", legacy), ("slots, description kept", kept), ("slots, from catalog", released)):
+            per_episode = measure(build, args.episodes, args.description_size, download_dir)
+            print(f"{label:>24}: {per_episode:8.0f} bytes per episode")
+
+
+if __name__ == "__main__":
+    main()
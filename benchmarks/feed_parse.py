@@ -0,0 +1,146 @@
+"""
+Parse-time benchmark of FeedStream on a large generated feed shaped like real shows: long HTML
+show notes in <description> and <content:encoded>, the usual iTunes tags, and a few items
+without an audio enclosure (trailers published as video).
+
+"legacy" is the previous item parser: a findtext()/find() per field for every item, and the
+description cleaned with an uncompiled regex right away. "lazy" is the current one; "lazy + clean"
+also reads every description, as storing a saved podcast in the catalog does.
+Run from the repository root:
+
+    python benchmarks/feed_parse.py --items 3000
+"""
+import argparse
+import contextlib
+import html
+import io
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from podcast_downloader.feed_parser import FeedStream, NAMESPACES, filename_from_url  # noqa: E402
+from podcast_downloader.utils import extract_episode_number  # noqa: E402
+
+SHOW_NOTES = (
+    "<p>This week we talk about <strong>feeds</strong>, <em>enclosures</em> &amp; the people "
+    "who publish them. Links: <a href=\"https://example.com/a?x=1&amp;y=2\">one</a>, "
+    "<a href=\"https://example.com/b\">two</a>.</p><ul><li>Chapter one &mdash; intro</li>"
+    "<li>Chapter two &ndash; the interview</li></ul>"
+)
+
+
+def legacy_clean_description(description_raw):
+    description_no_html = re.sub('<[^<]+?>', '', description_raw or '')
+    return html.unescape(description_no_html).strip()
+
+
+class LegacyFeedStream(FeedStream):
+    def _parse_item(self, item, position):
+        enclosure = item.find('enclosure')
+        enclosure_url = enclosure.get('url') if enclosure is not None else None
+        enclosure_type = enclosure.get('type', '') if enclosure is not None else ''
+        if enclosure is None or not enclosure_url or not enclosure_type.startswith('audio'):
+            return None
+
+        title = item.findtext('title', 'No Title') or 'No Title'
+
+        description_raw = item.findtext('description', None)
+        if description_raw is None:
+            description_raw = item.findtext('itunes:summary', None, NAMESPACES)
+        if description_raw is None:
+            description_raw = item.findtext('content:encoded', '', NAMESPACES)
+
+        duration_tag = item.find('itunes:duration', NAMESPACES)
+        author_tag = item.find('itunes:author', NAMESPACES)
+
+        image_src = self.channel["image"]
+        ep_image_tag = item.find('itunes:image', NAMESPACES)
+        if ep_image_tag is not None and ep_image_tag.get('href'):
+            image_src = ep_image_tag.get('href')
+
+        download_url = html.unescape(enclosure_url)
+
+        return {
+            "position": position,
+            "ep_number": extract_episode_number(title),
+            "title": title,
+            "description": legacy_clean_description(description_raw),
+            "image_src": image_src,
+            "download_url": download_url,
+            "filename": filename_from_url(download_url),
+            "pub_date": item.findtext('pubDate', 'N/A') or 'N/A',
+            "link": item.findtext('link', '') or '',
+            "guid": item.findtext('guid', '') or '',
+            "duration": duration_tag.text if duration_tag is not None else '',
+            "author": author_tag.text if author_tag is not None else '',
+        }
+
+
+def make_feed(items, notes_repeat):
+    notes = html.escape(SHOW_NOTES * notes_repeat)
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        f'<rss version="2.0" xmlns:itunes="{NAMESPACES["itunes"]}" xmlns:content="{NAMESPACES["content"]}">',
+        "<channel><title>Benchmark Show</title>",
+        '<itunes:image href="https://cdn.example.com/show.jpg"/>',
+    ]
+    for n in range(items, 0, -1):
+        media_type = "video/mp4" if n % 20 == 0 else "audio/mpeg"
+        parts.append(
+            f"<item><title>Episode {n}: a typical title</title>"
+            f"<description>{notes}</description>"
+            f"<content:encoded><![CDATA[{SHOW_NOTES * notes_repeat * 2}]]></content:encoded>"
+            f"<itunes:summary>{notes}</itunes:summary>"
+            f"<pubDate>Mon, 01 Jan 2024 10:00:00 +0000</pubDate>"
+            f"<link>https://example.com/episodes/{n}</link>"
+            f"<guid isPermaLink=\"false\">urn:uuid:{n:032d}</guid>"
+            f"<itunes:duration>01:02:03</itunes:duration>"
+            f"<itunes:author>The Benchmark Network</itunes:author>"
+            f"<itunes:explicit>false</itunes:explicit>"
+            f"<itunes:episode>{n}</itunes:episode>"
+            f"<enclosure url=\"https://cdn.example.com/audio/episode-{n}.mp3?source=rss&amp;x=1\" "
+            f"length=\"52428800\" type=\"{media_type}\"/>"
+            f"</item>"
+        )
+    parts.append("</channel></rss>")
+    return "".join(parts).encode("utf-8")
+
+
+def parse(stream_class, body, clean):
+    # FeedStream logs every skipped item; keep that out of the timing and the output.
+    with contextlib.redirect_stdout(io.StringIO()):
+        episodes = list(stream_class(io.BytesIO(body)))
+    if clean:
+        for episode in episodes:
+            str(episode["description"])
+    return len(episodes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--notes-repeat", type=int, default=8, help="Show-notes paragraphs per description.")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    body = make_feed(args.items, args.notes_repeat)
+    print(f"{args.items} items, {len(body) / 1024 ** 2:.1f} MB feed, best of {args.rounds}")
+    for label, stream_class, clean in (
+        ("legacy", LegacyFeedStream, False),
+        ("lazy", FeedStream, False),
+        ("lazy + clean", FeedStream, True),
+    ):
+        best = None
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            count = parse(stream_class, body, clean)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{label:>14}: {best * 1000:8.1f} ms  ({count} episodes, {best / args.items * 1e6:6.1f} us/item)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Startup-time budget check.
+
+core:  a fresh interpreter imports podcast_downloader.core and resolves the feed, catalog
+       and download entry points. It must stay under CORE_BUDGET_MS and must not load
+       Flet, requests, Pillow, watchdog or multiprocessing on the way.
+gui:   main.py is started with PODCAST_DOWNLOADER_STARTUP_TIMING=exit and reports how long
+       its imports and the first paint (page.add of the full layout) took, measured from the
+       top of main.py; the window closes itself afterwards. Needs a desktop session.
+
+Run from the repository root; exits with 1 when a budget is exceeded:
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --gui --importtime
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CORE_BUDGET_MS = 150
+GUI_IMPORTS_BUDGET_MS = 600
+GUI_FIRST_PAINT_BUDGET_MS = 2500
+
+HEAVY_MODULES = ("flet", "requests", "PIL", "watchdog", "multiprocessing")
+
+CORE_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+from podcast_downloader import core
+core.load_feed, core.db_init, core.Episode, core.download_episode, core.QueueRunner
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "import_ms": elapsed * 1000,
+    "heavy": [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+
+def run_core(rounds):
+    best = None
+    for _ in range(rounds):
+        spawned = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", CORE_PROBE], cwd=ROOT, check=True,
+                                capture_output=True, text=True).stdout
+        total_ms = (time.perf_counter() - spawned) * 1000
+        result = json.loads(output)
+        result["process_ms"] = total_ms
+        if best is None or result["import_ms"] < best["import_ms"]:
+            best = result
+    return best
+
+
+def top_imports(count):
+    """The slowest modules (cumulative microseconds) from python -X importtime."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", CORE_PROBE], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def run_gui(timeout):
+    env = dict(os.environ, PODCAST_DOWNLOADER_STARTUP_TIMING="exit")
+    process = subprocess.run([sys.executable, "main.py"], cwd=ROOT, env=env, timeout=timeout,
+                             capture_output=True, text=True)
+    for line in process.stderr.splitlines():
+        if line.startswith("{"):
+            event = json.loads(line)
+            if event.get("event") == "startup":
+                return event
+    raise RuntimeError(f"main.py reported no startup timing:\n{process.stderr[-2000:]}")
+
+
+def check(label, value, budget):
+    ok = value <= budget
+    print(f"{label:>22}: {value:8.1f} ms  (budget {budget} ms) {'ok' if ok else 'OVER BUDGET'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--gui", action="store_true", help="Also measure the GUI's imports and first paint.")
+    parser.add_argument("--importtime", action="store_true", help="List the slowest core imports.")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    ok = True
+    core = run_core(args.rounds)
+    print(f"core, best of {args.rounds} (whole process {core['process_ms']:.1f} ms)")
+    ok &= check("core import", core["import_ms"], CORE_BUDGET_MS)
+    if core["heavy"]:
+        print(f"{'':>22}  loaded {', '.join(core['heavy'])}: the core must import these lazily")
+        ok = False
+
+    if args.importtime:
+        for cumulative, name in top_imports(10):
+            print(f"{'':>22}  {cumulative / 1000:8.1f} ms  {name}")
+
+    if args.gui:
+        gui = run_gui(args.timeout)
+        print("gui")
+        ok &= check("imports", gui["imports_ms"], GUI_IMPORTS_BUDGET_MS)
+        ok &= check("first paint", gui["first_paint_ms"], GUI_FIRST_PAINT_BUDGET_MS)
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Benchmark of the download write path: the old 8 KiB read-and-allocate loop against
+stream_io.iter_chunks (adaptive chunk size, one reused buffer) with preallocation.
+
+A local `python -m http.server` in a separate process serves a generated file, so the
+CPU time measured here is the client's only. Run from the repository root:
+
+    python benchmarks/write_path.py --size-mb 512
+"""
+import argparse
+import hashlib
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from podcast_downloader.stream_io import AdaptiveChunkSize, iter_chunks, preallocate  # noqa: E402
+
+LEGACY_CHUNK_SIZE = 8192
+
+
+def legacy_copy(response, f, hasher):
+    while True:
+        chunk = response.read(LEGACY_CHUNK_SIZE)
+        if not chunk:
+            break
+        f.write(chunk)
+        if hasher:
+            hasher.update(chunk)
+
+
+def tuned_copy(response, f, hasher):
+    length = int(response.getheader("Content-Length", 0))
+    preallocate(f, 0, length)
+    for chunk in iter_chunks(response, AdaptiveChunkSize()):
+        f.write(chunk)
+        if hasher:
+            hasher.update(chunk)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_server(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("HTTP server did not start")
+
+
+def run_once(copy, port, name, target, use_hash):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("GET", f"/{name}")
+    response = conn.getresponse()
+    hasher = hashlib.sha256() if use_hash else None
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    with open(target, "wb") as f:
+        copy(response, f, hasher)
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+    conn.close()
+    size = os.path.getsize(target)
+    os.remove(target)
+    return size, wall, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--hash", action="store_true", help="Include SHA-256 hashing, as real downloads do.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as serve_dir, tempfile.TemporaryDirectory() as out_dir:
+        name = "episode.bin"
+        with open(os.path.join(serve_dir, name), "wb") as f:
+            block = os.urandom(1024 * 1024)
+            for _ in range(args.size_mb):
+                f.write(block)
+
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "http.server", str(port), "--bind", "127.0.0.1", "--directory", serve_dir],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_for_server(port)
+            print(f"{args.size_mb} MB, best of {args.rounds}, hashing {'on' if args.hash else 'off'}")
+            for label, copy in (("legacy 8 KiB", legacy_copy), ("tuned", tuned_copy)):
+                best = None
+                for _ in range(args.rounds):
+                    size, wall, cpu = run_once(copy, port, name, os.path.join(out_dir, "out.bin"), args.hash)
+                    if best is None or wall < best[1]:
+                        best = (size, wall, cpu)
+                size, wall, cpu = best
+                gigabytes = size / 1024 ** 3
+                print(f"{label:>14}: {size / 1024 ** 2 / wall:8.1f} MB/s  {cpu / gigabytes:6.2f} CPU s/GB")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,38 @@
+import time
+STARTED = time.perf_counter()
+
+import json
+import os
+import sys
+
 import flet as ft
 import threading
 
 from podcast_downloader import data_manager as db
 from podcast_downloader import app as logic
-from podcast_downloader.ui_components import EpisodeControl
+from podcast_downloader.ui_components import VirtualEpisodeList
 from podcast_downloader import utils
+from podcast_downloader.download_manager import DEFAULT_MAX_WORKERS, WORKER_CHOICES
+from podcast_downloader.render_scheduler import RenderScheduler
+from podcast_downloader.artwork_cache import ArtworkCache
+from podcast_downloader import bandwidth
+from podcast_downloader import episode_index
+
+IMPORTED = time.perf_counter()
+# Set to print startup timings to stderr; "exit" also closes the window after the first paint.
+STARTUP_TIMING_ENV = "PODCAST_DOWNLOADER_STARTUP_TIMING"
+
+def report_startup(page: ft.Page):
+    mode = os.environ.get(STARTUP_TIMING_ENV)
+    if not mode:
+        return
+    print(json.dumps({
+        "event": "startup",
+        "imports_ms": round((IMPORTED - STARTED) * 1000, 1),
+        "first_paint_ms": round((time.perf_counter() - STARTED) * 1000, 1),
+    }), file=sys.stderr, flush=True)
+    if mode == "exit":
+        page.window.destroy()
 
 def main(page: ft.Page):
     page.title = "Podcast Downloader"
@@ -12,17 +40,26 @@ def main(page: ft.Page):
     page.padding = 10
 
     db.db_init()
+    bandwidth.load_settings()
 
     logic.ui_refs = {
         "page": page,
     }
 
+    render_scheduler = RenderScheduler(page)
+    render_scheduler.start()
+    logic.ui_refs["render_scheduler"] = render_scheduler
+    logic.ui_refs["artwork_cache"] = ArtworkCache()
+
     snack_bar = ft.SnackBar(content=ft.Text(""), bgcolor="green")
     page.snack_bar = snack_bar
     logic.ui_refs["snack_bar"] = snack_bar
 
     file_picker = ft.FilePicker(on_result=lambda e: on_dialog_result(e))
     page.overlay.append(file_picker)
+    opml_picker = ft.FilePicker(on_result=logic.opml_picker_result)
+    page.overlay.append(opml_picker)
+    logic.ui_refs["opml_picker"] = opml_picker
     def on_dialog_result(e: ft.FilePickerResultEvent):
         if e.path:
             txt_download_dir.value = e.path
@@ -78,19 +115,63 @@ def main(page: ft.Page):
     )
     logic.ui_refs["btn_clear_form"] = btn_clear_form
 
+    chk_auto_download = ft.Checkbox(
+        label="Download new episodes automatically", value=False, disabled=True,
+        on_change=logic.auto_download_changed,
+        tooltip="Saved podcasts are refreshed in the background; new episodes of this one are downloaded right away"
+    )
+    logic.ui_refs["chk_auto_download"] = chk_auto_download
+
+    btn_import_opml = ft.ElevatedButton(
+        "Import OPML", icon=ft.Icons.UPLOAD_FILE, on_click=logic.import_opml_clicked,
+        expand=1, tooltip="Save the podcasts of an OPML file, each in a folder under 'Save to'"
+    )
+
+    btn_export_opml = ft.ElevatedButton(
+        "Export OPML", icon=ft.Icons.SAVE_ALT, on_click=logic.export_opml_clicked,
+        expand=1, tooltip="Write the saved podcasts to an OPML file (credentials are left out)"
+    )
+
+    btn_refresh_all = ft.ElevatedButton(
+        "Refresh all", icon=ft.Icons.SYNC, on_click=logic.refresh_all_clicked,
+        expand=1, tooltip="Check every saved podcast for new episodes"
+    )
+    logic.ui_refs["btn_refresh_all"] = btn_refresh_all
+
+    btn_verify_library = ft.ElevatedButton(
+        "Verify files", icon=ft.Icons.VERIFIED, on_click=logic.verify_library_clicked,
+        tooltip="Check downloaded episodes of saved podcasts against their recorded size and checksum"
+    )
+    logic.ui_refs["btn_verify_library"] = btn_verify_library
+
     dd_sort = ft.Dropdown(
         label="Order by",
-        options=[
-            ft.dropdown.Option(key="DESC", text="Newest (Desc)"),
-            ft.dropdown.Option(key="ASC", text="Oldest (Asc)"),
-        ],
-        value="DESC",
+        options=[ft.dropdown.Option(key=key, text=label) for key, label in episode_index.SORT_CHOICES],
+        value=episode_index.DEFAULT_SORT,
         on_change=logic.sort_list_changed,
         width=240,
         disabled=True
     )
     logic.ui_refs["dd_sort"] = dd_sort
 
+    dd_age = ft.Dropdown(
+        label="Published",
+        options=[ft.dropdown.Option(key=key, text=label) for key, label, _ in episode_index.AGE_CHOICES],
+        value="any",
+        on_change=logic.on_search,
+        width=160
+    )
+    logic.ui_refs["dd_age"] = dd_age
+
+    dd_length = ft.Dropdown(
+        label="Length",
+        options=[ft.dropdown.Option(key=key, text=label) for key, label, _ in episode_index.LENGTH_CHOICES],
+        value="any",
+        on_change=logic.on_search,
+        width=160
+    )
+    logic.ui_refs["dd_length"] = dd_length
+
     btn_fetch_feed = ft.ElevatedButton(
         "Load episodes", icon=ft.Icons.REFRESH, on_click=logic.fetch_feed_clicked,
         expand=1
@@ -109,12 +190,36 @@ def main(page: ft.Page):
     )
     logic.ui_refs["btn_cancel_download"] = btn_cancel_download
 
+    dd_workers = ft.Dropdown(
+        label="Parallel downloads",
+        options=[ft.dropdown.Option(key=str(n), text=str(n)) for n in WORKER_CHOICES],
+        value=str(DEFAULT_MAX_WORKERS),
+        width=180,
+        tooltip="How many episodes are downloaded at the same time"
+    )
+    logic.ui_refs["dd_workers"] = dd_workers
+
+    saved_rate = bandwidth.limiter.rate or 0
+    rate_choices = sorted(set(bandwidth.RATE_CHOICES) | {saved_rate})
+    dd_speed = ft.Dropdown(
+        label="Speed limit",
+        options=[ft.dropdown.Option(key=str(rate), text=bandwidth.format_rate(rate)) for rate in rate_choices],
+        value=str(saved_rate),
+        width=160,
+        on_change=logic.speed_limit_changed,
+        tooltip="Total download speed, applied immediately (single-episode downloads go first)"
+    )
+    logic.ui_refs["dd_speed"] = dd_speed
+
     prog_bar_total = ft.ProgressBar(value=0, height=10)
     logic.ui_refs["prog_bar_total"] = prog_bar_total
 
+    txt_host_status = ft.Text("", size=12, color=ft.Colors.ORANGE, visible=False)
+    logic.ui_refs["txt_host_status"] = txt_host_status
+
     txt_search = ft.TextField(
         label="Search by title or description...",
-        on_change=logic.on_search,
+        on_change=logic.on_search_changed,
         expand=True,
         prefix_icon=ft.Icons.SEARCH,
     )
@@ -126,6 +231,7 @@ def main(page: ft.Page):
         spacing=0,
     )
     logic.ui_refs["lv_episodes"] = lv_episodes
+    logic.ui_refs["episode_list"] = VirtualEpisodeList(lv_episodes, logic)
 
     sidebar_title = ft.Text("", weight="bold", size=16, expand=True, no_wrap=True, overflow=ft.TextOverflow.ELLIPSIS)
     sidebar_image = ft.Image(src="", height=200, fit=ft.ImageFit.CONTAIN, border_radius=5)
@@ -194,18 +300,24 @@ def main(page: ft.Page):
                 ft.Row([txt_username, txt_password]),
                 ft.Row([txt_download_dir, btn_browse]),
                 ft.Row([btn_save_podcast, btn_delete_podcast, btn_clear_form]),
+                ft.Row([chk_auto_download]),
+                ft.Row([btn_import_opml, btn_export_opml, btn_refresh_all]),
                 ft.Divider(height=15, thickness=2),
                 ft.Row([
                     btn_fetch_feed,
-                    dd_sort
+                    dd_sort,
+                    btn_verify_library
                 ]),
                 ft.Row(
                     [
-                        ft.Stack([btn_start_download, btn_cancel_download])
+                        ft.Stack([btn_start_download, btn_cancel_download], expand=True),
+                        dd_workers,
+                        dd_speed
                     ]
                 ),
-                ft.Row([txt_search]),
+                ft.Row([txt_search, dd_age, dd_length]),
                 prog_bar_total,
+                txt_host_status,
                 lv_episodes,
             ],
             expand=True,
@@ -221,6 +333,10 @@ def main(page: ft.Page):
             expand=True
         )
     )
+    report_startup(page)
+    logic.resume_interrupted_downloads()
+    logic.watch_download_hosts()
+    logic.start_feed_poller()
 
 if __name__ == "__main__":
     ft.app(target=main)
\ No newline at end of file
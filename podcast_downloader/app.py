@@ -1,24 +1,40 @@
 import flet as ft
 import threading
 import xml.etree.ElementTree as ET
-import requests
-import html
-import os
-import urllib.parse
-from time import sleep
-import re
+from time import sleep, monotonic, localtime, strftime
 import sqlite3
 
 from . import data_manager as db
-from .ui_components import EpisodeControl
-from .utils import HEADERS, extract_episode_number
-
+from . import feed_manager
+from .models import Episode, load_descriptions, STATUS_NEW, STATUS_QUEUED
+from .download_manager import DEFAULT_MAX_WORKERS, DEFAULT_PER_HOST_LIMIT
+from .artwork_cache import SIZE_THUMB, SIZE_MEDIUM
+from . import bandwidth
+from .dir_index import downloaded_files
+from . import library
+from . import job_queue
+from . import opml
+from . import poller
+from . import retry
+from .episode_index import EpisodeIndex, AGE_CHOICES, LENGTH_CHOICES
+
+RENDER_BATCH_SIZE = 50
+RENDER_BATCH_INTERVAL = 0.3
+SEARCH_DEBOUNCE_SECONDS = 0.15
 
 ui_refs = {}
-all_episode_controls_master = []
+all_episodes_master = []
+# Every sort order of the loaded list; all_episodes_master is the one currently selected.
+loaded_index = None
+loaded_feed_key = None
+search_timer = None
 global_cancel_event = threading.Event()
+# True while run_all_downloads_thread works through the queue; guarded by batch_lock.
+batch_running = False
+batch_lock = threading.Lock()
 
-def update_sidebar(episode_control=None):
+def update_sidebar(episode=None, description=None):
+    """Shows `episode` in the sidebar (hides it for None); `description` saves reading it again when the caller has it."""
     sidebar = ui_refs.get("sidebar_column")
     title_text = ui_refs.get("sidebar_title")
     image_display = ui_refs.get("sidebar_image")
@@ -32,23 +48,56 @@ def update_sidebar(episode_control=None):
        not pub_date_text or not duration_text or not author_text or not link_text:
         return
 
-    if episode_control is None:
+    if episode is None:
         sidebar.visible = False
     else:
-        title_text.value = episode_control.title
-        image_display.src = episode_control.image_src
-        pub_date_text.value = f"{episode_control.pub_date}" if episode_control.pub_date else "N/A"
-        duration_text.value = f"{episode_control.duration}" if episode_control.duration else "N/A"
-        author_text.value = f"{episode_control.author}" if episode_control.author else "N/A"
-        link_text.value = f"{episode_control.link}" if episode_control.link else "N/A"
-        link_text.visible = bool(episode_control.link)
-        link_text.parent.visible = bool(episode_control.link)
+        title_text.value = episode.title
+        image_display.src = artwork_src(episode.image_src, SIZE_MEDIUM)
+        pub_date_text.value = f"{episode.pub_date}" if episode.pub_date else "N/A"
+        duration_text.value = f"{episode.duration}" if episode.duration else "N/A"
+        author_text.value = f"{episode.author}" if episode.author else "N/A"
+        link_text.value = f"{episode.link}" if episode.link else "N/A"
+        link_text.visible = bool(episode.link)
+        link_text.parent.visible = bool(episode.link)
         
-        description_text.value = episode_control.description
+        description_text.value = episode.description if description is None else description
         sidebar.visible = True
 
     sidebar.update()
 
+def artwork_src(url, size=SIZE_THUMB):
+    """
+    Local path of the cached artwork in the requested size. Until it is cached, the remote URL
+    is returned and a background fetch is queued; the list and sidebar switch over once it lands.
+    """
+    artwork_cache = ui_refs.get("artwork_cache")
+    if artwork_cache is None or not url:
+        return url
+    path = artwork_cache.get(url, size)
+    if path is not None:
+        return path
+    artwork_cache.request(url, on_artwork_ready)
+    return url
+
+def on_artwork_ready(url):
+    ui_refs["episode_list"].refresh_artwork(url)
+    image_display = ui_refs.get("sidebar_image")
+    if image_display is not None and image_display.src == url:
+        image_display.src = artwork_src(url, SIZE_MEDIUM)
+        schedule_render(image_display)
+
+def schedule_render(*controls):
+    """Queues controls for the next coalesced UI update, or updates them now if no scheduler runs."""
+    render_scheduler = ui_refs.get("render_scheduler")
+    if render_scheduler is not None:
+        render_scheduler.mark_dirty(*controls)
+        return
+    for control in controls:
+        try:
+            control.update()
+        except Exception:
+            pass
+
 def close_sidebar(e):
     update_sidebar(None)
 
@@ -59,8 +108,9 @@ def show_snackbar(message, color="green"):
     ui_refs["page"].update()
 
 def clear_form():
-    global all_episode_controls_master
-    all_episode_controls_master = []
+    global all_episodes_master
+    all_episodes_master = []
+    ui_refs["episode_list"].clear()
 
     ui_refs["dd_podcasts"].value = None
     ui_refs["txt_podcast_name"].value = ""
@@ -72,6 +122,8 @@ def clear_form():
 
     ui_refs["lv_episodes"].controls = [ft.Text("Select or fill in a podcast configuration.", color="grey")]
     ui_refs["btn_delete_podcast"].disabled = True
+    ui_refs["chk_auto_download"].value = False
+    ui_refs["chk_auto_download"].disabled = True
     ui_refs["btn_start_download"].disabled = True
     ui_refs["dd_sort"].disabled = True
     ui_refs["prog_bar_total"].value = 0
@@ -113,18 +165,59 @@ def on_podcast_selected(e):
             ui_refs["txt_password"].value = details["password"] if details["password"] else ""
 
             ui_refs["btn_delete_podcast"].disabled = False
-            global all_episode_controls_master
-            all_episode_controls_master = []
+            ui_refs["chk_auto_download"].value = bool(details["auto_download"])
+            ui_refs["chk_auto_download"].disabled = False
+            global all_episodes_master, loaded_feed_key
+            all_episodes_master = []
+            loaded_feed_key = None
+            ui_refs["episode_list"].clear()
             ui_refs["lv_episodes"].controls = [ft.Text("Click 'Load episodes' to fetch.", color="grey")]
             ui_refs["btn_start_download"].disabled = True
             ui_refs["dd_sort"].disabled = True
             ui_refs["prog_bar_total"].value = 0
             update_sidebar(None)
 
+            # Show the cataloged episodes right away; 'Load episodes' revalidates the feed.
+            if db.db_has_cached_episodes(details["id"], details["feed_url"]):
+                ui_refs["btn_fetch_feed"].disabled = True
+                ui_refs["page"].run_thread(
+                    parse_feed_thread,
+                    None,
+                    details["download_dir"],
+                    ui_refs["dd_sort"].value,
+                    details["feed_url"],
+                    True,
+                    details["id"]
+                )
+
     except Exception as e:
         show_snackbar(f"Error loading details: {e}", "red")
     ui_refs["page"].update()
 
+def selected_podcast_id():
+    """ID of the saved podcast in the dropdown, or None when the form is not a saved podcast."""
+    try:
+        return int(ui_refs["dd_podcasts"].value)
+    except (TypeError, ValueError):
+        return None
+
+def podcast_id_for_feed(feed_url):
+    """
+    ID of the selected podcast if `feed_url` is its saved feed. A different URL typed into the
+    form is loaded without a podcast, so its episodes are not stored in that podcast's catalog.
+    """
+    podcast_id = selected_podcast_id()
+    if podcast_id is None:
+        return None
+    try:
+        details = db.db_get_podcast_details(podcast_id)
+    except Exception as e:
+        print(f"Error reading podcast {podcast_id}: {e}")
+        return None
+    if details is None or details["feed_url"].strip() != feed_url:
+        return None
+    return podcast_id
+
 def save_podcast_clicked(e):
     name = ui_refs["txt_podcast_name"].value.strip()
     url = ui_refs["txt_rss_url"].value.strip()
@@ -152,6 +245,9 @@ def save_podcast_clicked(e):
              ui_refs["dd_podcasts"].value = new_key
 
         ui_refs["btn_delete_podcast"].disabled = (new_key is None)
+        ui_refs["chk_auto_download"].disabled = (new_key is None)
+        if new_key is not None:
+            db.db_set_auto_download(new_key, ui_refs["chk_auto_download"].value)
 
     except sqlite3.IntegrityError:
          show_snackbar(f"Error: Podcast name '{name}' already exists.", "red")
@@ -176,6 +272,130 @@ def delete_podcast_clicked(e):
     ui_refs["page"].update()
 
 
+def auto_download_changed(e):
+    podcast_id = selected_podcast_id()
+    if podcast_id is None:
+        return
+    try:
+        db.db_set_auto_download(podcast_id, e.control.value)
+        if e.control.value:
+            show_snackbar("New episodes of this podcast will be downloaded as soon as they are found.", "blue")
+    except Exception as ex:
+        show_snackbar(f"Error saving setting: {ex}", "red")
+
+def watch_download_hosts():
+    """Called at startup: shows which hosts the circuit breaker has paused."""
+    retry.breaker.add_listener(on_breaker_changed)
+
+def on_breaker_changed(host, state, reopens_at):
+    """Runs on a download thread whenever a host is paused, probed or healthy again."""
+    if state == retry.BREAKER_OPEN:
+        show_snackbar(f"{host} keeps failing; its downloads are paused until {strftime('%H:%M:%S', localtime(reopens_at))}.", "orange")
+    elif state == retry.BREAKER_CLOSED:
+        show_snackbar(f"{host} is answering again; its downloads continue.", "blue")
+
+    paused = [
+        f"{paused_host} (until {strftime('%H:%M:%S', localtime(until))})" if until else f"{paused_host} (trying again)"
+        for paused_host, (_, until, _) in sorted(retry.breaker.snapshot().items())
+    ]
+    txt_host_status = ui_refs["txt_host_status"]
+    txt_host_status.value = f"Paused hosts: {', '.join(paused)}" if paused else ""
+    txt_host_status.visible = bool(paused)
+    schedule_render(txt_host_status)
+
+def start_feed_poller():
+    """Called at startup: keeps the saved podcasts refreshed in the background, each at its own pace."""
+    feed_poller = poller.FeedPoller(on_new_episodes=on_new_episodes_found)
+    ui_refs["feed_poller"] = feed_poller
+    feed_poller.start()
+
+def on_new_episodes_found(podcast, episodes):
+    """Runs on the poller thread once new episodes of an auto-download podcast are queued."""
+    global batch_running
+    show_snackbar(f"{len(episodes)} new episode(s) of '{podcast['name']}' queued for download.", "blue")
+    with batch_lock:
+        if batch_running:
+            # The running batch picks up jobs queued while it works.
+            return
+        batch_running = True
+    global_cancel_event.clear()
+    set_batch_controls(True)
+    ui_refs["page"].update()
+    ui_refs["page"].run_thread(run_all_downloads_thread, [])
+
+def import_opml_clicked(e):
+    if not ui_refs["txt_download_dir"].value.strip():
+        show_snackbar("Choose a 'Save to' folder first: each imported podcast gets its own folder inside it.", "red")
+        return
+    ui_refs["opml_picker"].pick_files(dialog_title="Import OPML", allowed_extensions=["opml", "xml"])
+
+def export_opml_clicked(e):
+    ui_refs["opml_picker"].save_file(dialog_title="Export OPML", file_name="podcasts.opml", allowed_extensions=["opml"])
+
+def opml_picker_result(e):
+    """Result of the OPML file dialog: a picked file is imported, a save path is exported to."""
+    try:
+        if e.files:
+            added, skipped = opml.import_opml(e.files[0].path, ui_refs["txt_download_dir"].value.strip())
+            load_saved_podcasts()
+            show_snackbar(f"Imported {added} podcast(s); {skipped} already saved or duplicated.")
+        elif e.path:
+            path = e.path if e.path.lower().endswith(".opml") else e.path + ".opml"
+            show_snackbar(f"Exported {opml.export_opml(path)} podcast(s) to {path}.")
+    except Exception as ex:
+        print(f"Error with OPML file: {ex}")
+        show_snackbar(f"OPML error: {ex}", "red")
+
+def refresh_all_clicked(e):
+    global all_episodes_master, loaded_feed_key
+    podcasts = db.db_get_all_podcast_details()
+    if not podcasts:
+        show_snackbar("No saved podcasts to refresh.", "blue")
+        return
+
+    # The list area shows the per-feed report while the feeds are refreshed.
+    all_episodes_master = []
+    loaded_feed_key = None
+    ui_refs["episode_list"].clear()
+    ui_refs["lv_episodes"].controls = [ft.Text(f"Refreshing {len(podcasts)} podcasts...", weight="bold")]
+    ui_refs["btn_refresh_all"].disabled = True
+    ui_refs["btn_start_download"].disabled = True
+    ui_refs["dd_sort"].disabled = True
+    update_sidebar(None)
+    ui_refs["page"].update()
+    ui_refs["page"].run_thread(run_refresh_all, podcasts)
+
+def format_outcome(outcome):
+    name = outcome.podcast["name"]
+    if outcome.error is not None:
+        return f"{name}: failed after {outcome.elapsed:.1f} s ({outcome.error})"
+    result = outcome.result
+    if result.status == feed_manager.STATUS_NOT_MODIFIED:
+        return f"{name}: unchanged ({outcome.elapsed:.1f} s)"
+    return f"{name}: {len(result.episodes or [])} episodes, {result.changed} new or updated ({outcome.elapsed:.1f} s)"
+
+def run_refresh_all(podcasts):
+    lines = ui_refs["lv_episodes"].controls
+
+    def on_outcome(outcome):
+        lines.append(ft.Text(format_outcome(outcome), color="red" if outcome.error is not None else None, selectable=True))
+        schedule_render(ui_refs["lv_episodes"])
+
+    started = monotonic()
+    try:
+        outcomes = feed_manager.refresh_all(podcasts, on_outcome=on_outcome)
+        failed = sum(1 for outcome in outcomes if outcome.error is not None)
+        changed = sum(outcome.result.changed for outcome in outcomes if outcome.result is not None)
+        summary = f"Refreshed {len(outcomes) - failed} of {len(outcomes)} podcasts in {monotonic() - started:.1f} s, {changed} new or updated episodes."
+        lines[0] = ft.Text(summary, weight="bold")
+        show_snackbar(summary, "orange" if failed else "green")
+    except Exception as e:
+        print(f"Error refreshing podcasts: {e}")
+        show_snackbar(f"Error refreshing podcasts: {e}", "red")
+    finally:
+        ui_refs["btn_refresh_all"].disabled = False
+        ui_refs["page"].update()
+
 def fetch_feed_clicked(e):
     rss_url_input = ui_refs["txt_rss_url"].value.strip()
     download_dir = ui_refs["txt_download_dir"].value.strip()
@@ -186,17 +406,9 @@ def fetch_feed_clicked(e):
         show_snackbar("Error: Feed URL and Save directory are required.", "red")
         return
 
-    clean_url = rss_url_input.removeprefix("https://").removeprefix("http://")
-    final_rss_url = ""
-    if username and password:
-        safe_user = urllib.parse.quote(username)
-        safe_pass = urllib.parse.quote(password)
-        final_rss_url = f"https://{safe_user}:{safe_pass}@{clean_url}"
-    else:
-        if not clean_url.startswith("http://") and not clean_url.startswith("https://"):
-             final_rss_url = f"https://{clean_url}"
-        else:
-             final_rss_url = rss_url_input
+    final_rss_url = feed_manager.build_feed_url(rss_url_input, username, password)
+    # An explicit reload also re-lists the folder, in case files were moved by hand.
+    downloaded_files.invalidate(download_dir)
 
     ui_refs["btn_fetch_feed"].disabled = True
     ui_refs["btn_start_download"].disabled = True
@@ -207,168 +419,170 @@ def fetch_feed_clicked(e):
         parse_feed_thread,
         final_rss_url,
         download_dir,
-        ui_refs["dd_sort"].value
+        ui_refs["dd_sort"].value,
+        rss_url_input,
+        False,
+        podcast_id_for_feed(rss_url_input)
     )
 
-def parse_feed_thread(final_rss_url, download_dir, sort_order):
-    global all_episode_controls_master
-    try:
-        all_episode_controls_master = []
-        ui_refs["lv_episodes"].controls = [ft.Row([ft.ProgressRing(), ft.Text("Searching feed...")], alignment=ft.MainAxisAlignment.CENTER)]
+class EpisodeListLoader:
+    """
+    Receives episode mappings from feed_manager.load_feed as they are parsed and shows them
+    as Episode models in batches, then sorts and publishes the final list.
+    """
+    def __init__(self, download_dir, podcast_id=None):
+        global all_episodes_master
+        all_episodes_master = []
+        self.download_dir = download_dir
+        self.podcast_id = podcast_id
+        self.episodes = []
+        self.pending_batch = []
+        self.last_flush = monotonic()
+        self.episode_list = ui_refs["episode_list"]
+        self.episode_list.clear()
+
+    def add(self, episode):
+        self.pending_batch.append(Episode.from_mapping(episode, self.download_dir, self.podcast_id))
+        if len(self.pending_batch) >= RENDER_BATCH_SIZE or monotonic() - self.last_flush >= RENDER_BATCH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = monotonic()
+        if not self.pending_batch:
+            return
+        self.episodes.extend(self.pending_batch)
+        self.pending_batch.clear()
+        self.episode_list.set_items(self.episodes)
         ui_refs["page"].update()
 
-        rss_response = requests.get(final_rss_url, headers=HEADERS, timeout=15)
-        rss_response.raise_for_status()
-        rss_response.encoding = rss_response.apparent_encoding if rss_response.apparent_encoding else 'utf-8'
-        xml_data = rss_response.text
-
-        namespaces = {
-            'itunes': 'http://www.itunes.com/dtds/podcast-1.0.dtd',
-            'content': 'http://purl.org/rss/1.0/modules/content/'
-        }
-
-        root = ET.fromstring(xml_data)
-        items = root.findall('.//item')
-
-        if not ui_refs["txt_podcast_name"].value.strip():
-            try:
-                channel_title = root.find('.//channel/title').text
-                if channel_title:
-                    ui_refs["txt_podcast_name"].value = channel_title.strip()
-            except Exception:
-                pass
-
-        channel_image_tag = root.find('.//channel/image/url')
-        itunes_image_tag = root.find('.//channel/itunes:image', namespaces)
-        channel_image = ""
-        if channel_image_tag is not None and channel_image_tag.text:
-             channel_image = channel_image_tag.text
-        elif itunes_image_tag is not None and itunes_image_tag.get('href'):
-             channel_image = itunes_image_tag.get('href')
-
-        all_episodes = []
-
-        if not items:
+    def finish(self, result, sort_key):
+        global all_episodes_master, loaded_index
+        self.flush()
+
+        if result.channel["title"] and not ui_refs["txt_podcast_name"].value.strip():
+            ui_refs["txt_podcast_name"].value = result.channel["title"]
+
+        if result.item_count == 0:
+            self.episode_list.clear()
             ui_refs["lv_episodes"].controls = [ft.Text("No episodes were found in this feed.", color="red")]
             ui_refs["btn_start_download"].disabled = True
+        elif not self.episodes:
+            self.episode_list.clear()
+            ui_refs["lv_episodes"].controls = [ft.Text("No valid audio episodes found.", color="orange")]
+            ui_refs["btn_start_download"].disabled = True
         else:
-            global_controls_dict = {
-                "btn_fetch_feed": ui_refs["btn_fetch_feed"],
-                "btn_start_download": ui_refs["btn_start_download"],
-                "dd_sort": ui_refs["dd_sort"]
-            }
-
-            total_items = len(items)
-            for i, item in enumerate(items):
-
-                title = item.findtext('title', 'No Title') or 'No Title'
-
-                description_raw = item.findtext('description', None)
-                if description_raw is None:
-                    description_raw = item.findtext('itunes:summary', namespaces, None)
-                if description_raw is None:
-                    description_raw = item.findtext('content:encoded', namespaces, '')
-
-                description_str = description_raw if description_raw is not None else ''
-
-                description_no_html = re.sub('<[^<]+?>', '', description_str)
-                description_clean = html.unescape(description_no_html).strip()
-
-                pub_date_str = item.findtext('pubDate', 'N/A') or 'N/A'
-                link = item.findtext('link', '') or ''
-                guid = item.findtext('guid', '') or ''
-                duration_tag = item.find('itunes:duration', namespaces)
-                duration = duration_tag.text if duration_tag is not None else ''
-                author_tag = item.find('itunes:author', namespaces)
-                author = author_tag.text if author_tag is not None else ''
-
-                enclosure = item.find('enclosure')
-                enclosure_url = enclosure.get('url') if enclosure is not None else None
-                enclosure_type = enclosure.get('type', '') if enclosure is not None else ''
-
-                ep_image_tag = item.find('itunes:image', namespaces)
-                image_src = channel_image
-                if ep_image_tag is not None:
-                    href = ep_image_tag.get('href')
-                    if href:
-                        image_src = href
-
-                ep_number = extract_episode_number(title)
-                fallback_number = total_items - i
-                final_ep_number = ep_number if ep_number > 0 else fallback_number
-
-                if enclosure is not None and enclosure_url and enclosure_type.startswith('audio'):
-                    download_url = html.unescape(enclosure_url)
-
-                    raw_filename = download_url.split('/')[-1].split('?')[0]
-                    filename = urllib.parse.unquote(raw_filename)
-                    filename = re.sub(r'[\\/*?:"<>|]', "", filename)
-                    filename = filename.strip()
-
-                    if not filename:
-                        filename = f"episode_{final_ep_number}.mp3"
-
-                    ep_control = EpisodeControl(
-                        page = ui_refs["page"],
-                        ep_number = final_ep_number,
-                        title = title,
-                        description = description_clean,
-                        image_src = image_src,
-                        download_url = download_url,
-                        filename = filename,
-                        download_dir = download_dir,
-                        global_cancel_event = global_cancel_event,
-                        global_controls = global_controls_dict,
-                        episode_list_ref = ui_refs["lv_episodes"],
-                        pub_date = pub_date_str,
-                        link = link,
-                        duration = duration,
-                        author = author,
-                        guid = guid
-                    )
-
-                    all_episodes.append(ep_control)
-                else:
-                    print(f"Item {i}: Ignored (no valid audio enclosure).")
-
-            if not all_episodes:
-                 ui_refs["lv_episodes"].controls = [ft.Text("No valid audio episodes found.", color="orange")]
-                 ui_refs["btn_start_download"].disabled = True
-            else:
-                 is_reversed = (sort_order == "DESC")
-                 all_episodes.sort(key=lambda x: x.ep_number, reverse=is_reversed)
-
-                 all_episode_controls_master = all_episodes
-                 ui_refs["lv_episodes"].controls = all_episodes
-
-                 ui_refs["btn_start_download"].disabled = False
+            # Feed-position fallback numbers are only known once the whole feed was read.
+            for ep, episode in zip(self.episodes, result.episodes):
+                ep.ep_number = episode["ep_number"]
+
+            loaded_index = EpisodeIndex(self.episodes)
+
+            # load_feed has stored the episodes of a saved podcast: rows read descriptions from there.
+            for ep in self.episodes:
+                ep.release_description()
+
+            all_episodes_master = loaded_index.ordered(sort_key)
+            ui_refs["btn_start_download"].disabled = False
 
         ui_refs["prog_bar_total"].value = 0
 
-    except requests.exceptions.RequestException as e:
+def parse_feed_thread(final_rss_url, download_dir, sort_key, feed_url=None, offline=False, podcast_id=None):
+    """
+    Loads the episode list of a feed into the UI through feed_manager.load_feed.
+    With offline=True only the catalog or cached snapshot is shown.
+    """
+    global all_episodes_master, loaded_feed_key
+    # Loaded here rather than at startup; fetching the feed needs requests anyway.
+    from requests.exceptions import RequestException
+
+    cache_key = feed_url or final_rss_url
+    feed_key = (cache_key, download_dir)
+    try:
+        if not offline:
+            ui_refs["lv_episodes"].controls = [ft.Row([ft.ProgressRing(), ft.Text("Searching feed...")], alignment=ft.MainAxisAlignment.CENTER)]
+            ui_refs["page"].update()
+
+        # The list on screen can be kept as-is if the server says the feed did not change.
+        list_is_current = loaded_feed_key == feed_key and bool(all_episodes_master)
+        loader = EpisodeListLoader(download_dir, podcast_id) if not list_is_current else None
+        result = feed_manager.load_feed(
+            cache_key,
+            final_rss_url,
+            podcast_id,
+            offline=offline,
+            parse_if_unchanged=not list_is_current,
+            on_episode=loader.add if loader is not None else None
+        )
+
+        if result.status == feed_manager.STATUS_UNAVAILABLE or result.episodes is None:
+            # Nothing cached to show, or unchanged since the current list; on_search restores it below.
+            return
+        if loader is None:
+            loader = EpisodeListLoader(download_dir, podcast_id)
+            for episode in result.episodes:
+                loader.add(episode)
+        loader.finish(result, sort_key)
+        loaded_feed_key = feed_key
+
+    except RequestException as e:
+         all_episodes_master = []
+         loaded_feed_key = None
          ui_refs["lv_episodes"].controls = [ft.Text(f"Network Error: {e}", color="red")]
          ui_refs["btn_start_download"].disabled = True
     except ET.ParseError as e:
+        all_episodes_master = []
+        loaded_feed_key = None
         ui_refs["lv_episodes"].controls = [ft.Text(f"Feed Format Error: {e}", color="red")]
         ui_refs["btn_start_download"].disabled = True
     except Exception as e:
         import traceback
         traceback.print_exc()
+        all_episodes_master = []
+        loaded_feed_key = None
         ui_refs["lv_episodes"].controls = [ft.Text(f"Error loading feed: {e}", color="red")]
         ui_refs["btn_start_download"].disabled = True
     finally:
         ui_refs["btn_fetch_feed"].disabled = False
-        ui_refs["dd_sort"].disabled = not bool(all_episode_controls_master)
+        ui_refs["dd_sort"].disabled = not bool(all_episodes_master)
         on_search(None)
         try:
              ui_refs["page"].update()
         except Exception:
              pass
         
+def on_search_changed(e):
+    """Debounces typing in the search box so the index is queried once the user pauses."""
+    global search_timer
+    if search_timer is not None:
+        search_timer.cancel()
+    search_timer = threading.Timer(SEARCH_DEBOUNCE_SECONDS, on_search, args=(None,))
+    search_timer.daemon = True
+    search_timer.start()
+
+def search_catalog(search_term):
+    """
+    Ranked full-text search of the loaded podcast in the episode catalog.
+    Returns None when the list is not backed by the catalog, so the caller can scan instead.
+    """
+    podcast_id = all_episodes_master[0].podcast_id
+    if podcast_id is None:
+        return None
+    try:
+        results = db.db_search_episodes(search_term, podcast_id)
+    except sqlite3.OperationalError as e:
+        print(f"Search index error, falling back to a scan: {e}")
+        return None
+    episodes_by_key = {
+        db.episode_key(episode.guid, episode.download_url): episode
+        for episode in all_episodes_master
+    }
+    return [episodes_by_key[key] for _, key in results if key in episodes_by_key]
+
 def on_search(e):
     search_term = ui_refs["txt_search"].value.lower().strip()
 
-    if not all_episode_controls_master:
+    if not all_episodes_master:
+         ui_refs["episode_list"].clear()
          if not search_term:
              if not ui_refs["lv_episodes"].controls or isinstance(ui_refs["lv_episodes"].controls[0], ft.Text):
                   ui_refs["lv_episodes"].controls = [ft.Text("Select or fill in a podcast configuration.", color="grey")]
@@ -377,38 +591,42 @@ def on_search(e):
          ui_refs["page"].update()
          return
 
-    filtered_controls = []
+    filtered_episodes = []
     if not search_term:
-        filtered_controls = all_episode_controls_master.copy()
+        filtered_episodes = all_episodes_master
+    elif (catalog_results := search_catalog(search_term)) is not None:
+        filtered_episodes = catalog_results
     else:
-        for control in all_episode_controls_master:
-            title = control.title.lower()
-            description = control.description.lower()
+        for episode, description in zip(all_episodes_master, load_descriptions(all_episodes_master)):
+            title = episode.title.lower()
+            description = description.lower()
 
             if search_term in title or search_term in description:
-                filtered_controls.append(control)
+                filtered_episodes.append(episode)
+    filtered_episodes = apply_range_filters(filtered_episodes)
 
-    if not filtered_controls:
+    if not filtered_episodes:
+        ui_refs["episode_list"].clear()
         ui_refs["lv_episodes"].controls = [ft.Text("No episodes match your search.", color="grey", text_align=ft.TextAlign.CENTER)]
     else:
-        new_list_controls_with_dividers = []
-        num_filtered = len(filtered_controls)
-        for i, episode_control in enumerate(filtered_controls):
-            new_list_controls_with_dividers.append(episode_control)
-            if i < num_filtered - 1:
-                 new_list_controls_with_dividers.append(
-                     ft.Divider(height=1, color=ft.Colors.with_opacity(0.5, ft.Colors.GREY))
-                 )
-        ui_refs["lv_episodes"].controls = new_list_controls_with_dividers
+        ui_refs["episode_list"].set_items(filtered_episodes, reset_scroll=True)
 
     ui_refs["page"].update()
 
+def apply_range_filters(episodes):
+    """Applies the "Published" and "Length" filters; always returns a new list."""
+    max_age = {key: value for key, _, value in AGE_CHOICES}.get(ui_refs["dd_age"].value)
+    min_seconds, max_seconds = {key: value for key, _, value in LENGTH_CHOICES}.get(
+        ui_refs["dd_length"].value, (None, None))
+    return EpisodeIndex.filter(episodes, max_age, min_seconds, max_seconds)
+
 def sort_list_changed(e):
-    if not all_episode_controls_master:
+    global all_episodes_master
+    if not all_episodes_master or loaded_index is None:
         return
-    
-    is_reversed = (ui_refs["dd_sort"].value == "DESC")
-    all_episode_controls_master.sort(key=lambda x: x.ep_number, reverse=is_reversed)
+
+    # Every order was computed when the list loaded: this only picks another one.
+    all_episodes_master = loaded_index.ordered(ui_refs["dd_sort"].value)
 
     on_search(None)
 
@@ -419,85 +637,176 @@ def start_download_clicked(e):
          return
 
     global_cancel_event.clear()
+    set_batch_controls(True)
 
-    ui_refs["btn_start_download"].visible = False
-    ui_refs["btn_cancel_download"].visible = True
-    ui_refs["btn_fetch_feed"].disabled = True
-    ui_refs["dd_sort"].disabled = True
+    items_to_download = []
+    for episode in ui_refs["episode_list"].items:
+        if not episode.is_downloaded and not downloaded_files.exists(episode.full_file_path):
+            episode.set_status(STATUS_QUEUED)
+            items_to_download.append(episode)
 
-    items_to_download = 0
-    for control in ui_refs["lv_episodes"].controls:
-        if isinstance(control, EpisodeControl):
-            if not os.path.exists(control.full_file_path):
-                schedule_icon = ft.Container(
-                    content=ft.Icon(name=ft.Icons.SCHEDULE, color=ft.Colors.GREY),
-                    width=80,
-                    alignment=ft.alignment.center
-                )
-                control._set_trailing(schedule_icon)
-                items_to_download += 1
-
-    if items_to_download == 0:
+    if not items_to_download:
         show_snackbar("All visible episodes are already downloaded or list is empty.", "blue")
-        ui_refs["btn_start_download"].visible = True
-        ui_refs["btn_cancel_download"].visible = False
-        ui_refs["btn_fetch_feed"].disabled = False
+        set_batch_controls(False)
         ui_refs["dd_sort"].disabled = False
         ui_refs["page"].update()
         return
 
     ui_refs["page"].update()
-    ui_refs["page"].run_thread(run_all_downloads_thread, download_dir)
+    ui_refs["page"].run_thread(run_all_downloads_thread, items_to_download)
+
+def resume_interrupted_downloads():
+    """Called at startup: continues the downloads that were queued or running when the app last stopped."""
+    try:
+        waiting = job_queue.recover_interrupted()
+    except Exception as e:
+        print(f"Error reading the download queue: {e}")
+        return
+    if not waiting:
+        return
+    global_cancel_event.clear()
+    set_batch_controls(True)
+    show_snackbar(f"Resuming {waiting} interrupted download(s)...", "blue")
+    ui_refs["page"].run_thread(run_all_downloads_thread, [])
+
+def set_batch_controls(running: bool):
+    ui_refs["btn_start_download"].visible = not running
+    ui_refs["btn_cancel_download"].visible = running
+    ui_refs["btn_fetch_feed"].disabled = running
+    ui_refs["dd_sort"].disabled = running
+    ui_refs["dd_workers"].disabled = running
+
+def get_max_workers():
+    dd_workers = ui_refs.get("dd_workers")
+    try:
+        return int(dd_workers.value)
+    except (AttributeError, TypeError, ValueError):
+        return DEFAULT_MAX_WORKERS
+
+def toggle_global_controls(state: bool):
+    ui_refs["btn_fetch_feed"].disabled = state
+    ui_refs["btn_start_download"].disabled = state
+    ui_refs["dd_sort"].disabled = state
+    try:
+        ui_refs["page"].update()
+    except Exception:
+        pass
+
+def individual_download_clicked(episode):
+    ui_refs["page"].run_thread(run_individual_download, episode)
+
+def run_individual_download(episode):
+    episode.cancel_event.clear()
+    toggle_global_controls(True)
+    try:
+        # A click should not wait behind a "Download all" batch for bandwidth.
+        if not job_queue.run_single(episode, episode.cancel_event, bandwidth.PRIORITY_INTERACTIVE):
+            show_snackbar(f"'{episode.title}' is already being downloaded.", "blue")
+    finally:
+        toggle_global_controls(False)
+
+def verify_library_clicked(e):
+    ui_refs["btn_verify_library"].disabled = True
+    ui_refs["page"].update()
+    show_snackbar("Verifying downloaded files...", "blue")
+    ui_refs["page"].run_thread(run_verify_library)
+
+def run_verify_library():
+    try:
+        summary = library.verify_library()
+        damaged = summary.get(library.RESULT_SIZE_MISMATCH, 0) + summary.get(library.RESULT_HASH_MISMATCH, 0)
+        missing = summary.get(library.RESULT_MISSING, 0)
+        # Damaged files were moved aside: offer those episodes for download again.
+        for episode in all_episodes_master:
+            if episode.is_downloaded and not downloaded_files.exists(episode.full_file_path):
+                episode.set_status(STATUS_NEW)
+        if damaged or missing:
+            show_snackbar(f"{summary.get(library.RESULT_OK, 0)} files OK, {damaged} damaged (renamed to *{library.CORRUPT_SUFFIX}), {missing} missing.", "orange")
+        else:
+            show_snackbar(f"All {summary.get(library.RESULT_OK, 0)} checked files are OK.", "green")
+    except Exception as e:
+        print(f"Error verifying library: {e}")
+        show_snackbar(f"Error verifying files: {e}", "red")
+    finally:
+        ui_refs["btn_verify_library"].disabled = False
+        ui_refs["page"].update()
+
+def speed_limit_changed(e):
+    """Applies the new speed limit right away, running downloads included, and remembers it."""
+    try:
+        rate = int(e.control.value or 0)
+    except ValueError:
+        rate = 0
+    bandwidth.limiter.configure(rate=rate or None)
+    bandwidth.save_settings()
+    show_snackbar(f"Speed limit: {bandwidth.format_rate(rate)}", "blue")
 
 def cancel_download_clicked(e):
     global_cancel_event.set()
     show_snackbar("Cancellation requested...", "orange")
 
-def run_all_downloads_thread(download_dir):
+def run_all_downloads_thread(new_items):
+    """
+    Adds `new_items` to the persistent queue, then downloads everything queued (earlier jobs
+    included), and keeps going while more jobs arrive, e.g. from the feed poller.
+    """
+    global batch_running
+    total_to_download = 0
+    completed_count = 0
+    with batch_lock:
+        batch_running = True
     try:
-        episode_controls_to_download = [
-            c for c in ui_refs["lv_episodes"].controls
-            if isinstance(c, EpisodeControl)
-        ]
+        if new_items:
+            job_queue.enqueue(new_items)
 
-        items_in_queue = [
-            ep for ep in episode_controls_to_download
-            if not os.path.exists(ep.full_file_path)
-        ]
+        progress_lock = threading.Lock()
+
+        def on_job_done(job):
+            nonlocal completed_count
+            with progress_lock:
+                completed_count += 1
+                ui_refs["prog_bar_total"].value = completed_count / total_to_download
+            schedule_render(ui_refs["prog_bar_total"])
+
+        while True:
+            # Jobs for episodes in the loaded list drive their rows; the others run without one.
+            listed = {(episode.download_dir, episode.filename): episode for episode in all_episodes_master}
+            runner = job_queue.QueueRunner(
+                global_cancel_event,
+                max_workers=get_max_workers(),
+                per_host_limit=DEFAULT_PER_HOST_LIMIT,
+                episode_lookup=lambda download_dir, filename: listed.get((download_dir, filename)),
+                on_job_done=on_job_done
+            )
+            total_to_download += len(runner.load())
+            for _, episode in runner.jobs:
+                if episode.status != STATUS_QUEUED:
+                    episode.set_status(STATUS_QUEUED)
 
-        total_to_download = len(items_in_queue)
-        completed_count = 0
+            not_started = runner.run()
 
-        for i, ep_control in enumerate(items_in_queue):
             if global_cancel_event.is_set():
                 show_snackbar("Batch download cancelled.", "red")
-                for remaining_ep in items_in_queue[i:]:
-                     cancel_content = ft.Row([remaining_ep.download_button], spacing=5, vertical_alignment=ft.CrossAxisAlignment.CENTER, alignment=ft.MainAxisAlignment.CENTER)
-                     remaining_ep._set_trailing(ft.Container(content=cancel_content, width=80, alignment=ft.alignment.center))
+                for job in not_started:
+                    _, episode = job.payload
+                    episode.set_status(STATUS_NEW)
                 break
-
-            ep_control.run_batch_download(HEADERS)
-            completed_count = i + 1
-
-            if total_to_download > 0:
-                ui_refs["prog_bar_total"].value = completed_count / total_to_download
-                try:
-                     ui_refs["page"].update()
-                except Exception:
-                     break
+            with batch_lock:
+                if not runner.jobs or not db.db_get_jobs([job_queue.JOB_QUEUED]):
+                    batch_running = False
+                    break
 
         if not global_cancel_event.is_set() and total_to_download > 0:
             show_snackbar("All downloads complete!", "green")
 
-
     except Exception as e:
         print(f"Error during batch download loop: {e}")
         show_snackbar(f"Error during download: {e}", "red")
     finally:
-        ui_refs["btn_start_download"].visible = True
-        ui_refs["btn_cancel_download"].visible = False
-        ui_refs["btn_fetch_feed"].disabled = False
-        ui_refs["dd_sort"].disabled = not not all_episode_controls_master
+        with batch_lock:
+            batch_running = False
+        set_batch_controls(False)
+        ui_refs["dd_sort"].disabled = not all_episodes_master
 
         if global_cancel_event.is_set():
              if total_to_download > 0:
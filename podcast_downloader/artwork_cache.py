@@ -0,0 +1,186 @@
+import hashlib
+import importlib.util
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import data_manager as db
+from . import http_client
+from .utils import adopt_legacy_path, data_dir
+
+# Pillow is in requirements.txt. Without it nothing is resized: the original image (often
+# 3000x3000) is cached once and every list row and the sidebar decode it at full size.
+# It is only imported when an image is actually resized, which keeps it out of the startup path.
+HAS_PILLOW = importlib.util.find_spec("PIL") is not None
+
+LEGACY_ARTWORK_DIR = "artwork_cache"
+ARTWORK_DIR = os.path.join(data_dir(), LEGACY_ARTWORK_DIR)
+DEFAULT_LIMIT_BYTES = 200 * 1024 * 1024
+FETCH_WORKERS = 4
+# Larger responses are not artwork worth keeping (or not artwork at all) and are dropped unread.
+MAX_ARTWORK_BYTES = 20 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+SIZE_THUMB = "thumb"
+SIZE_MEDIUM = "medium"
+THUMB_SIZE = (80, 80)
+MEDIUM_SIZE = (400, 400)
+
+
+class ArtworkCache:
+    """
+    Disk cache for episode and channel artwork, shared by the list rows and the sidebar.
+    Images are fetched once per URL in the background, stored under the hash of their bytes
+    (so different URLs serving the same image share files), and resized to a list thumbnail
+    and a medium sidebar version. Files are evicted least-recently-used above `limit_bytes`.
+    """
+    def __init__(self, cache_dir=ARTWORK_DIR, limit_bytes=DEFAULT_LIMIT_BYTES):
+        self.cache_dir = os.path.abspath(cache_dir)
+        if self.cache_dir == ARTWORK_DIR:
+            # The catalog lists the images already cached, so bring them along from the old location.
+            adopt_legacy_path(self.cache_dir, LEGACY_ARTWORK_DIR)
+        self.limit_bytes = limit_bytes
+        self._lock = threading.Lock()
+        self._hash_by_url = None
+        self._last_used = {}
+        self._waiters = {}
+        self._executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="artwork")
+
+    def _index(self):
+        if self._hash_by_url is None:
+            try:
+                self._hash_by_url = db.db_get_artwork_index()
+            except Exception as e:
+                print(f"Error loading artwork index: {e}")
+                self._hash_by_url = {}
+        return self._hash_by_url
+
+    def _file_path(self, content_hash, size):
+        return os.path.join(self.cache_dir, f"{content_hash}_{size}.jpg" if HAS_PILLOW else f"{content_hash}.img")
+
+    def _file_paths(self, content_hash):
+        return {self._file_path(content_hash, SIZE_THUMB), self._file_path(content_hash, SIZE_MEDIUM)}
+
+    def get(self, url, size=SIZE_THUMB):
+        """Returns the local path of a cached artwork, or None if it has not been fetched yet."""
+        if not url:
+            return None
+        with self._lock:
+            content_hash = self._index().get(url)
+            if content_hash is None:
+                return None
+            self._last_used[content_hash] = time.time()
+        return self._file_path(content_hash, size)
+
+    def request(self, url, on_ready):
+        """Fetches `url` in the background; `on_ready(url)` runs once it is cached. Duplicate requests share one fetch."""
+        if not url:
+            return
+        with self._lock:
+            if url in self._waiters:
+                self._waiters[url].append(on_ready)
+                return
+            self._waiters[url] = [on_ready]
+        self._executor.submit(self._fetch, url)
+
+    def _fetch(self, url):
+        ok = False
+        try:
+            data = self._download(url)
+            content_hash = hashlib.sha256(data).hexdigest()
+
+            paths = self._file_paths(content_hash)
+            if not all(os.path.exists(path) for path in paths):
+                # A new image, not just a new URL for artwork already on disk.
+                self._write_files(content_hash, data)
+            size_bytes = sum(os.path.getsize(path) for path in paths)
+
+            db.db_save_artwork(url, content_hash, size_bytes)
+            with self._lock:
+                self._index()[url] = content_hash
+                self._last_used[content_hash] = time.time()
+            ok = True
+            self._evict()
+        except Exception as e:
+            print(f"Error caching artwork {url}: {e}")
+        finally:
+            with self._lock:
+                callbacks = self._waiters.pop(url, [])
+            if ok:
+                for callback in callbacks:
+                    try:
+                        callback(url)
+                    except Exception as e:
+                        print(f"Error in artwork callback: {e}")
+
+    @staticmethod
+    def _download(url):
+        """The image bytes of `url`, read in chunks; raises ValueError beyond MAX_ARTWORK_BYTES."""
+        with http_client.get(url, timeout=15, stream=True) as response:
+            response.raise_for_status()
+            length = response.headers.get("Content-Length")
+            if length and length.isdigit() and int(length) > MAX_ARTWORK_BYTES:
+                raise ValueError(f"image is {int(length)} bytes, more than {MAX_ARTWORK_BYTES}")
+            buffer = bytearray()
+            for chunk in response.iter_content(CHUNK_SIZE):
+                buffer += chunk
+                if len(buffer) > MAX_ARTWORK_BYTES:
+                    raise ValueError(f"image is more than {MAX_ARTWORK_BYTES} bytes")
+        return bytes(buffer)
+
+    def _write_files(self, content_hash, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if not HAS_PILLOW:
+            self._write_atomic(self._file_path(content_hash, SIZE_THUMB), data)
+            return
+
+        from PIL import Image, ImageOps
+        with Image.open(io.BytesIO(data)) as image:
+            image = image.convert("RGB")
+            outputs = {
+                SIZE_THUMB: ImageOps.fit(image, THUMB_SIZE),
+                SIZE_MEDIUM: image.copy(),
+            }
+            outputs[SIZE_MEDIUM].thumbnail(MEDIUM_SIZE)
+
+        for size, resized in outputs.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, format="JPEG", quality=85)
+            self._write_atomic(self._file_path(content_hash, size), buffer.getvalue())
+
+    @staticmethod
+    def _write_atomic(path, data):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _evict(self):
+        with self._lock:
+            last_used, self._last_used = self._last_used, {}
+        if last_used:
+            db.db_touch_artwork(last_used)
+
+        files = db.db_get_artwork_files_lru()
+        total = sum(size for _, size in files)
+        evicted = []
+        for content_hash, size in files:
+            if total <= self.limit_bytes:
+                break
+            for path in self._file_paths(content_hash):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            evicted.append(content_hash)
+
+        if evicted:
+            db.db_delete_artwork_files(evicted)
+            evicted_set = set(evicted)
+            with self._lock:
+                index = self._index()
+                for url in [url for url, content_hash in index.items() if content_hash in evicted_set]:
+                    del index[url]
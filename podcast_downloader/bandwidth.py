@@ -0,0 +1,235 @@
+import datetime
+import re
+import threading
+import time
+
+from . import data_manager as db
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+SETTINGS_KEY = "bandwidth"
+
+KIB = 1024
+MIB = 1024 * 1024
+# Speed limit choices offered in the UI, in bytes per second (0 = unlimited).
+RATE_CHOICES = [0, 256 * KIB, 512 * KIB, 1 * MIB, 2 * MIB, 5 * MIB, 10 * MIB]
+
+# How many seconds of traffic a bucket may save up while idle.
+BURST_SECONDS = 0.5
+# Longest single wait, so cancels and live limit changes are noticed quickly.
+WAIT_SLICE = 0.1
+SCHEDULE_CHECK_INTERVAL = 1.0
+
+_UNITS = {"": 1, "b": 1, "k": KIB, "kb": KIB, "m": MIB, "mb": MIB, "g": 1024 * MIB, "gb": 1024 * MIB}
+
+
+def parse_rate(text):
+    """Parses '512K', '1.5M', '800000' (bytes/second) into an int. '', '0' and 'unlimited' mean no limit (None)."""
+    value = str(text).strip().lower().removesuffix("/s")
+    if value in ("", "0", "none", "unlimited"):
+        return None
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([a-z]*)", value)
+    if not match or match.group(2) not in _UNITS:
+        raise ValueError(f"Invalid rate: {text!r}")
+    rate = int(float(match.group(1)) * _UNITS[match.group(2)])
+    return rate or None
+
+
+def format_rate(rate):
+    if not rate:
+        return "Unlimited"
+    if rate >= MIB:
+        return f"{rate / MIB:g} MB/s"
+    return f"{rate / KIB:g} KB/s"
+
+
+def parse_schedule(text):
+    """Parses 'HH:MM-HH:MM=RATE' into a schedule rule. Windows may wrap past midnight ('22:00-06:00=0')."""
+    match = re.fullmatch(r"\s*(\d{1,2}:\d{2})\s*-\s*(\d{1,2}:\d{2})\s*=\s*(.+)", text)
+    if not match:
+        raise ValueError(f"Invalid schedule: {text!r} (expected HH:MM-HH:MM=RATE)")
+    start, end, rate = match.groups()
+    for clock in (start, end):
+        _minutes(clock)
+    return {"start": start, "end": end, "rate": parse_rate(rate)}
+
+
+def _minutes(clock):
+    hours, minutes = (int(part) for part in clock.split(":"))
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Invalid time of day: {clock!r}")
+    return hours * 60 + minutes
+
+
+def _in_window(rule, minute_of_day):
+    start, end = _minutes(rule["start"]), _minutes(rule["end"])
+    if start <= end:
+        return start <= minute_of_day < end
+    return minute_of_day >= start or minute_of_day < end
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens (bytes) per second, holding at most BURST_SECONDS worth.
+    A consumer may overdraw the bucket by one chunk; the next one then waits until it is paid back.
+    A rate of None means unlimited. Not thread-safe on its own, BandwidthLimiter holds the lock.
+    """
+    def __init__(self, rate=None):
+        self.rate = rate
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        if self.rate:
+            burst = self.rate * BURST_SECONDS
+            self.tokens = min(burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_rate(self, rate, now):
+        self._refill(now)
+        self.rate = rate
+        if rate:
+            self.tokens = min(self.tokens, rate * BURST_SECONDS)
+        else:
+            self.tokens = 0.0
+
+    def delay(self, now):
+        """Seconds until a new chunk may be taken (0 when it may be taken right away)."""
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        return 0.0 if self.tokens > 0 else -self.tokens / self.rate
+
+    def take(self, amount):
+        if self.rate:
+            self.tokens -= amount
+
+
+class BandwidthLimiter:
+    """
+    Shared rate limit for every download: a global bucket plus optional per-host buckets.
+    The global rate follows time-of-day `schedules` (first matching rule wins, `rate` applies outside them).
+    Interactive transfers (single-episode clicks) are served before batch transfers whenever both wait.
+    Every setting can be changed while downloads run; waiting transfers pick it up within WAIT_SLICE.
+    """
+    def __init__(self, rate=None, host_rates=None, schedules=None):
+        self._cond = threading.Condition()
+        self._global = TokenBucket()
+        self._hosts = {}
+        self._waiting = {PRIORITY_INTERACTIVE: 0, PRIORITY_BATCH: 0}
+        self._schedule_checked = 0.0
+        self.rate = None
+        self.host_rates = {}
+        self.schedules = []
+        self._limited = False
+        self.configure(rate=rate, host_rates=host_rates or {}, schedules=schedules or [])
+
+    def configure(self, rate=..., host_rates=..., schedules=...):
+        """Changes the limits live. Arguments left out keep their current value."""
+        with self._cond:
+            now = time.monotonic()
+            if rate is not ...:
+                self.rate = rate or None
+            if host_rates is not ...:
+                self.host_rates = {host.lower(): value for host, value in host_rates.items() if value}
+                for host in list(self._hosts):
+                    if host not in self.host_rates:
+                        del self._hosts[host]
+                for host, value in self.host_rates.items():
+                    self._hosts.setdefault(host, TokenBucket()).set_rate(value, now)
+            if schedules is not ...:
+                self.schedules = list(schedules)
+            self._limited = bool(self.rate or self.host_rates or any(rule["rate"] for rule in self.schedules))
+            self._schedule_checked = 0.0
+            self._apply_schedule(now)
+            self._cond.notify_all()
+
+    def current_rate(self):
+        """The global rate in effect right now, schedules included."""
+        with self._cond:
+            self._apply_schedule(time.monotonic())
+            return self._global.rate
+
+    def max_chunk(self, host=""):
+        """Largest read worth doing under the limits for `host` (None when unlimited), to keep throttling smooth."""
+        if not self._limited:
+            return None
+        with self._cond:
+            self._apply_schedule(time.monotonic())
+            rates = [rate for rate in (self._global.rate, self.host_rates.get(host)) if rate]
+        return int(min(rates) * BURST_SECONDS) if rates else None
+
+    def _apply_schedule(self, now):
+        """Caller holds the lock."""
+        if now - self._schedule_checked < SCHEDULE_CHECK_INTERVAL:
+            return
+        self._schedule_checked = now
+        clock = datetime.datetime.now()
+        minute_of_day = clock.hour * 60 + clock.minute
+        rate = self.rate
+        for rule in self.schedules:
+            if _in_window(rule, minute_of_day):
+                rate = rule["rate"]
+                break
+        if rate != self._global.rate:
+            self._global.set_rate(rate, now)
+
+    def consume(self, amount, host="", priority=PRIORITY_BATCH, cancel_event=None):
+        """
+        Blocks until `amount` bytes may be transferred under every limit that applies.
+        Returns False if `cancel_event` was set while waiting.
+        """
+        if not self._limited:
+            return True
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    if cancel_event is not None and cancel_event.is_set():
+                        return False
+                    now = time.monotonic()
+                    self._apply_schedule(now)
+                    if priority != PRIORITY_INTERACTIVE and self._waiting[PRIORITY_INTERACTIVE]:
+                        # Batch transfers only get what interactive ones leave over.
+                        self._cond.wait(WAIT_SLICE)
+                        continue
+                    buckets = [self._global]
+                    if host in self._hosts:
+                        buckets.append(self._hosts[host])
+                    delay = max(bucket.delay(now) for bucket in buckets)
+                    if delay <= 0:
+                        for bucket in buckets:
+                            bucket.take(amount)
+                        return True
+                    self._cond.wait(min(delay, WAIT_SLICE))
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+    def to_settings(self):
+        return {"rate": self.rate, "host_rates": dict(self.host_rates), "schedules": list(self.schedules)}
+
+
+limiter = BandwidthLimiter()
+
+
+def load_settings():
+    """Applies the saved limits to the shared limiter."""
+    try:
+        settings = db.db_get_setting(SETTINGS_KEY, {})
+    except Exception as e:
+        print(f"Error loading bandwidth settings: {e}")
+        return
+    limiter.configure(
+        rate=settings.get("rate"),
+        host_rates=settings.get("host_rates", {}),
+        schedules=settings.get("schedules", [])
+    )
+
+
+def save_settings():
+    try:
+        db.db_set_setting(SETTINGS_KEY, limiter.to_settings())
+    except Exception as e:
+        print(f"Error saving bandwidth settings: {e}")
@@ -0,0 +1,373 @@
+"""
+Headless entry point: `python -m podcast_downloader sync|watch|verify|import-opml|export-opml`.
+
+`sync` refreshes the saved podcasts and downloads their missing episodes without the GUI,
+`watch` keeps polling them and downloads new episodes of the auto-download ones, `verify` re-checks downloaded files against their recorded size and checksum, and
+`import-opml`/`export-opml` exchange the saved podcasts with other podcast apps.
+Progress is written to stdout as JSON lines (one object per event); logs go to stderr.
+"""
+import argparse
+import contextlib
+import json
+import sys
+import threading
+import time
+
+from . import bandwidth
+from . import data_manager as db
+from . import feed_manager
+from . import library
+from . import job_queue
+from . import opml
+from . import poller
+from . import retry
+from .download_manager import DEFAULT_MAX_WORKERS, DEFAULT_PER_HOST_LIMIT
+from .models import Episode, STATUS_DONE, STATUS_FAILED, STATUS_DOWNLOADED, STATUS_RETRYING
+
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_USAGE = 2
+EXIT_CANCELLED = 130
+
+DEFAULT_FEED_WORKERS = 4
+PROGRESS_STEP = 10
+
+
+class JsonEmitter:
+    """Writes one JSON object per line, safely from any thread."""
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def __call__(self, event, **fields):
+        line = json.dumps({"event": event, "time": round(time.time(), 3), **fields}, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+class ProgressReporter:
+    """Stands in for a list row: bound to an Episode, it reports progress every PROGRESS_STEP percent."""
+    def __init__(self, emit, podcast_name):
+        self.emit = emit
+        self.podcast_name = podcast_name
+        self._last_step = {}
+
+    def on_status_changed(self, episode):
+        if episode.status == STATUS_RETRYING:
+            self.emit("retrying", podcast=self.podcast_name, file=episode.filename, error=episode.error)
+
+    def on_progress_changed(self, episode):
+        step = int(episode.progress * 100) // PROGRESS_STEP
+        if step != self._last_step.get(episode.filename):
+            self._last_step[episode.filename] = step
+            self.emit("progress", podcast=self.podcast_name, file=episode.filename, percent=step * PROGRESS_STEP)
+
+
+def select_podcasts(names):
+    podcasts = [db.db_get_podcast_details(podcast_id) for podcast_id, _ in db.db_get_podcasts()]
+    if not names:
+        return podcasts, []
+    by_name = {details["name"]: details for details in podcasts}
+    return [by_name[name] for name in names if name in by_name], [name for name in names if name not in by_name]
+
+
+def apply_limits(args):
+    """Starts from the saved speed limits and overrides them with the command-line ones."""
+    bandwidth.load_settings()
+    if args.rate is not None:
+        bandwidth.limiter.configure(rate=args.rate)
+    if args.host_rate:
+        bandwidth.limiter.configure(host_rates={**bandwidth.limiter.host_rates, **dict(args.host_rate)})
+    if args.schedule:
+        bandwidth.limiter.configure(schedules=args.schedule)
+    if args.save_limits:
+        bandwidth.save_settings()
+
+
+def feed_reporter(emit):
+    """An on_outcome callback that emits a "feed" event per refreshed podcast."""
+    def on_feed(outcome):
+        details = outcome.podcast
+        if outcome.error is not None:
+            emit("feed", podcast=details["name"], status="error", error=str(outcome.error),
+                 elapsed=round(outcome.elapsed, 3))
+            return
+        result = outcome.result
+        emit(
+            "feed",
+            podcast=details["name"],
+            status=result.status,
+            episodes=len(result.episodes or []),
+            changed=result.changed,
+            elapsed=round(outcome.elapsed, 3)
+        )
+    return on_feed
+
+
+def download_queued(args, emit, names, listed, cancel_event, podcast_ids=None):
+    """
+    Downloads the jobs in the shared queue (only those of `podcast_ids` when given), emitting a
+    "download" event per finished job. Ctrl+C cancels. Returns the counts per outcome.
+    """
+    counts = {STATUS_DONE: 0, STATUS_FAILED: 0, "cancelled": 0}
+    total = 0
+
+    def on_job_done(job):
+        _, episode = job.payload
+        status = episode.status if episode.status in (STATUS_DONE, STATUS_FAILED, STATUS_DOWNLOADED) else "cancelled"
+        counts[status] = counts.get(status, 0) + 1
+        emit("download", podcast=names.get(episode.podcast_id), file=episode.filename, status=status,
+             completed=sum(counts.values()), total=total)
+
+    queue_runner = job_queue.QueueRunner(
+        cancel_event,
+        max_workers=args.workers,
+        per_host_limit=args.per_host,
+        episode_lookup=lambda download_dir, filename: listed.get((download_dir, filename)),
+        on_job_done=on_job_done,
+        podcast_ids=podcast_ids
+    )
+    total = len(queue_runner.load())
+    for _, episode in queue_runner.jobs:
+        if episode.view is None:
+            episode.view = ProgressReporter(emit, names.get(episode.podcast_id))
+
+    def on_breaker_changed(host, state, reopens_at):
+        emit("host", host=host, state=state, reopens_at=round(reopens_at, 3) if reopens_at else None)
+
+    not_started = []
+    runner = threading.Thread(target=lambda: not_started.extend(queue_runner.run()), name="sync-downloads")
+    retry.breaker.add_listener(on_breaker_changed)
+    runner.start()
+    try:
+        while runner.is_alive():
+            runner.join(0.5)
+    except KeyboardInterrupt:
+        emit("cancelling")
+        cancel_event.set()
+        runner.join()
+    finally:
+        retry.breaker.remove_listener(on_breaker_changed)
+    counts["cancelled"] += len(not_started)
+    return counts
+
+
+def run_sync(args, emit):
+    db.db_init()
+    apply_limits(args)
+    job_queue.recover_interrupted()
+    podcasts, unknown = select_podcasts(args.podcast)
+    if unknown:
+        emit("error", message=f"Unknown podcast(s): {', '.join(unknown)}")
+        return EXIT_USAGE
+    if not podcasts:
+        emit("summary", feeds=0, feeds_failed=0, downloaded=0, failed=0, cancelled=0)
+        return EXIT_OK
+
+    cancel_event = threading.Event()
+    feeds_failed = 0
+    to_download = []
+
+    outcomes = feed_manager.refresh_all(podcasts, args.feed_workers, args.parse_workers,
+                                        on_outcome=feed_reporter(emit))
+    for outcome in outcomes:
+        if outcome.error is not None:
+            feeds_failed += 1
+            continue
+        if args.no_download:
+            continue
+
+        details = outcome.podcast
+        episodes = sorted(outcome.result.episodes or [], key=lambda episode: episode["ep_number"], reverse=True)
+        if args.limit is not None:
+            episodes = episodes[:args.limit]
+        reporter = ProgressReporter(emit, details["name"])
+        for mapping in episodes:
+            episode = Episode.from_mapping(mapping, details["download_dir"], details["id"], keep_description=False)
+            if not episode.is_downloaded:
+                episode.view = reporter
+                to_download.append((details["name"], episode))
+
+    if args.no_download:
+        emit("summary", feeds=len(podcasts), feeds_failed=feeds_failed, downloaded=0, failed=0, cancelled=0)
+        return EXIT_FAILURES if feeds_failed else EXIT_OK
+
+    # Missing episodes join the shared download queue, next to anything the GUI or an
+    # interrupted run left there.
+    job_queue.enqueue([episode for _, episode in to_download])
+    names = {details["id"]: details["name"] for details in podcasts}
+    listed = {(episode.download_dir, episode.filename): episode for _, episode in to_download}
+    counts = download_queued(args, emit, names, listed, cancel_event, podcast_ids=names if args.podcast else None)
+
+    emit("summary", feeds=len(podcasts), feeds_failed=feeds_failed, downloaded=counts[STATUS_DONE],
+         failed=counts[STATUS_FAILED], cancelled=counts["cancelled"])
+
+    if cancel_event.is_set():
+        return EXIT_CANCELLED
+    if feeds_failed or counts[STATUS_FAILED]:
+        return EXIT_FAILURES
+    return EXIT_OK
+
+
+def run_watch(args, emit):
+    db.db_init()
+    apply_limits(args)
+    job_queue.recover_interrupted()
+    cancel_event = threading.Event()
+
+    def on_new_episodes(podcast, episodes):
+        emit("new-episodes", podcast=podcast["name"], episodes=len(episodes))
+
+    feed_poller = poller.FeedPoller(args.feed_workers, on_outcome=feed_reporter(emit), on_new_episodes=on_new_episodes,
+                                    parse_workers=args.parse_workers)
+    emit("watching", podcasts=len(db.db_get_podcasts()))
+    try:
+        while True:
+            feed_poller.poll_due()
+            if db.db_get_jobs([job_queue.JOB_QUEUED]):
+                names = {podcast_id: name for podcast_id, name in db.db_get_podcasts()}
+                counts = download_queued(args, emit, names, {}, cancel_event)
+                emit("summary", downloaded=counts[STATUS_DONE], failed=counts[STATUS_FAILED],
+                     cancelled=counts["cancelled"])
+                if cancel_event.is_set():
+                    return EXIT_CANCELLED
+            time.sleep(min(max(feed_poller.seconds_until_next(), 1.0), poller.CHECK_SECONDS))
+    except KeyboardInterrupt:
+        return EXIT_CANCELLED
+
+
+def run_verify(args, emit):
+    db.db_init()
+    podcasts, unknown = select_podcasts(args.podcast)
+    if unknown:
+        emit("error", message=f"Unknown podcast(s): {', '.join(unknown)}")
+        return EXIT_USAGE
+
+    summary = {}
+
+    def on_result(result):
+        # Counted here too, so a Ctrl+C still reports the files checked so far.
+        summary[result.outcome] = summary.get(result.outcome, 0) + 1
+        emit("verify", file=result.path, outcome=result.outcome, detail=result.detail)
+
+    # One call for every selected podcast, so their files are hashed by a single set of processes.
+    podcast_ids = [details["id"] for details in podcasts] if args.podcast else None
+    try:
+        library.verify_library(podcast_ids, max_workers=args.processes, on_result=on_result,
+                               quarantine=not args.keep_damaged)
+    except KeyboardInterrupt:
+        emit("summary", **summary)
+        return EXIT_CANCELLED
+
+    emit("summary", **summary)
+    return EXIT_FAILURES if any(outcome != library.RESULT_OK for outcome in summary) else EXIT_OK
+
+
+def run_import_opml(args, emit):
+    db.db_init()
+    added, skipped = opml.import_opml(args.file, args.dir)
+    emit("summary", added=added, skipped=skipped)
+    return EXIT_OK
+
+
+def run_export_opml(args, emit):
+    db.db_init()
+    emit("summary", exported=opml.export_opml(args.file))
+    return EXIT_OK
+
+
+def _host_rate(text):
+    host, separator, rate = text.partition("=")
+    if not separator or not host:
+        raise argparse.ArgumentTypeError(f"expected HOST=RATE, got {text!r}")
+    try:
+        return host.strip().lower(), bandwidth.parse_rate(rate)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _rate(text):
+    try:
+        return bandwidth.parse_rate(text) or 0
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _schedule(text):
+    try:
+        return bandwidth.parse_schedule(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m podcast_downloader", description="Podcast Downloader without the GUI.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sync = subparsers.add_parser("sync", help="Refresh saved podcasts and download the episodes that are missing.")
+    sync.add_argument("--podcast", action="append", metavar="NAME", help="Only sync this saved podcast (repeatable).")
+    sync.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help="Parallel downloads (default: %(default)s).")
+    sync.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST_LIMIT, help="Parallel downloads per host (default: %(default)s).")
+    sync.add_argument("--feed-workers", type=int, default=DEFAULT_FEED_WORKERS, help="Feeds refreshed in parallel (default: %(default)s).")
+    sync.add_argument("--parse-workers", type=int, help="Processes parsing large feeds (default: one per CPU core).")
+    sync.add_argument("--limit", type=int, help="Only consider the newest N episodes of each podcast.")
+    sync.add_argument("--no-download", action="store_true", help="Refresh feeds and the catalog, download nothing.")
+    sync.add_argument("--rate", type=_rate, help="Total speed limit, e.g. 512K or 2M per second (0 = unlimited).")
+    sync.add_argument("--host-rate", type=_host_rate, action="append", metavar="HOST=RATE", help="Speed limit for one host (repeatable).")
+    sync.add_argument("--schedule", type=_schedule, action="append", metavar="HH:MM-HH:MM=RATE",
+                      help="Total speed limit during a time of day, e.g. 09:00-18:00=1M (repeatable, replaces saved schedules).")
+    sync.add_argument("--save-limits", action="store_true", help="Remember the speed limits given here for later runs and the GUI.")
+    sync.add_argument("--db", help=f"Database file (default: {db.DB_NAME}).")
+
+    watch = subparsers.add_parser("watch", help="Keep refreshing saved podcasts, each at its own pace, and download "
+                                                "new episodes of those set to download automatically.")
+    watch.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help="Parallel downloads (default: %(default)s).")
+    watch.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST_LIMIT, help="Parallel downloads per host (default: %(default)s).")
+    watch.add_argument("--feed-workers", type=int, default=DEFAULT_FEED_WORKERS, help="Feeds refreshed in parallel (default: %(default)s).")
+    watch.add_argument("--parse-workers", type=int, help="Processes parsing large feeds, kept for the whole run (default: one per CPU core).")
+    watch.add_argument("--rate", type=_rate, help="Total speed limit, e.g. 512K or 2M per second (0 = unlimited).")
+    watch.add_argument("--host-rate", type=_host_rate, action="append", metavar="HOST=RATE", help="Speed limit for one host (repeatable).")
+    watch.add_argument("--schedule", type=_schedule, action="append", metavar="HH:MM-HH:MM=RATE",
+                       help="Total speed limit during a time of day, e.g. 09:00-18:00=1M (repeatable, replaces saved schedules).")
+    watch.add_argument("--save-limits", action="store_true", help="Remember the speed limits given here for later runs and the GUI.")
+    watch.add_argument("--db", help=f"Database file (default: {db.DB_NAME}).")
+
+    verify = subparsers.add_parser("verify", help="Check downloaded episodes against their recorded size and SHA-256.")
+    verify.add_argument("--podcast", action="append", metavar="NAME", help="Only check this saved podcast (repeatable).")
+    verify.add_argument("--processes", type=int, help="Hashing processes (default: one per CPU core).")
+    verify.add_argument("--keep-damaged", action="store_true", help=f"Do not rename damaged files to *{library.CORRUPT_SUFFIX}.")
+    verify.add_argument("--db", help=f"Database file (default: {db.DB_NAME}).")
+
+    import_opml = subparsers.add_parser("import-opml", help="Save the feeds of an OPML file as podcasts.")
+    import_opml.add_argument("file", help="OPML file exported by another podcast app.")
+    import_opml.add_argument("--dir", required=True, help="Folder under which each podcast gets its own download folder.")
+    import_opml.add_argument("--db", help=f"Database file (default: {db.DB_NAME}).")
+
+    export_opml = subparsers.add_parser("export-opml", help="Write the saved podcasts to an OPML file (without credentials).")
+    export_opml.add_argument("file", help="OPML file to write.")
+    export_opml.add_argument("--db", help=f"Database file (default: {db.DB_NAME}).")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.db:
+        db.DB_NAME = args.db
+
+    emit = JsonEmitter(sys.stdout)
+    # Everything else printed (warnings, per-item notes) goes to stderr to keep stdout parseable.
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            if args.command == "watch":
+                return run_watch(args, emit)
+            if args.command == "verify":
+                return run_verify(args, emit)
+            if args.command == "import-opml":
+                return run_import_opml(args, emit)
+            if args.command == "export-opml":
+                return run_export_opml(args, emit)
+            return run_sync(args, emit)
+        except Exception as e:
+            emit("error", message=str(e))
+            return EXIT_FAILURES
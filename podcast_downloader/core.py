@@ -0,0 +1,53 @@
+"""
+GUI-free entry point to the engine: feed fetching and parsing, the episode catalog and downloads.
+
+    from podcast_downloader import core
+    core.db_init()
+    result = core.load_feed(feed_url)
+
+Names are resolved on first use, so importing this module loads nothing but itself, and only
+the parts a script touches are imported. Nothing reachable from here imports Flet; the GUI
+(app.py, ui_components.py) sits on top and follows episodes through their `view` observer.
+"""
+import importlib
+
+_EXPORTS = {
+    # Feeds
+    "build_feed_url": ("feed_manager", "build_feed_url"),
+    "load_feed": ("feed_manager", "load_feed"),
+    "FeedResult": ("feed_manager", "FeedResult"),
+    "FeedStream": ("feed_parser", "FeedStream"),
+    # Catalog
+    "db_init": ("data_manager", "db_init"),
+    "db_get_podcasts": ("data_manager", "db_get_podcasts"),
+    "db_get_podcast_details": ("data_manager", "db_get_podcast_details"),
+    "db_get_episodes": ("data_manager", "db_get_episodes"),
+    "db_search_episodes": ("data_manager", "db_search_episodes"),
+    "Episode": ("models", "Episode"),
+    # Downloads
+    "download_episode": ("download_manager", "download_episode"),
+    "DownloadScheduler": ("download_manager", "DownloadScheduler"),
+    "enqueue": ("job_queue", "enqueue"),
+    "recover_interrupted": ("job_queue", "recover_interrupted"),
+    "run_single": ("job_queue", "run_single"),
+    "QueueRunner": ("job_queue", "QueueRunner"),
+    "limiter": ("bandwidth", "limiter"),
+    "downloaded_files": ("dir_index", "downloaded_files"),
+    "verify_library": ("library", "verify_library"),
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    try:
+        module_name, attribute = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(f".{module_name}", __package__), attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
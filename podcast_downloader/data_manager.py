@@ -1,51 +1,593 @@
-import sqlite3
+import json
+import os
+import time
+import re
 
-DB_NAME = "podcasts.db"
+from .database import open_database
+from .utils import adopt_legacy_path, data_dir, parse_duration, parse_pub_date
+
+LEGACY_DB_NAME = "podcasts.db"
+DEFAULT_DB_NAME = os.path.join(data_dir(), LEGACY_DB_NAME)
+# Absolute, so the GUI and the CLI use the same catalog whichever directory they are started from.
+DB_NAME = os.path.abspath(os.environ.get("PODCAST_DOWNLOADER_DB") or DEFAULT_DB_NAME)
+
+EPISODE_FIELDS = (
+    "ep_number", "title", "description", "image_src", "download_url", "filename",
+    "pub_date", "link", "duration", "author", "guid", "published_at", "duration_seconds"
+)
+
+def database():
+    """The shared connection layer (database.Database) of DB_NAME."""
+    return open_database(DB_NAME)
+
+def episode_key(guid, download_url):
+    """Stable identity of an episode inside its podcast: the GUID, or the enclosure URL without one."""
+    return guid or download_url
+
+def _create_schema(cursor):
+    """
+    Schema version 1: the tables as they were before the schema was versioned. Every statement
+    is idempotent, so databases created by older releases are brought up to date as well.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS podcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            feed_url TEXT NOT NULL,
+            download_dir TEXT NOT NULL,
+            username TEXT,
+            password TEXT
+        )
+    """)
+    _add_missing_columns(cursor, "podcasts", {
+        "auto_download": "INTEGER NOT NULL DEFAULT 0",
+    })
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS feed_cache (
+            feed_url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            body BLOB NOT NULL,
+            fetched_at REAL NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS episodes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            podcast_id INTEGER NOT NULL,
+            episode_key TEXT NOT NULL,
+            ep_number INTEGER NOT NULL DEFAULT 0,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL DEFAULT '',
+            image_src TEXT NOT NULL DEFAULT '',
+            download_url TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            pub_date TEXT NOT NULL DEFAULT '',
+            link TEXT NOT NULL DEFAULT '',
+            duration TEXT NOT NULL DEFAULT '',
+            author TEXT NOT NULL DEFAULT '',
+            guid TEXT NOT NULL DEFAULT '',
+            download_state TEXT NOT NULL DEFAULT 'new',
+            added_at REAL NOT NULL,
+            file_size INTEGER,
+            file_sha256 TEXT,
+            verified_at REAL,
+            UNIQUE (podcast_id, episode_key)
+        )
+    """)
+    _add_missing_columns(cursor, "episodes", {
+        "file_size": "INTEGER",
+        "file_sha256": "TEXT",
+        "verified_at": "REAL",
+    })
+    _init_search_index(cursor)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS artwork (
+            url TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS artwork_files (
+            content_hash TEXT PRIMARY KEY,
+            size_bytes INTEGER NOT NULL,
+            last_used REAL NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS download_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            podcast_id INTEGER,
+            download_dir TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            download_url TEXT NOT NULL,
+            episode TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            bytes_done INTEGER NOT NULL DEFAULT 0,
+            bytes_total INTEGER,
+            error TEXT,
+            owner TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            UNIQUE (download_dir, filename)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS download_jobs_state ON download_jobs (state)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS feed_schedule (
+            podcast_id INTEGER PRIMARY KEY,
+            next_poll_at REAL NOT NULL,
+            interval REAL NOT NULL,
+            failures INTEGER NOT NULL DEFAULT 0,
+            unchanged INTEGER NOT NULL DEFAULT 0,
+            ttl INTEGER,
+            skip_hours TEXT,
+            last_polled_at REAL
+        )
+    """)
+
+def _add_sort_values(cursor):
+    """Schema version 2: pubDate and itunes:duration as numbers, filled in for the episodes already cataloged."""
+    _add_missing_columns(cursor, "episodes", {
+        "published_at": "REAL",
+        "duration_seconds": "INTEGER",
+    })
+    rows = cursor.execute("SELECT id, pub_date, duration FROM episodes").fetchall()
+    cursor.executemany(
+        "UPDATE episodes SET published_at = ?, duration_seconds = ? WHERE id = ?",
+        [(parse_pub_date(pub_date), parse_duration(duration), episode_id) for episode_id, pub_date, duration in rows]
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS episodes_published ON episodes (podcast_id, published_at)")
+
+def _add_file_paths(cursor):
+    """
+    Schema version 3: where each downloaded file was written, so changing a podcast's folder
+    later does not make its earlier downloads look missing. Files downloaded before this
+    version are assumed to be in their podcast's current folder.
+    """
+    _add_missing_columns(cursor, "episodes", {
+        "file_path": "TEXT",
+    })
+    rows = cursor.execute("""
+        SELECT e.id, p.download_dir, e.filename
+        FROM episodes e JOIN podcasts p ON p.id = e.podcast_id
+        WHERE e.download_state = 'downloaded' AND e.file_path IS NULL
+    """).fetchall()
+    cursor.executemany(
+        "UPDATE episodes SET file_path = ? WHERE id = ?",
+        [(os.path.abspath(os.path.join(download_dir, filename)), episode_id) for episode_id, download_dir, filename in rows]
+    )
+
+# migrations[n] upgrades a database from schema version n to n + 1 (see Database.migrate).
+# Add new ones at the end; never change one that has shipped.
+MIGRATIONS = [
+    _create_schema,
+    _add_sort_values,
+    _add_file_paths,
+]
 
 def db_init():
-    """Creates the podcasts table if it doesn't exist."""
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS podcasts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE,
-                feed_url TEXT NOT NULL,
-                download_dir TEXT NOT NULL,
-                username TEXT,
-                password TEXT
-            )
-        """)
-        conn.commit()
+    """Creates the database, or upgrades an existing one to the current schema."""
+    # Older versions kept the catalog in the working directory: carry it over on first start.
+    if DB_NAME == DEFAULT_DB_NAME and adopt_legacy_path(DB_NAME, LEGACY_DB_NAME):
+        for suffix in ("-wal", "-shm"):
+            adopt_legacy_path(DB_NAME + suffix, LEGACY_DB_NAME + suffix)
+    database().migrate(MIGRATIONS)
+
+def _add_missing_columns(cursor, table, columns):
+    """Adds columns introduced after a table was first created to databases that predate them."""
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in cursor.fetchall()}
+    for name, definition in columns.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+def _init_search_index(cursor):
+    """Creates the FTS5 index over episode titles/descriptions and the triggers that keep it in sync."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'episodes_fts'")
+    index_exists = cursor.fetchone() is not None
+
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS episodes_fts USING fts5(
+            title, description,
+            content='episodes', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS episodes_fts_insert AFTER INSERT ON episodes BEGIN
+            INSERT INTO episodes_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS episodes_fts_delete AFTER DELETE ON episodes BEGIN
+            INSERT INTO episodes_fts (episodes_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS episodes_fts_update AFTER UPDATE OF title, description ON episodes BEGIN
+            INSERT INTO episodes_fts (episodes_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO episodes_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+    """)
+
+    if not index_exists:
+        # Databases created before the index existed already have episodes to index.
+        cursor.execute("INSERT INTO episodes_fts (episodes_fts) VALUES ('rebuild')")
 
 def db_get_podcasts():
     """Fetches all saved podcasts (ID and Name) for the dropdown."""
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name FROM podcasts ORDER BY name")
-        return cursor.fetchall()
+    with database().reader() as conn:
+        return conn.execute("SELECT id, name FROM podcasts ORDER BY name").fetchall()
+
+def db_get_all_podcast_details():
+    """Fetches every saved podcast with all its fields, by name."""
+    with database().reader(rows=True) as conn:
+        return conn.execute("SELECT * FROM podcasts ORDER BY name").fetchall()
 
 def db_get_podcast_details(podcast_id):
     """Fetches the details of a specific podcast by ID."""
-    with sqlite3.connect(DB_NAME) as conn:
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM podcasts WHERE id = ?", (podcast_id,))
-        return cursor.fetchone()
+    with database().reader(rows=True) as conn:
+        return conn.execute("SELECT * FROM podcasts WHERE id = ?", (podcast_id,)).fetchone()
 
 def db_save_podcast(name, url, dir, user, pwd):
     """Saves or updates a podcast in the database. Uses the NAME as a unique key."""
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT OR REPLACE INTO podcasts (name, feed_url, download_dir, username, password)
-            VALUES (?, ?, ?, ?, ?)
-        """, (name, url, dir, user, pwd))
-        conn.commit()
+    # Update in place (not INSERT OR REPLACE) so the podcast keeps its ID and its episode catalog.
+    database().execute("""
+        INSERT INTO podcasts (name, feed_url, download_dir, username, password)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET
+            feed_url = excluded.feed_url,
+            download_dir = excluded.download_dir,
+            username = excluded.username,
+            password = excluded.password
+    """, (name, url, dir, user, pwd))
+
+def db_import_podcasts(podcasts):
+    """
+    Adds many (name, feed_url, download_dir) podcasts in one transaction, e.g. from an OPML file.
+    Podcasts whose name or feed URL is already saved are left alone. Returns how many were added.
+    """
+    return database().executemany("""
+        INSERT INTO podcasts (name, feed_url, download_dir, username, password)
+        SELECT ?, ?, ?, NULL, NULL
+        WHERE NOT EXISTS (SELECT 1 FROM podcasts WHERE feed_url = ?)
+        ON CONFLICT(name) DO NOTHING
+    """, [(name, feed_url, download_dir, feed_url) for name, feed_url, download_dir in podcasts])
 
 def db_delete_podcast(podcast_id):
-    """Deletes a podcast from the database by ID."""
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM podcasts WHERE id = ?", (podcast_id,))
-        conn.commit()
\ No newline at end of file
+    """Deletes a podcast from the database by ID, with its episodes, polling state and download jobs."""
+    def delete(conn):
+        conn.execute("DELETE FROM podcasts WHERE id = ?", (podcast_id,))
+        conn.execute("DELETE FROM episodes WHERE podcast_id = ?", (podcast_id,))
+        conn.execute("DELETE FROM feed_schedule WHERE podcast_id = ?", (podcast_id,))
+        # Otherwise its queued and interrupted jobs would be resumed into the old folder after a restart.
+        conn.execute("DELETE FROM download_jobs WHERE podcast_id = ?", (podcast_id,))
+    database().write(delete)
+
+def db_set_auto_download(podcast_id, enabled):
+    """Turns automatic download of newly published episodes on or off for a podcast."""
+    database().execute("UPDATE podcasts SET auto_download = ? WHERE id = ?", (1 if enabled else 0, podcast_id))
+
+def db_get_poll_states():
+    """The feed polling state of every scheduled podcast, by podcast ID."""
+    with database().reader(rows=True) as conn:
+        return {row["podcast_id"]: row for row in conn.execute("SELECT * FROM feed_schedule")}
+
+def db_save_poll_state(podcast_id, next_poll_at, interval, failures, unchanged, ttl, skip_hours, last_polled_at):
+    database().execute("""
+        INSERT OR REPLACE INTO feed_schedule
+            (podcast_id, next_poll_at, interval, failures, unchanged, ttl, skip_hours, last_polled_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (podcast_id, next_poll_at, interval, failures, unchanged, ttl,
+          json.dumps(sorted(skip_hours)) if skip_hours else None, last_polled_at))
+
+def db_get_feed_cache(feed_url):
+    """Fetches the cached validators and zlib-compressed body of a feed, or None."""
+    with database().reader(rows=True) as conn:
+        return conn.execute("SELECT * FROM feed_cache WHERE feed_url = ?", (feed_url,)).fetchone()
+
+def db_save_feed_cache(feed_url, etag, last_modified, body):
+    """Stores the latest snapshot of a feed. `body` must already be zlib-compressed."""
+    database().execute("""
+        INSERT OR REPLACE INTO feed_cache (feed_url, etag, last_modified, body, fetched_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, (feed_url, etag, last_modified, body, time.time()))
+
+def db_touch_feed_cache(feed_url):
+    """Marks a cached feed as revalidated (after a 304) without rewriting its body."""
+    database().execute("UPDATE feed_cache SET fetched_at = ? WHERE feed_url = ?", (time.time(), feed_url))
+
+def db_upsert_episodes(podcast_id, episodes):
+    """
+    Inserts new episodes and updates changed ones for a podcast, in a single transaction.
+    Rows whose fields are unchanged are left untouched. Returns the number of rows written.
+    """
+    now = time.time()
+    rows = [
+        (podcast_id, episode_key(episode["guid"], episode["download_url"]), *(episode[field] for field in EPISODE_FIELDS), now)
+        for episode in episodes
+    ]
+    columns = ", ".join(EPISODE_FIELDS)
+    placeholders = ", ".join("?" for _ in EPISODE_FIELDS)
+    assignments = ", ".join(f"{field} = excluded.{field}" for field in EPISODE_FIELDS)
+    changed = " OR ".join(f"episodes.{field} IS NOT excluded.{field}" for field in EPISODE_FIELDS)
+
+    # rowcount, unlike total_changes, leaves out the rows written by the search index triggers.
+    return database().executemany(f"""
+        INSERT INTO episodes (podcast_id, episode_key, {columns}, added_at)
+        VALUES (?, ?, {placeholders}, ?)
+        ON CONFLICT(podcast_id, episode_key) DO UPDATE SET {assignments}
+        WHERE {changed}
+    """, rows)
+
+def db_get_episodes(podcast_id):
+    """Fetches the cataloged episodes of a podcast, newest number first."""
+    with database().reader(rows=True) as conn:
+        return conn.execute(
+            "SELECT * FROM episodes WHERE podcast_id = ? ORDER BY ep_number DESC",
+            (podcast_id,)
+        ).fetchall()
+
+def db_get_episode_description(podcast_id, key):
+    """Reads one episode's description, for episodes that do not keep it in memory."""
+    with database().reader() as conn:
+        row = conn.execute(
+            "SELECT description FROM episodes WHERE podcast_id = ? AND episode_key = ?",
+            (podcast_id, key)
+        ).fetchone()
+    return row[0] if row else None
+
+def db_get_episode_descriptions(podcast_id, keys):
+    """Reads the descriptions of several episodes of a podcast at once, as {episode_key: description}."""
+    keys = list(keys)
+    descriptions = {}
+    with database().reader() as conn:
+        # Chunked to stay under SQLite's limit on query parameters.
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            descriptions.update(conn.execute(
+                f"SELECT episode_key, description FROM episodes WHERE podcast_id = ? AND episode_key IN ({', '.join('?' * len(chunk))})",
+                (podcast_id, *chunk)
+            ).fetchall())
+    return descriptions
+
+def db_get_episode_keys(podcast_id):
+    """The keys of every cataloged episode of a podcast, as a set."""
+    with database().reader() as conn:
+        return {row[0] for row in conn.execute("SELECT episode_key FROM episodes WHERE podcast_id = ?", (podcast_id,))}
+
+def db_get_publish_times(podcast_id, limit=None):
+    """The publication timestamps of a podcast's dated episodes, latest first."""
+    sql = """
+        SELECT published_at FROM episodes WHERE podcast_id = ? AND published_at IS NOT NULL
+        ORDER BY published_at DESC
+    """
+    params = [podcast_id]
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    with database().reader() as conn:
+        return [row[0] for row in conn.execute(sql, params)]
+
+def db_has_cached_episodes(podcast_id, feed_url):
+    """True when a podcast can be shown without a network call (catalog rows or a feed snapshot)."""
+    with database().reader() as conn:
+        row = conn.execute("""
+            SELECT EXISTS(SELECT 1 FROM episodes WHERE podcast_id = ?)
+                OR EXISTS(SELECT 1 FROM feed_cache WHERE feed_url = ?)
+        """, (podcast_id, feed_url)).fetchone()
+    return bool(row[0])
+
+def db_set_episode_state(podcast_id, key, state):
+    """Records the download state ('new', 'downloaded', 'failed') of a cataloged episode."""
+    database().execute(
+        "UPDATE episodes SET download_state = ? WHERE podcast_id = ? AND episode_key = ?",
+        (state, podcast_id, key)
+    )
+
+def db_record_download(podcast_id, key, file_path, file_size, file_sha256):
+    """Marks a cataloged episode as downloaded and stores the absolute path, size and SHA-256 of the finished file."""
+    database().execute("""
+        UPDATE episodes SET download_state = 'downloaded', file_path = ?, file_size = ?, file_sha256 = ?, verified_at = ?
+        WHERE podcast_id = ? AND episode_key = ?
+    """, (os.path.abspath(file_path), file_size, file_sha256, time.time(), podcast_id, key))
+
+def db_get_recorded_files(podcast_ids=None):
+    """Fetches the downloaded episodes that have a recorded path, size and hash (of `podcast_ids` only, when given)."""
+    query = """
+        SELECT podcast_id, episode_key, file_path, file_size, file_sha256
+        FROM episodes
+        WHERE download_state = 'downloaded' AND file_sha256 IS NOT NULL AND file_path IS NOT NULL
+    """
+    params = ()
+    if podcast_ids is not None:
+        params = tuple(podcast_ids)
+        query += f" AND podcast_id IN ({', '.join('?' * len(params))})"
+    with database().reader(rows=True) as conn:
+        return conn.execute(query, params).fetchall()
+
+def db_save_verification(verified, failed):
+    """
+    Stores the outcome of a library check: `verified` is a list of (podcast_id, episode_key) whose
+    files matched, `failed` a list of (podcast_id, episode_key, state) for those that did not.
+    """
+    now = time.time()
+    def save(conn):
+        conn.executemany(
+            "UPDATE episodes SET verified_at = ? WHERE podcast_id = ? AND episode_key = ?",
+            [(now, podcast_id, key) for podcast_id, key in verified]
+        )
+        conn.executemany(
+            "UPDATE episodes SET download_state = ?, verified_at = ? WHERE podcast_id = ? AND episode_key = ?",
+            [(state, now, podcast_id, key) for podcast_id, key, state in failed]
+        )
+    database().write(save)
+
+def build_fts_query(search_text):
+    """
+    Turns user input into an FTS5 MATCH expression.
+    "Quoted text" is kept as a phrase; every other word becomes a prefix term. All parts must match.
+    """
+    parts = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', search_text):
+        if phrase:
+            tokens = re.findall(r"\w+", phrase)
+            if tokens:
+                parts.append('"' + " ".join(tokens) + '"')
+        else:
+            for token in re.findall(r"\w+", word):
+                parts.append(f'"{token}"*')
+    return " ".join(parts)
+
+def db_search_episodes(search_text, podcast_id=None, limit=None):
+    """
+    Full-text searches episode titles and descriptions, best matches first (title hits weigh more).
+    Searches every saved podcast when podcast_id is None. Returns (podcast_id, episode_key) rows.
+    """
+    match_query = build_fts_query(search_text)
+    if not match_query:
+        return []
+
+    sql = """
+        SELECT e.podcast_id, e.episode_key
+        FROM episodes_fts
+        JOIN episodes e ON e.id = episodes_fts.rowid
+        WHERE episodes_fts MATCH ?
+    """
+    params = [match_query]
+    if podcast_id is not None:
+        sql += " AND e.podcast_id = ?"
+        params.append(podcast_id)
+    sql += " ORDER BY bm25(episodes_fts, 10.0, 1.0)"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    with database().reader() as conn:
+        return conn.execute(sql, params).fetchall()
+
+def db_get_artwork_index():
+    """Fetches the URL -> content hash map of every cached artwork."""
+    with database().reader() as conn:
+        return dict(conn.execute("SELECT url, content_hash FROM artwork"))
+
+def db_save_artwork(url, content_hash, size_bytes):
+    """Records a cached artwork. Several URLs may share one content hash (and one set of files)."""
+    now = time.time()
+    def save(conn):
+        conn.execute("INSERT OR REPLACE INTO artwork (url, content_hash) VALUES (?, ?)", (url, content_hash))
+        conn.execute("""
+            INSERT INTO artwork_files (content_hash, size_bytes, last_used) VALUES (?, ?, ?)
+            ON CONFLICT(content_hash) DO UPDATE SET last_used = excluded.last_used
+        """, (content_hash, size_bytes, now))
+    database().write(save)
+
+def db_touch_artwork(last_used_by_hash):
+    """Stores the last-use times ({content_hash: timestamp}) gathered in memory since the last call."""
+    database().executemany(
+        "UPDATE artwork_files SET last_used = MAX(last_used, ?) WHERE content_hash = ?",
+        [(used, content_hash) for content_hash, used in last_used_by_hash.items()]
+    )
+
+def db_get_artwork_files_lru():
+    """Fetches (content_hash, size_bytes) of cached artwork files, least recently used first."""
+    with database().reader() as conn:
+        return conn.execute("SELECT content_hash, size_bytes FROM artwork_files ORDER BY last_used").fetchall()
+
+def db_delete_artwork_files(content_hashes):
+    """Forgets evicted artwork files and every URL pointing at them."""
+    params = [(content_hash,) for content_hash in content_hashes]
+    def delete(conn):
+        conn.executemany("DELETE FROM artwork WHERE content_hash = ?", params)
+        conn.executemany("DELETE FROM artwork_files WHERE content_hash = ?", params)
+    database().write(delete)
+
+def db_get_setting(key, default=None):
+    """Fetches an application setting stored as JSON, or `default` when it was never saved."""
+    with database().reader() as conn:
+        row = conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+    return json.loads(row[0]) if row else default
+
+def db_set_setting(key, value):
+    """Stores an application setting as JSON."""
+    database().execute("""
+        INSERT INTO settings (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+    """, (key, json.dumps(value)))
+
+def db_enqueue_jobs(jobs):
+    """
+    Queues downloads given as (podcast_id, download_dir, filename, download_url, episode_json).
+    A job for the same target file is queued again unless it is running. Returns the rows written.
+    """
+    now = time.time()
+    return database().executemany("""
+        INSERT INTO download_jobs (podcast_id, download_dir, filename, download_url, episode, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(download_dir, filename) DO UPDATE SET
+            podcast_id = excluded.podcast_id,
+            download_url = excluded.download_url,
+            episode = excluded.episode,
+            state = 'queued',
+            error = NULL,
+            updated_at = excluded.updated_at
+        WHERE download_jobs.state != 'running'
+    """, [(*job, now, now) for job in jobs])
+
+def db_get_jobs(states=None):
+    """Fetches download jobs, oldest first, optionally only those in the given states."""
+    query = "SELECT * FROM download_jobs"
+    params = ()
+    if states:
+        query += f" WHERE state IN ({', '.join('?' for _ in states)})"
+        params = tuple(states)
+    with database().reader(rows=True) as conn:
+        return conn.execute(query + " ORDER BY id", params).fetchall()
+
+def db_get_job(download_dir, filename):
+    """Fetches the job that downloads into a given file, if any."""
+    with database().reader(rows=True) as conn:
+        return conn.execute(
+            "SELECT * FROM download_jobs WHERE download_dir = ? AND filename = ?", (download_dir, filename)
+        ).fetchone()
+
+def db_claim_job(job_id, owner):
+    """Marks a queued job as running for `owner`. False if another runner got to it first."""
+    return database().execute("""
+        UPDATE download_jobs SET state = 'running', owner = ?, attempts = attempts + 1, updated_at = ?
+        WHERE id = ? AND state = 'queued'
+    """, (owner, time.time(), job_id)) == 1
+
+def db_update_job_progress(progress):
+    """Stores (job_id, bytes_done, bytes_total) of running jobs; also serves as their heartbeat."""
+    now = time.time()
+    database().executemany(
+        "UPDATE download_jobs SET bytes_done = ?, bytes_total = ?, updated_at = ? WHERE id = ? AND state = 'running'",
+        [(bytes_done, bytes_total, now, job_id) for job_id, bytes_done, bytes_total in progress]
+    )
+
+def db_finish_job(job_id, state, bytes_done, bytes_total, error=None):
+    database().execute("""
+        UPDATE download_jobs SET state = ?, bytes_done = ?, bytes_total = ?, error = ?, owner = NULL, updated_at = ?
+        WHERE id = ?
+    """, (state, bytes_done, bytes_total, error, time.time(), job_id))
+
+def db_set_jobs_state(job_ids, state, from_state):
+    """Moves the given jobs that are in `from_state` to `state` (e.g. queued -> cancelled)."""
+    now = time.time()
+    database().executemany(
+        "UPDATE download_jobs SET state = ?, owner = NULL, updated_at = ? WHERE id = ? AND state = ?",
+        [(state, now, job_id, from_state) for job_id in job_ids]
+    )
+
+def db_delete_jobs_done_before(timestamp):
+    """Forgets completed jobs last touched before `timestamp`."""
+    database().execute("DELETE FROM download_jobs WHERE state = 'done' AND updated_at < ?", (timestamp,))
@@ -0,0 +1,209 @@
+import atexit
+import contextlib
+import os
+import queue
+import sqlite3
+import threading
+
+# Seconds a connection waits for a lock held by another process (the GUI and `sync` share the file).
+BUSY_TIMEOUT = 5.0
+# Idle reader connections kept open; more may be opened under load, the extra ones are closed.
+READER_POOL_SIZE = 4
+# Most write requests committed together in one transaction.
+MAX_WRITE_BATCH = 256
+
+
+class _WriteRequest:
+    __slots__ = ("func", "args", "done", "result", "error")
+
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _connect(path, check_same_thread=True):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=check_same_thread)
+    # NORMAL is safe in WAL mode: a power loss can only lose the last commits, never corrupt the file.
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+class Database:
+    """
+    Thread-safe access to one SQLite file in WAL mode, so reads never wait for writes.
+
+    All writes go through a single long-lived connection owned by a writer thread. Callers hand
+    it a function through write()/execute() and block until it is committed; requests that
+    queue up meanwhile are committed together in one transaction (each inside its own savepoint,
+    so one failing request does not undo the others). Reads use a small pool of read-only
+    connections. Write functions must not commit themselves.
+    """
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.pid = os.getpid()
+        self._requests = queue.SimpleQueue()
+        self._readers = queue.LifoQueue(maxsize=READER_POOL_SIZE)
+        self._closed = False
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = _connect(self.path)
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+        finally:
+            conn.close()
+
+        self._writer = threading.Thread(target=self._write_loop, name="db-writer", daemon=True)
+        self._writer.start()
+
+    @contextlib.contextmanager
+    def reader(self, rows=False):
+        """A pooled read-only connection; with rows=True its queries return sqlite3.Row objects."""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = _connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON")
+        conn.row_factory = sqlite3.Row if rows else None
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._readers.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def write(self, func, *args):
+        """Runs func(conn, *args) on the writer connection and returns its result once committed."""
+        if threading.current_thread() is self._writer:
+            # Already inside a write request (e.g. a migration calling a helper).
+            return func(self._conn, *args)
+        if self._closed:
+            raise sqlite3.ProgrammingError(f"Database {self.path} is closed.")
+        request = _WriteRequest(func, args)
+        self._requests.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def execute(self, sql, params=()):
+        """Runs one write statement; returns the number of rows it changed."""
+        return self.write(lambda conn: conn.execute(sql, params).rowcount)
+
+    def executemany(self, sql, seq_of_params):
+        """Runs one write statement for every parameter tuple; returns the number of rows changed."""
+        return self.write(lambda conn: conn.executemany(sql, seq_of_params).rowcount)
+
+    def migrate(self, migrations):
+        """
+        Brings the schema up to date: migrations[n] takes a database from version n to n + 1
+        (kept in PRAGMA user_version). Pending ones run in a single transaction.
+        """
+        def run(conn):
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, migration in enumerate(migrations[version:], start=version + 1):
+                migration(conn.cursor())
+                conn.execute(f"PRAGMA user_version = {number}")
+            return len(migrations) - version
+        return self.write(run)
+
+    def _write_loop(self):
+        self._conn = _connect(self.path)
+        try:
+            while True:
+                request = self._requests.get()
+                if request is None:
+                    return
+                batch = [request]
+                stop = False
+                while len(batch) < MAX_WRITE_BATCH:
+                    try:
+                        request = self._requests.get_nowait()
+                    except queue.Empty:
+                        break
+                    if request is None:
+                        stop = True
+                        break
+                    batch.append(request)
+                self._commit(batch)
+                if stop:
+                    return
+        finally:
+            self._conn.close()
+
+    def _commit(self, batch):
+        conn = self._conn
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for request in batch:
+                conn.execute("SAVEPOINT request")
+                try:
+                    request.result = request.func(conn, *request.args)
+                    conn.execute("RELEASE request")
+                except BaseException as e:
+                    request.error = e
+                    conn.execute("ROLLBACK TO request")
+                    conn.execute("RELEASE request")
+            conn.execute("COMMIT")
+        except Exception as e:
+            # The transaction itself failed (disk full, lock timeout): nothing in it was stored.
+            if conn.in_transaction:
+                conn.rollback()
+            for request in batch:
+                if request.error is None:
+                    request.result, request.error = None, e
+        finally:
+            for request in batch:
+                request.done.set()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        """Commits what is queued, stops the writer and closes every connection."""
+        if self._closed:
+            return
+        self._closed = True
+        if os.getpid() == self.pid:
+            self._requests.put(None)
+            self._writer.join()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def open_database(path):
+    """The shared Database of `path` for this process, opened on first use."""
+    path = os.path.abspath(path)
+    database = _databases.get(path)
+    if database is None or database.closed or database.pid != os.getpid():
+        with _databases_lock:
+            database = _databases.get(path)
+            # A forked child gets its own writer; the parent's thread does not exist there.
+            if database is None or database.closed or database.pid != os.getpid():
+                database = _databases[path] = Database(path)
+    return database
+
+
+def close_all():
+    with _databases_lock:
+        databases = list(_databases.values())
+        _databases.clear()
+    for database in databases:
+        if database.pid == os.getpid():
+            database.close()
+
+
+atexit.register(close_all)
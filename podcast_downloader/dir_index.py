@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+
+# A directory listing is trusted for this long before its mtime is checked again.
+REVALIDATE_SECONDS = 2.0
+
+
+def _key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+class _Listing:
+    def __init__(self, names, mtime_ns, checked):
+        self.names = names
+        self.mtime_ns = mtime_ns
+        self.checked = checked
+
+
+class DirectoryIndex:
+    """
+    In-memory index of the files in each download directory, so "is this episode already
+    downloaded?" is a set lookup instead of a stat per episode (slow on NAS/SMB shares).
+    A directory is listed with a single os.scandir pass the first time it is asked about.
+    The downloader reports the files it creates; other changes are picked up through
+    filesystem notifications when watchdog is installed, and otherwise by re-listing a
+    directory whose mtime changed (one stat per directory, at most every REVALIDATE_SECONDS).
+    """
+    def __init__(self, watch=True):
+        self._lock = threading.Lock()
+        self._listings = {}
+        self._observer = None
+        self._watched = set()
+        self._watch = watch
+
+    def _scan(self, directory):
+        names = set()
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file():
+                            names.add(os.path.normcase(entry.name))
+                    except OSError:
+                        pass
+        except FileNotFoundError:
+            mtime_ns = None
+        except OSError as e:
+            print(f"Error listing {directory}: {e}")
+            mtime_ns = None
+        return _Listing(names, mtime_ns, time.monotonic())
+
+    def _mtime_ns(self, directory):
+        try:
+            return os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+
+    def _listing(self, directory):
+        """Returns the current listing of a directory. Caller holds the lock."""
+        key = _key(directory)
+        listing = self._listings.get(key)
+        now = time.monotonic()
+        if listing is None:
+            listing = self._listings[key] = self._scan(key)
+            self._start_watching(key, listing)
+        elif now - listing.checked >= REVALIDATE_SECONDS:
+            listing.checked = now
+            if self._mtime_ns(key) != listing.mtime_ns:
+                listing = self._listings[key] = self._scan(key)
+                self._start_watching(key, listing)
+        return listing
+
+    def exists(self, path):
+        """True if `path` is a file in its (indexed) directory."""
+        directory, name = os.path.split(path)
+        with self._lock:
+            return os.path.normcase(name) in self._listing(directory).names
+
+    def add(self, path):
+        """Records a file the application has just written."""
+        self._update(path, present=True)
+
+    def discard(self, path):
+        self._update(path, present=False)
+
+    def _update(self, path, present):
+        directory, name = os.path.split(path)
+        with self._lock:
+            listing = self._listings.get(_key(directory))
+            if listing is None:
+                return
+            if present:
+                listing.names.add(os.path.normcase(name))
+            else:
+                listing.names.discard(os.path.normcase(name))
+            # Our own write changed the directory mtime; no need to list it again for that.
+            listing.mtime_ns = self._mtime_ns(directory)
+
+    def invalidate(self, directory=None):
+        """Forgets one directory (or all of them) so it is listed again on the next lookup."""
+        with self._lock:
+            if directory is None:
+                self._listings.clear()
+            else:
+                self._listings.pop(_key(directory), None)
+
+    def _start_watching(self, key, listing):
+        """Caller holds the lock."""
+        if not self._watch or key in self._watched or listing.mtime_ns is None:
+            return
+        try:
+            if self._observer is None:
+                try:
+                    from watchdog.observers import Observer
+                except ImportError:  # watchdog is optional: without it the index relies on directory mtimes.
+                    self._watch = False
+                    return
+                self._observer = Observer()
+                self._observer.daemon = True
+                self._observer.start()
+            self._observer.schedule(_EventHandler(self), key, recursive=False)
+            self._watched.add(key)
+        except Exception as e:
+            # Some network filesystems cannot be watched; mtime revalidation still applies.
+            print(f"Cannot watch {key} for changes: {e}")
+            self._watched.add(key)
+
+
+class _EventHandler:
+    """Minimal watchdog handler: watchdog only needs a dispatch(event) method."""
+    def __init__(self, index):
+        self.index = index
+
+    def dispatch(self, event):
+        if event.is_directory:
+            return
+        if event.event_type == "created":
+            self.index.add(event.src_path)
+        elif event.event_type == "deleted":
+            self.index.discard(event.src_path)
+        elif event.event_type == "moved":
+            self.index.discard(event.src_path)
+            self.index.add(event.dest_path)
+
+
+downloaded_files = DirectoryIndex()
@@ -0,0 +1,736 @@
+import contextlib
+import threading
+import time
+import urllib.parse
+import json
+import os
+import re
+from collections import deque
+
+from . import data_manager as db
+from . import http_client
+from . import retry
+from .bandwidth import limiter, PRIORITY_BATCH
+from .dir_index import downloaded_files
+from .library import new_hasher, hash_file
+from .stream_io import AdaptiveChunkSize, iter_chunks, ensure_free_space, preallocate
+from .models import STATUS_NEW, STATUS_DOWNLOADED, STATUS_DOWNLOADING, STATUS_DONE, STATUS_FAILED, STATUS_RETRYING
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_PER_HOST_LIMIT = 2
+WORKER_CHOICES = [1, 2, 4, 6, 8]
+
+PART_SUFFIX = ".part"
+RESUME_META_SUFFIX = ".part.json"
+
+# Files at least this large are fetched as several parallel byte ranges when the server allows it.
+SEGMENT_THRESHOLD = 64 * 1024 * 1024
+DEFAULT_SEGMENTS = 4
+SEGMENT_RETRIES = 3
+SEGMENT_RETRY_DELAY = 1.0
+# Segment progress is written to the resume metadata every this many bytes.
+SEGMENT_SAVE_INTERVAL = 16 * 1024 * 1024
+
+
+def host_of(url):
+    """Returns the lowercase host of a URL, used as the key for per-host limits."""
+    try:
+        return (urllib.parse.urlsplit(url).hostname or "").lower()
+    except ValueError:
+        return ""
+
+
+class HostConnections:
+    """
+    Counts the connections open to each host by every download of the process, segments
+    included, so one large download cannot push a host past its per-host limit.
+    """
+    def __init__(self):
+        self._active = {}
+        self._lock = threading.Lock()
+
+    def active(self, host):
+        with self._lock:
+            return self._active.get(host, 0)
+
+    def acquire(self, host, wanted, limit):
+        """Takes up to `wanted` connections to `host` without going over `limit`. Returns how many were taken (maybe 0)."""
+        with self._lock:
+            count = max(0, min(wanted, limit - self._active.get(host, 0)))
+            if count:
+                self._active[host] = self._active.get(host, 0) + count
+            return count
+
+    def release(self, host, count=1):
+        if not count:
+            return
+        with self._lock:
+            remaining = self._active.get(host, 0) - count
+            if remaining > 0:
+                self._active[host] = remaining
+            else:
+                self._active.pop(host, None)
+
+
+# Shared by every scheduler and download in the process, like bandwidth.limiter.
+host_connections = HostConnections()
+# The per-host limit of the scheduler running the current thread's job.
+_job_context = threading.local()
+# How often a download waiting for a free connection to its host checks again.
+HOST_SLOT_WAIT_SECONDS = 0.5
+
+
+@contextlib.contextmanager
+def extra_connections(host, wanted):
+    """
+    Reserves up to `wanted` connections to `host` on top of the one the running job already
+    holds, within its scheduler's per-host limit. Yields how many were reserved.
+    """
+    count = host_connections.acquire(host, wanted, getattr(_job_context, "per_host_limit", DEFAULT_PER_HOST_LIMIT))
+    try:
+        yield count
+    finally:
+        host_connections.release(host, count)
+
+
+def acquire_host_slot(host, cancel_event, limit=DEFAULT_PER_HOST_LIMIT, on_wait=None):
+    """
+    Takes one connection to `host` for a download run outside a DownloadScheduler, waiting while
+    the host is at `limit`, as a scheduler would; `on_wait()` is called once if it has to wait.
+    Returns False if `cancel_event` is set first. Pair with release_host_slot(host) in the same thread.
+    """
+    waiting = False
+    while not host_connections.acquire(host, 1, limit):
+        if not waiting and on_wait is not None:
+            on_wait()
+        waiting = True
+        if cancel_event.wait(HOST_SLOT_WAIT_SECONDS):
+            return False
+    _job_context.per_host_limit = limit
+    return True
+
+
+def release_host_slot(host):
+    _job_context.per_host_limit = DEFAULT_PER_HOST_LIMIT
+    host_connections.release(host)
+
+
+def part_path_for(full_file_path):
+    return full_file_path + PART_SUFFIX
+
+
+def load_resume_state(full_file_path):
+    """
+    Returns (resume_from, validator) for a previously interrupted download.
+    resume_from is 0 when there is no usable partial file. The validator is the
+    ETag or Last-Modified value the partial bytes were fetched under.
+    A file still marked as preallocated was not trimmed to its real content (the
+    process died mid-download), so its size says nothing and it starts over.
+    Multi-segment downloads are resumed through load_segment_state instead.
+    """
+    part_path = part_path_for(full_file_path)
+    meta = _load_resume_meta(full_file_path)
+    try:
+        size = os.path.getsize(part_path)
+    except OSError:
+        return 0, None
+    validator = meta.get("etag") or meta.get("last_modified")
+    if not validator or meta.get("preallocated") or meta.get("segments"):
+        return 0, None
+    return size, validator
+
+
+def load_segment_state(full_file_path):
+    """
+    Returns (validators, segments) of an interrupted multi-segment download, or (None, None).
+    `segments` is a list of [start, end, done] byte counters for the preallocated .part file.
+    """
+    meta = _load_resume_meta(full_file_path)
+    segments = meta.get("segments")
+    if not segments or not (meta.get("etag") or meta.get("last_modified")):
+        return None, None
+    try:
+        if os.path.getsize(part_path_for(full_file_path)) != segments[-1][1]:
+            return None, None
+    except OSError:
+        return None, None
+    return {"ETag": meta.get("etag"), "Last-Modified": meta.get("last_modified")}, segments
+
+
+def _load_resume_meta(full_file_path):
+    try:
+        with open(full_file_path + RESUME_META_SUFFIX, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return meta if isinstance(meta, dict) else {}
+
+
+def resume_validator(response_headers):
+    """The value to send in If-Range: the ETag, or Last-Modified when there is only a weak ETag."""
+    etag = response_headers.get("ETag")
+    # Weak ETags are not allowed in If-Range, fall back to Last-Modified for those.
+    if etag and etag.startswith("W/"):
+        etag = None
+    return etag or response_headers.get("Last-Modified")
+
+
+def save_resume_state(full_file_path, url, response_headers, preallocated=False, segments=None):
+    """Records the validators of a response (and segment progress) so the partial file can be resumed later."""
+    etag = response_headers.get("ETag")
+    if etag and etag.startswith("W/"):
+        etag = None
+    meta = {
+        "url": url,
+        "etag": etag,
+        "last_modified": response_headers.get("Last-Modified"),
+        "preallocated": preallocated,
+    }
+    if segments is not None:
+        meta["segments"] = segments
+    try:
+        with open(full_file_path + RESUME_META_SUFFIX, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+    except OSError as e:
+        print(f"Error saving resume state for {full_file_path}: {e}")
+
+
+def clear_resume_state(full_file_path, remove_part=False):
+    paths = [full_file_path + RESUME_META_SUFFIX]
+    if remove_part:
+        paths.append(part_path_for(full_file_path))
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing {path}: {e}")
+
+
+def build_range_headers(headers, resume_from, validator):
+    """Adds Range/If-Range to a copy of `headers` when there are bytes to resume from."""
+    request_headers = dict(headers)
+    if resume_from > 0 and validator:
+        request_headers["Range"] = f"bytes={resume_from}-"
+        request_headers["If-Range"] = validator
+    return request_headers
+
+
+def parse_content_range(value):
+    """Parses 'bytes start-end/total' into (start, total). Unknown parts are None."""
+    match = re.match(r"\s*bytes\s+(?:(\d+)-\d+|\*)/(\d+|\*)", value or "")
+    if not match:
+        return None, None
+    start = int(match.group(1)) if match.group(1) is not None else None
+    total = int(match.group(2)) if match.group(2) != "*" else None
+    return start, total
+
+
+def record_download_state(episode, state):
+    if episode.podcast_id is None:
+        return
+    try:
+        db.db_set_episode_state(episode.podcast_id, db.episode_key(episode.guid, episode.download_url), state)
+    except Exception as e:
+        print(f"Error recording download state of {episode.filename}: {e}")
+
+
+def record_download_result(episode, file_size, file_sha256):
+    if episode.podcast_id is None:
+        return
+    try:
+        db.db_record_download(episode.podcast_id, db.episode_key(episode.guid, episode.download_url),
+                             episode.full_file_path, file_size, file_sha256)
+    except Exception as e:
+        print(f"Error recording download of {episode.filename}: {e}")
+
+
+def plan_segments(total_size, count=DEFAULT_SEGMENTS):
+    """Splits [0, total_size) into `count` contiguous [start, end, done] ranges."""
+    step = -(-total_size // count)
+    return [[start, min(start + step, total_size), 0] for start in range(0, total_size, step)]
+
+
+def can_split(response, total_size, length_checked):
+    """True when a full response announces a large, range-capable, validated body worth fetching in segments."""
+    return (
+        response.status_code == 200
+        and length_checked
+        and total_size >= SEGMENT_THRESHOLD
+        and "bytes" in response.headers.get("accept-ranges", "").lower()
+        and resume_validator(response.headers) is not None
+    )
+
+
+def _write_all(f, data):
+    """Writes a whole buffer to an unbuffered file, which may accept it in several parts."""
+    while data:
+        written = f.write(data)
+        data = data[written:]
+
+
+class SegmentError(IOError):
+    """The server stopped honouring ranges for this file (e.g. it changed); retrying a segment will not help."""
+
+
+class SegmentedDownload:
+    """
+    Fetches one large file as several byte ranges in parallel, each written at its offset of
+    the preallocated .part file. Per-segment progress is kept in the resume metadata, so an
+    interrupted download continues every segment where it stopped. A failing segment is
+    retried on its own; if it keeps failing the others are stopped and the error is raised.
+    At most `connections` segments are fetched at once; the others wait for a free connection.
+    """
+    def __init__(self, episode, headers, cancel_event, priority, validators, segments):
+        self.episode = episode
+        self.headers = headers
+        self.cancel_event = cancel_event
+        self.priority = priority
+        self.validators = validators
+        self.segments = segments
+        self.total_size = segments[-1][1]
+        self.part_path = part_path_for(episode.full_file_path)
+        self.host = host_of(episode.download_url)
+        self.error = None
+
+        self._lock = threading.Lock()
+        self._failed = threading.Event()
+        self._saved_at = self.downloaded
+        self._last_percent = -1
+
+    @property
+    def downloaded(self):
+        return sum(done for _, _, done in self.segments)
+
+    def unfinished(self):
+        return [index for index, (start, end, done) in enumerate(self.segments) if done < end - start]
+
+    def run(self, first_response=None, connections=None):
+        """
+        Downloads every unfinished segment over at most `connections` connections (one per
+        segment by default); `first_response` (a full 200 body) serves the first segment.
+        """
+        pending = deque(self.unfinished())
+        if connections is None:
+            connections = len(pending)
+
+        def work():
+            while not self._stopped():
+                with self._lock:
+                    if not pending:
+                        return
+                    index = pending.popleft()
+                # The first segment is taken first, so its response is not left waiting.
+                response = first_response if index == 0 and self.segments[0][2] == 0 else None
+                self._run_segment(index, response)
+
+        threads = [
+            threading.Thread(target=work, name=f"segment-{n}", daemon=True)
+            for n in range(max(1, min(connections, len(pending))))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self._save()
+        if self.error is not None:
+            raise self.error
+
+    def _stopped(self):
+        return self.cancel_event.is_set() or self._failed.is_set()
+
+    def _run_segment(self, index, response):
+        attempts = 0
+        while not self._stopped():
+            try:
+                self._fetch(index, response)
+                return
+            except Exception as e:
+                response = None
+                attempts += 1
+                if isinstance(e, SegmentError) or attempts > SEGMENT_RETRIES:
+                    with self._lock:
+                        if self.error is None:
+                            self.error = e
+                    self._failed.set()
+                    return
+                print(f"Segment {index + 1} of {self.episode.filename} failed ({e}), retrying")
+                # Waits longer after each failure, but wakes up at once on cancel.
+                self.cancel_event.wait(retry.backoff_delay(attempts, base=SEGMENT_RETRY_DELAY))
+
+    def _fetch(self, index, response):
+        segment = self.segments[index]
+        start, end, _ = segment
+        if response is None:
+            request_headers = dict(self.headers)
+            request_headers["Range"] = f"bytes={start + segment[2]}-{end - 1}"
+            request_headers["If-Range"] = resume_validator(self.validators)
+            response = http_client.get(self.episode.download_url, headers=request_headers, stream=True)
+            response.raise_for_status()
+            range_start, remote_total = parse_content_range(response.headers.get("content-range"))
+            if response.status_code != 206 or range_start != start + segment[2] or remote_total != self.total_size:
+                response.close()
+                raise SegmentError("Server did not return the requested byte range; the episode may have changed.")
+
+        with response:
+            response.raw.decode_content = True
+            sizer = AdaptiveChunkSize()
+            sizer.cap = limiter.max_chunk(self.host)
+            with open(self.part_path, "r+b", buffering=0) as f:
+                f.seek(start + segment[2])
+                for chunk in iter_chunks(response.raw, sizer):
+                    if self._stopped():
+                        return
+                    # The first segment may be served by a full-body response: stop at its end.
+                    chunk = chunk[:end - start - segment[2]]
+                    if not limiter.consume(len(chunk), self.host, self.priority, self.cancel_event):
+                        return
+                    _write_all(f, chunk)
+                    self._advance(segment, len(chunk))
+                    sizer.cap = limiter.max_chunk(self.host)
+                    if segment[2] >= end - start:
+                        return
+        if not self._stopped():
+            raise retry.TransientError(f"Connection closed {end - start - segment[2]} bytes before the end of the segment.")
+
+    def _advance(self, segment, amount):
+        with self._lock:
+            segment[2] += amount
+            downloaded = self.downloaded
+            percent = downloaded * 100 // self.total_size
+            report = percent != self._last_percent
+            self._last_percent = percent
+            save = downloaded - self._saved_at >= SEGMENT_SAVE_INTERVAL
+            if save:
+                self._saved_at = downloaded
+        if report:
+            self.episode.set_progress(percent / 100, downloaded, self.total_size)
+        if save:
+            self._save()
+
+    def _save(self):
+        with self._lock:
+            segments = [list(segment) for segment in self.segments]
+        save_resume_state(self.episode.full_file_path, self.episode.download_url, self.validators,
+                          preallocated=True, segments=segments)
+
+
+def _start_segmented(episode, headers, cancel_event, priority, response, total_size, count):
+    """Turns a fresh full-body response into a `count`-segment download that reuses it for the first range."""
+    part_path = part_path_for(episode.full_file_path)
+    validators = {"ETag": response.headers.get("ETag"), "Last-Modified": response.headers.get("Last-Modified")}
+    segments = plan_segments(total_size, count)
+    with open(part_path, "wb") as f:
+        if not preallocate(f, 0, total_size):
+            # Segments write at their offsets, so the file needs its full length either way.
+            f.truncate(total_size)
+    save_resume_state(episode.full_file_path, episode.download_url, validators, preallocated=True, segments=segments)
+    transfer = SegmentedDownload(episode, headers, cancel_event, priority, validators, segments)
+    transfer.run(first_response=response)
+    return transfer.downloaded
+
+
+def _download_stream(episode, headers, cancel_event, priority):
+    """
+    Fetches the episode body into its .part file, resuming a partial single-stream download when possible,
+    and switching to parallel segments for large range-capable files.
+    Returns (total_size, downloaded_size, hasher, length_checked); hasher is None when the bytes
+    did not arrive in order and the file still has to be hashed.
+    """
+    part_path = part_path_for(episode.full_file_path)
+    resume_from, validator = load_resume_state(episode.full_file_path)
+    request_headers = build_range_headers(headers, resume_from, validator)
+
+    with http_client.get(episode.download_url, headers=request_headers, stream=True) as r:
+        if r.status_code == 416 and resume_from > 0:
+            # The partial file may already hold every byte of the episode.
+            _, remote_total = parse_content_range(r.headers.get('content-range'))
+            if remote_total != resume_from:
+                clear_resume_state(episode.full_file_path, remove_part=True)
+                raise retry.TransientError("Partial file does not match the remote episode, it will restart on retry.")
+            return resume_from, resume_from, hash_file(part_path), True
+
+        r.raise_for_status()
+
+        if r.status_code == 206:
+            range_start, remote_total = parse_content_range(r.headers.get('content-range'))
+            if range_start != resume_from:
+                clear_resume_state(episode.full_file_path, remove_part=True)
+                raise retry.TransientError("Server returned an unexpected byte range.")
+            downloaded_size = resume_from
+            total_size = remote_total or (resume_from + int(r.headers.get('content-length', 0)))
+            file_mode = 'r+b'
+            # The bytes fetched earlier are hashed once; the rest is hashed as it is written.
+            hasher = hash_file(part_path, limit=resume_from)
+            length_checked = True
+        else:
+            # Full body: either a fresh download or the episode changed since the partial fetch.
+            downloaded_size = 0
+            total_size = int(r.headers.get('content-length', 0))
+            file_mode = 'wb'
+            hasher = new_hasher()
+            # A compressed body decodes to more bytes than its Content-Length.
+            length_checked = r.headers.get('content-encoding', 'identity').lower() == 'identity'
+
+        os.makedirs(episode.download_dir, exist_ok=True)
+        remaining = total_size - downloaded_size if length_checked else 0
+        ensure_free_space(episode.download_dir, remaining)
+
+        host = host_of(episode.download_url)
+        if can_split(r, total_size, length_checked):
+            # Each segment is a connection of its own: only split as far as the host's limit leaves room.
+            with extra_connections(host, DEFAULT_SEGMENTS - 1) as extra:
+                if extra:
+                    downloaded_size = _start_segmented(episode, headers, cancel_event, priority, r, total_size,
+                                                       1 + extra)
+                    return total_size, downloaded_size, None, True
+
+        sizer = AdaptiveChunkSize()
+        # Capped before the first read, or the reads grow past the speed limit before it applies.
+        sizer.cap = limiter.max_chunk(host)
+        r.raw.decode_content = True
+        last_percent = -1
+        with open(part_path, file_mode) as f:
+            f.seek(downloaded_size)
+            f.truncate()
+            preallocated = preallocate(f, downloaded_size, remaining)
+            save_resume_state(episode.full_file_path, episode.download_url, r.headers, preallocated)
+            try:
+                for chunk in iter_chunks(r.raw, sizer):
+                    if cancel_event.is_set():
+                        break
+                    if not limiter.consume(len(chunk), host, priority, cancel_event):
+                        break
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    downloaded_size += len(chunk)
+                    sizer.cap = limiter.max_chunk(host)
+
+                    if total_size > 0:
+                        # Only whole-percent changes are worth a render.
+                        percent = min(downloaded_size * 100 // total_size, 100)
+                        if percent != last_percent:
+                            last_percent = percent
+                            episode.set_progress(percent / 100, downloaded_size, total_size)
+            finally:
+                if preallocated and downloaded_size < total_size:
+                    # Trim the reserved tail so the part file size is the resume offset again.
+                    f.truncate(downloaded_size)
+                    save_resume_state(episode.full_file_path, episode.download_url, r.headers)
+
+    return total_size, downloaded_size, hasher, length_checked
+
+
+def download_episode(episode, headers, cancel_event: threading.Event, show_cancel_button=False,
+                     priority=PRIORITY_BATCH, attempt=None):
+    """
+    Downloads one episode into its .part file, resuming when possible, and moves it into place.
+    Progress and the final outcome are reported through the episode's status.
+    Throughput is shaped by the shared bandwidth limiter at the given `priority`.
+
+    Every outcome is reported to the host's circuit breaker (retry.breaker). When `attempt` is
+    given (the 1-based try of a queue runner), a transient failure before the last of
+    retry.MAX_ATTEMPTS leaves the episode STATUS_RETRYING and raises retry.RetryLater.
+    """
+    episode.error = None
+    episode.set_status(STATUS_DOWNLOADING, show_cancel=show_cancel_button)
+    host = host_of(episode.download_url)
+
+    if downloaded_files.exists(episode.full_file_path):
+        retry.breaker.release(host)
+        episode.set_status(STATUS_DOWNLOADED)
+        return
+
+    part_path = part_path_for(episode.full_file_path)
+
+    try:
+        validators, segments = load_segment_state(episode.full_file_path)
+        if segments:
+            # An interrupted multi-segment download continues each segment where it stopped,
+            # over as many connections as the host's limit allows.
+            transfer = SegmentedDownload(episode, headers, cancel_event, priority, validators, segments)
+            with extra_connections(host, len(transfer.unfinished()) - 1) as extra:
+                transfer.run(connections=1 + extra)
+            total_size, downloaded_size, hasher, length_checked = transfer.total_size, transfer.downloaded, None, True
+        else:
+            total_size, downloaded_size, hasher, length_checked = _download_stream(episode, headers, cancel_event, priority)
+
+        if cancel_event.is_set():
+            # The partial file is kept so the next attempt resumes where this one stopped.
+            retry.breaker.release(host)
+            episode.set_status(STATUS_NEW)
+        elif total_size > 0 and length_checked and downloaded_size != total_size:
+            if downloaded_size > total_size:
+                clear_resume_state(episode.full_file_path, remove_part=True)
+                raise IOError(f"Download incomplete: {downloaded_size} of {total_size} bytes.")
+            # The connection ended early; the next attempt resumes from here.
+            raise retry.TransientError(f"Download incomplete: {downloaded_size} of {total_size} bytes.")
+        elif downloaded_size == 0:
+            raise IOError("Server sent an empty file.")
+        else:
+            # Segments arrive out of order, so those files are hashed once they are complete.
+            digest = (hasher or hash_file(part_path)).hexdigest()
+            os.replace(part_path, episode.full_file_path)
+            downloaded_files.add(episode.full_file_path)
+            clear_resume_state(episode.full_file_path)
+            record_download_result(episode, downloaded_size, digest)
+            episode.bytes_done, episode.bytes_total = downloaded_size, downloaded_size
+            retry.breaker.record_success(host)
+            episode.set_status(STATUS_DONE)
+
+    except SegmentError as e:
+        print(f"Error downloading {episode.filename}: {e}")
+        episode.error = str(e)
+        # The parts already fetched belong to another version of the file: start over next time.
+        clear_resume_state(episode.full_file_path, remove_part=True)
+        retry.breaker.record_success(host)
+        record_download_state(episode, "failed")
+        episode.set_status(STATUS_FAILED)
+    except Exception as e:
+        print(f"Error downloading {episode.filename}: {e}")
+        episode.error = str(e)
+        transient, retry_after = retry.classify(e)
+        if not transient:
+            # The host answered (404, disk full, ...): nothing wrong with it.
+            retry.breaker.record_success(host)
+        elif cancel_event.is_set():
+            retry.breaker.release(host)
+        else:
+            retry.breaker.record_failure(host, retry_after)
+            if (attempt is not None and attempt < retry.MAX_ATTEMPTS
+                    and (retry_after is None or retry_after <= retry.MAX_RETRY_AFTER)):
+                episode.set_status(STATUS_RETRYING)
+                raise retry.RetryLater(retry.retry_delay(attempt, retry_after), e)
+        record_download_state(episode, "failed")
+        episode.set_status(STATUS_FAILED)
+
+
+class DownloadJob:
+    """A single unit of work for the scheduler: a callable bound to the host it talks to."""
+    def __init__(self, url, func, *args, payload=None):
+        self.url = url
+        self.host = host_of(url)
+        self.func = func
+        self.args = args
+        self.payload = payload
+        self.error = None
+        self.retries = 0
+        self.not_before = 0.0
+
+
+class DownloadScheduler:
+    """
+    Runs download jobs on a bounded pool of worker threads.
+    At most `max_workers` jobs run at once, and at most `per_host_limit` connections may be
+    open to the same host, counting the extra ones of segmented downloads (host_connections)
+    and those of other schedulers. Setting `cancel_event` stops new jobs from starting;
+    jobs already running are expected to watch the same event and stop themselves.
+    A job that raises retry.RetryLater goes back to the queue until its delay has passed, and
+    with a `breaker` (retry.CircuitBreaker) jobs of a paused host wait while the others run.
+    """
+    def __init__(self, cancel_event: threading.Event, max_workers=DEFAULT_MAX_WORKERS,
+                 per_host_limit=DEFAULT_PER_HOST_LIMIT, on_job_done=None, breaker=None):
+        self.cancel_event = cancel_event
+        self.max_workers = max(1, int(max_workers))
+        self.per_host_limit = max(1, int(per_host_limit))
+        self.on_job_done = on_job_done
+        self.breaker = breaker
+
+        self._pending = deque()
+        self._running = 0
+        self._cond = threading.Condition()
+
+    def submit(self, url, func, *args, payload=None):
+        job = DownloadJob(url, func, *args, payload=payload)
+        with self._cond:
+            self._pending.append(job)
+            self._cond.notify()
+        return job
+
+    def _next_job(self):
+        """
+        Pops the first pending job that is due and whose host has a free connection and is not
+        paused, and takes that connection. Caller holds the lock.
+        """
+        now = time.time()
+        for job in self._pending:
+            if job.not_before > now or not host_connections.acquire(job.host, 1, self.per_host_limit):
+                continue
+            if self.breaker is not None and not self.breaker.allow(job.host, now):
+                host_connections.release(job.host)
+                continue
+            self._pending.remove(job)
+            return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self.cancel_event.is_set() and self._pending:
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    # Every pending job is waiting on a busy or paused host, or for its retry.
+                    self._cond.wait(timeout=0.5)
+                if job is None:
+                    self._cond.notify_all()
+                else:
+                    self._running += 1
+
+            if self.breaker is not None:
+                # Breaker changes made by _next_job are announced now that the lock is released.
+                self.breaker.flush()
+            if job is None:
+                return
+
+            retry_at = None
+            _job_context.per_host_limit = self.per_host_limit
+            try:
+                job.func(*job.args)
+            except retry.RetryLater as later:
+                retry_at = time.time() + later.delay
+                print(f"Retrying {job.url} in {later.delay:.0f}s: {later}")
+            except Exception as e:
+                job.error = e
+                print(f"Error in download job for {job.url}: {e}")
+            finally:
+                _job_context.per_host_limit = DEFAULT_PER_HOST_LIMIT
+                host_connections.release(job.host)
+                with self._cond:
+                    self._running -= 1
+                    if retry_at is not None:
+                        job.retries += 1
+                        job.not_before = retry_at
+                        self._pending.append(job)
+                    self._cond.notify_all()
+
+            if retry_at is None and self.on_job_done:
+                try:
+                    self.on_job_done(job)
+                except Exception as e:
+                    print(f"Error in job completion callback: {e}")
+
+    def run(self):
+        """
+        Processes every submitted job and blocks until the queue is drained or cancelled.
+        Returns the jobs that never started (non-empty only after a cancel).
+        """
+        with self._cond:
+            worker_count = min(self.max_workers, len(self._pending))
+
+        workers = [
+            threading.Thread(target=self._worker, name=f"download-worker-{n}", daemon=True)
+            for n in range(worker_count)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        with self._cond:
+            not_started = list(self._pending)
+            self._pending.clear()
+        return not_started
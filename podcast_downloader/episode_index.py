@@ -0,0 +1,101 @@
+import time
+from operator import itemgetter
+
+SORT_NUMBER = "number"
+SORT_DATE = "date"
+SORT_DURATION = "duration"
+SORT_TITLE = "title"
+
+# Sort choices offered in the UI: (key, label). A key is "<field>-<asc|desc>".
+SORT_CHOICES = [
+    ("number-desc", "Newest (by number)"),
+    ("number-asc", "Oldest (by number)"),
+    ("date-desc", "Newest (by date)"),
+    ("date-asc", "Oldest (by date)"),
+    ("duration-desc", "Longest"),
+    ("duration-asc", "Shortest"),
+    ("title-asc", "Title A-Z"),
+    ("title-desc", "Title Z-A"),
+]
+DEFAULT_SORT = "number-desc"
+
+DAY = 24 * 3600
+# Range filters offered in the UI: (key, label, value). None means no limit.
+AGE_CHOICES = [
+    ("any", "Any time", None),
+    ("7d", "Last 7 days", 7 * DAY),
+    ("30d", "Last 30 days", 30 * DAY),
+    ("365d", "Last year", 365 * DAY),
+]
+LENGTH_CHOICES = [
+    ("any", "Any length", (None, None)),
+    ("short", "Under 20 min", (None, 20 * 60)),
+    ("medium", "20-60 min", (20 * 60, 60 * 60)),
+    ("long", "Over 60 min", (60 * 60, None)),
+]
+
+
+def parse_sort(value):
+    """Splits a sort key ("date-desc") into (field, descending); unknown keys give the default order."""
+    field, _, direction = (value or "").partition("-")
+    if field not in (SORT_NUMBER, SORT_DATE, SORT_DURATION, SORT_TITLE) or direction not in ("asc", "desc"):
+        return parse_sort(DEFAULT_SORT)
+    return field, direction == "desc"
+
+
+def _sort_value(episode, field):
+    if field == SORT_NUMBER:
+        return episode.ep_number
+    if field == SORT_DATE:
+        return episode.published_at
+    if field == SORT_DURATION:
+        return episode.duration_seconds
+    return episode.title.casefold()
+
+
+class EpisodeIndex:
+    """
+    Every sort order of a loaded episode list, computed once when the list is complete, so
+    changing the order only picks another precomputed list. Episodes without a date or a
+    duration go last in both directions of that order; ties keep the feed order.
+    filter() applies range filters on the parsed dates and durations.
+    """
+    def __init__(self, episodes):
+        self.episodes = list(episodes)
+        self._orders = {}
+        for field in (SORT_NUMBER, SORT_DATE, SORT_DURATION, SORT_TITLE):
+            values = [(_sort_value(episode, field), episode) for episode in self.episodes]
+            present = [pair for pair in values if pair[0] is not None]
+            missing = [episode for value, episode in values if value is None]
+            # Sorted twice rather than reversed, so ties keep the feed order in both directions.
+            self._orders[field, False] = [episode for _, episode in sorted(present, key=itemgetter(0))] + missing
+            self._orders[field, True] = [episode for _, episode in sorted(present, key=itemgetter(0), reverse=True)] + missing
+
+    def __len__(self):
+        return len(self.episodes)
+
+    def ordered(self, sort_key=DEFAULT_SORT):
+        """The episodes in the order of `sort_key` (see SORT_CHOICES). Do not modify the list."""
+        return self._orders[parse_sort(sort_key)]
+
+    @staticmethod
+    def filter(episodes, max_age=None, min_seconds=None, max_seconds=None, now=None):
+        """
+        Keeps the episodes published within `max_age` seconds and lasting from `min_seconds`
+        up to (not including) `max_seconds`, in their given order. Episodes whose date or
+        duration is unknown are dropped only by the filter that needs it.
+        """
+        if max_age is None and min_seconds is None and max_seconds is None:
+            return list(episodes)
+        published_after = (time.time() if now is None else now) - max_age if max_age is not None else None
+        kept = []
+        for episode in episodes:
+            if published_after is not None and (episode.published_at is None or episode.published_at < published_after):
+                continue
+            seconds = episode.duration_seconds
+            if min_seconds is not None and (seconds is None or seconds < min_seconds):
+                continue
+            if max_seconds is not None and (seconds is None or seconds >= max_seconds):
+                continue
+            kept.append(episode)
+        return kept
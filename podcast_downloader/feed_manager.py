@@ -0,0 +1,226 @@
+import atexit
+import io
+import threading
+import time
+import urllib.parse
+import zlib
+
+from . import data_manager as db
+from . import http_client
+from .feed_parser import FeedStream, CompressingReader, finalize_episode_numbers, parse_feed_body
+
+FEED_TIMEOUT = 15
+DEFAULT_REFRESH_WORKERS = 8
+# Feeds at least this large are parsed in a worker process during refresh_all; for smaller ones
+# sending the body and the episodes between processes costs more than the parse itself.
+PROCESS_PARSE_MIN_BYTES = 512 * 1024
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+STATUS_FETCHED = "fetched"
+STATUS_NOT_MODIFIED = "not_modified"
+STATUS_CACHED = "cached"
+STATUS_UNAVAILABLE = "unavailable"
+
+
+class FeedResult:
+    """
+    Outcome of loading one feed.
+    `episodes` holds the episode mappings (feed items or catalog rows), or None when the feed
+    was unchanged and the caller asked not to re-read it. `changed` counts catalog rows written.
+    """
+    def __init__(self, status, episodes=None, channel=None, item_count=0, changed=0, elapsed=0.0):
+        self.status = status
+        self.episodes = episodes
+        self.channel = channel or {"title": None, "image": "", "ttl": None, "skip_hours": []}
+        self.item_count = item_count
+        self.changed = changed
+        self.elapsed = elapsed
+
+
+class FeedOutcome:
+    """How refreshing one saved podcast went: its FeedResult, or the error it failed with."""
+    def __init__(self, podcast, result=None, error=None, elapsed=0.0):
+        self.podcast = podcast
+        self.result = result
+        self.error = error
+        self.elapsed = elapsed
+
+
+def build_feed_url(feed_url, username=None, password=None):
+    """Returns the URL to request: https is assumed, and basic-auth credentials are embedded when given."""
+    clean_url = feed_url.removeprefix("https://").removeprefix("http://")
+    if username and password:
+        safe_user = urllib.parse.quote(username)
+        safe_pass = urllib.parse.quote(password)
+        return f"https://{safe_user}:{safe_pass}@{clean_url}"
+    if not feed_url.startswith("http://") and not feed_url.startswith("https://"):
+        return f"https://{clean_url}"
+    return feed_url
+
+
+def _consume(episodes, on_episode):
+    consumed = []
+    for episode in episodes:
+        consumed.append(episode)
+        if on_episode is not None:
+            on_episode(episode)
+    return consumed
+
+
+def _load_cached(podcast_id, cached, on_episode, status, started):
+    """Reads a feed from the episode catalog, or from the cached snapshot when the catalog is empty."""
+    if podcast_id is not None:
+        catalog = [dict(row) for row in db.db_get_episodes(podcast_id)]
+        if catalog:
+            episodes = _consume(catalog, on_episode)
+            return FeedResult(status, episodes, item_count=len(episodes), elapsed=time.monotonic() - started)
+
+    if cached is None:
+        return FeedResult(STATUS_UNAVAILABLE, [], elapsed=time.monotonic() - started)
+
+    feed = FeedStream(io.BytesIO(zlib.decompress(cached["body"])))
+    episodes = _consume(feed, on_episode)
+    finalize_episode_numbers(episodes, feed.item_count)
+    changed = db.db_upsert_episodes(podcast_id, episodes) if podcast_id is not None else 0
+    return FeedResult(status, episodes, feed.channel, feed.item_count, changed, time.monotonic() - started)
+
+
+def _parse_body(body, parse_pool):
+    if len(body) >= PROCESS_PARSE_MIN_BYTES:
+        from concurrent.futures.process import BrokenProcessPool
+        try:
+            return parse_pool.submit(parse_feed_body, body).result()
+        except BrokenProcessPool as e:
+            # A worker died (killed, out of memory): the next refresh gets a new pool, this feed is parsed here.
+            print(f"Feed parser process failed ({e}), parsing in this process")
+            if parse_pool is _parse_pool:
+                shutdown_parse_pool()
+    return parse_feed_body(body)
+
+
+def load_feed(feed_url, request_url=None, podcast_id=None, offline=False, parse_if_unchanged=True,
+              on_episode=None, timeout=FEED_TIMEOUT, parse_pool=None):
+    """
+    Loads the episodes of a feed, with no UI involved.
+    Sends a conditional GET when a cached snapshot exists and reuses the catalog or snapshot on 304.
+    With offline=True nothing is fetched. `on_episode(mapping)` is called for each episode as soon as
+    it is parsed, for incremental display. Fresh feeds are snapshotted and upserted into the catalog
+    of `podcast_id`. `feed_url` is the cache key; `request_url` (e.g. with credentials) is what is fetched.
+    With a `parse_pool` (a ProcessPoolExecutor) the body is read whole and large feeds are parsed
+    there instead of while downloading. Network and parse errors are raised to the caller.
+    """
+    started = time.monotonic()
+    cached = db.db_get_feed_cache(feed_url)
+
+    if offline:
+        return _load_cached(podcast_id, cached, on_episode, STATUS_CACHED, started)
+
+    request_headers = {}
+    if cached is not None:
+        if cached["etag"]:
+            request_headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            request_headers["If-Modified-Since"] = cached["last_modified"]
+
+    with http_client.get(request_url or feed_url, headers=request_headers, timeout=timeout, stream=True) as response:
+        if response.status_code == 304 and cached is not None:
+            db.db_touch_feed_cache(feed_url)
+            if not parse_if_unchanged:
+                return FeedResult(STATUS_NOT_MODIFIED, None, elapsed=time.monotonic() - started)
+            return _load_cached(podcast_id, cached, on_episode, STATUS_NOT_MODIFIED, started)
+
+        response.raise_for_status()
+        # The XML parser reads the charset from the document itself, no need to guess it.
+        response.raw.decode_content = True
+        if parse_pool is None:
+            reader = CompressingReader(response.raw)
+            feed = FeedStream(reader)
+            episodes = _consume(feed, on_episode)
+            channel, item_count, snapshot = feed.channel, feed.item_count, reader.compressed()
+        else:
+            body = response.raw.read()
+
+    if parse_pool is not None:
+        parsed, channel, item_count = _parse_body(body, parse_pool)
+        episodes = _consume(parsed, on_episode)
+        snapshot = zlib.compress(body)
+
+    finalize_episode_numbers(episodes, item_count)
+    db.db_save_feed_cache(
+        feed_url,
+        response.headers.get("ETag"),
+        response.headers.get("Last-Modified"),
+        snapshot
+    )
+    changed = db.db_upsert_episodes(podcast_id, episodes) if podcast_id is not None else 0
+    return FeedResult(STATUS_FETCHED, episodes, channel, item_count, changed, time.monotonic() - started)
+
+
+def refresh_podcast(details, parse_pool=None):
+    """Loads one saved podcast's feed (conditionally) and returns its FeedResult."""
+    request_url = build_feed_url(details["feed_url"], details["username"], details["password"])
+    return load_feed(details["feed_url"], request_url, details["id"], parse_pool=parse_pool)
+
+
+def shared_parse_pool(max_workers=None):
+    """
+    The process pool parsing large feeds, started on first use (with `max_workers`, one per core
+    by default) and kept for every later refresh, so repeated refreshes do not start new processes.
+    Workers are spawned rather than forked: the GUI and the poller refresh from a process that
+    already runs other threads, and a forked child could inherit a lock one of them was holding.
+    """
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # Loaded here so importing the feed code stays cheap (see benchmarks/startup.py).
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            _parse_pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(shutdown_parse_pool)
+        return _parse_pool
+
+
+def shutdown_parse_pool():
+    """Stops the worker processes of shared_parse_pool(); a later refresh starts new ones."""
+    global _parse_pool
+    with _parse_pool_lock:
+        pool, _parse_pool = _parse_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _timed_refresh(details, parse_pool):
+    started = time.monotonic()
+    try:
+        return FeedOutcome(details, result=refresh_podcast(details, parse_pool), elapsed=time.monotonic() - started)
+    except Exception as e:
+        return FeedOutcome(details, error=e, elapsed=time.monotonic() - started)
+
+
+def refresh_all(podcasts, max_workers=DEFAULT_REFRESH_WORKERS, parse_workers=None, on_outcome=None):
+    """
+    Refreshes many saved podcasts (rows of the podcasts table) at once. Feeds are fetched in a
+    thread pool of `max_workers`; large ones are parsed in shared_parse_pool(parse_workers), so
+    parsing runs on every core while other feeds download. One failing feed does not stop the
+    others. `on_outcome(FeedOutcome)` is called as each feed finishes.
+    Returns the FeedOutcomes in completion order.
+    """
+    # Loaded here so importing the feed code stays cheap (see benchmarks/startup.py).
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    outcomes = []
+    parse_pool = shared_parse_pool(parse_workers)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="feed") as pool:
+        futures = [pool.submit(_timed_refresh, details, parse_pool) for details in podcasts]
+        for future in as_completed(futures):
+            outcome = future.result()
+            outcomes.append(outcome)
+            if on_outcome is not None:
+                try:
+                    on_outcome(outcome)
+                except Exception as e:
+                    print(f"Error in refresh callback: {e}")
+    return outcomes
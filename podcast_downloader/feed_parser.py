@@ -0,0 +1,239 @@
+import xml.etree.ElementTree as ET
+import contextlib
+import html
+import io
+import re
+import sqlite3
+import sys
+import urllib.parse
+import zlib
+
+from .utils import extract_episode_number, parse_duration, parse_pub_date
+
+NAMESPACES = {
+    'itunes': 'http://www.itunes.com/dtds/podcast-1.0.dtd',
+    'content': 'http://purl.org/rss/1.0/modules/content/'
+}
+
+ITUNES_IMAGE = f"{{{NAMESPACES['itunes']}}}image"
+
+# Item children read by _parse_item, by tag. Only the first occurrence of each counts.
+ITEM_FIELDS = {
+    "title": "title",
+    "pubDate": "pub_date",
+    "link": "link",
+    "guid": "guid",
+    "description": "description",
+    f"{{{NAMESPACES['itunes']}}}summary": "summary",
+    f"{{{NAMESPACES['content']}}}encoded": "content",
+    f"{{{NAMESPACES['itunes']}}}duration": "duration",
+    f"{{{NAMESPACES['itunes']}}}author": "author",
+    ITUNES_IMAGE: "image",
+}
+# Where the description comes from, in order of preference.
+DESCRIPTION_FIELDS = ("description", "summary", "content")
+
+HTML_TAG_RE = re.compile(r'<[^<]+?>')
+
+
+def clean_description(description_raw):
+    if not description_raw:
+        return ''
+    if '<' in description_raw:
+        description_raw = HTML_TAG_RE.sub('', description_raw)
+    if '&' in description_raw:
+        description_raw = html.unescape(description_raw)
+    return description_raw.strip()
+
+
+class LazyDescription:
+    """
+    The raw HTML description of a parsed item. It is cleaned to plain text the first time it is
+    read with str() (shown, or stored and indexed in the catalog) and the text is kept from then on,
+    so episodes that are never displayed or saved never pay for the cleaning.
+    """
+    __slots__ = ("_raw", "_text")
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._text = None
+
+    def __str__(self):
+        if self._text is None:
+            self._text = clean_description(self._raw)
+            self._raw = None
+        return self._text
+
+
+sqlite3.register_adapter(LazyDescription, str)
+
+
+def _to_int(text):
+    try:
+        return int((text or "").strip())
+    except ValueError:
+        return None
+
+
+def filename_from_url(download_url):
+    raw_filename = download_url.split('/')[-1].split('?')[0]
+    filename = urllib.parse.unquote(raw_filename)
+    filename = re.sub(r'[\\/*?:"<>|]', "", filename)
+    return filename.strip()
+
+
+class CompressingReader:
+    """
+    File-like wrapper that compresses everything read through it.
+    Lets the feed body be parsed and snapshotted for the cache in the same pass.
+    """
+    def __init__(self, raw):
+        self.raw = raw
+        self._compressor = zlib.compressobj()
+        self._parts = []
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        if data:
+            self._parts.append(self._compressor.compress(data))
+        return data
+
+    def compressed(self):
+        return b"".join(self._parts) + self._compressor.flush()
+
+
+class FeedStream:
+    """
+    Incremental RSS parser built on ET.iterparse.
+    Iterating yields one dict per episode with an audio enclosure, as soon as its <item> closes.
+    Processed items are dropped from the tree, so memory stays bounded by the largest single item.
+    `channel` fills in as the channel elements are seen, and `item_count` is final once iteration ends.
+    """
+    def __init__(self, source):
+        self.source = source
+        self.channel = {"title": None, "image": "", "ttl": None, "skip_hours": []}
+        self.item_count = 0
+
+    def __iter__(self):
+        # Items without a usable filename or episode number need the final item count
+        # for their fallback name, so they are held back until the end of the feed.
+        deferred = []
+        path = []
+        channel_elem = None
+
+        for event, elem in ET.iterparse(self.source, events=("start", "end")):
+            if event == "start":
+                path.append(elem.tag)
+                if elem.tag == "channel" and channel_elem is None:
+                    channel_elem = elem
+                continue
+
+            path.pop()
+            parent = path[-1] if path else None
+
+            if elem.tag == "item":
+                position = self.item_count
+                self.item_count += 1
+                episode = self._parse_item(elem, position)
+                if parent == "channel" and channel_elem is not None:
+                    channel_elem.remove(elem)
+                else:
+                    elem.clear()
+
+                if episode is None:
+                    print(f"Item {position}: Ignored (no valid audio enclosure).")
+                elif not episode["filename"] and episode["ep_number"] <= 0:
+                    deferred.append(episode)
+                else:
+                    if not episode["filename"]:
+                        episode["filename"] = f"episode_{episode['ep_number']}.mp3"
+                    yield episode
+
+            elif parent == "channel":
+                if elem.tag == "title" and self.channel["title"] is None:
+                    self.channel["title"] = (elem.text or "").strip()
+                elif elem.tag == ITUNES_IMAGE and not self.channel["image"]:
+                    self.channel["image"] = elem.get("href") or ""
+                elif elem.tag == "ttl":
+                    self.channel["ttl"] = _to_int(elem.text)
+
+            elif parent == "skipHours" and elem.tag == "hour" and len(path) >= 2 and path[-2] == "channel":
+                # Hours are GMT; some feeds write midnight as 24.
+                hour = _to_int(elem.text)
+                if hour is not None and 0 <= hour <= 24:
+                    self.channel["skip_hours"].append(hour % 24)
+
+            elif parent == "image" and elem.tag == "url" and len(path) >= 2 and path[-2] == "channel":
+                # <channel><image><url> takes precedence over itunes:image.
+                if elem.text:
+                    self.channel["image"] = elem.text
+
+        for episode in deferred:
+            episode["filename"] = f"episode_{self.item_count - episode['position']}.mp3"
+            yield episode
+
+    def _parse_item(self, item, position):
+        # The enclosure decides whether the item is kept at all, so nothing else is read before it.
+        enclosure = item.find('enclosure')
+        enclosure_url = enclosure.get('url') if enclosure is not None else None
+        enclosure_type = enclosure.get('type', '') if enclosure is not None else ''
+        if enclosure is None or not enclosure_url or not enclosure_type.startswith('audio'):
+            return None
+
+        # One pass over the children instead of a find() per field.
+        fields = {}
+        for child in item:
+            field = ITEM_FIELDS.get(child.tag)
+            if field is not None and field not in fields:
+                fields[field] = child.get('href') if field == "image" else child.text
+
+        title = fields.get("title") or 'No Title'
+
+        description_raw = ''
+        for field in DESCRIPTION_FIELDS:
+            if field in fields:
+                description_raw = fields[field] or ''
+                break
+
+        download_url = html.unescape(enclosure_url)
+        pub_date = fields.get("pub_date") or 'N/A'
+        duration = fields.get("duration", '')
+
+        return {
+            "position": position,
+            "ep_number": extract_episode_number(title),
+            "title": title,
+            "description": LazyDescription(description_raw),
+            "image_src": fields.get("image") or self.channel["image"],
+            "download_url": download_url,
+            "filename": filename_from_url(download_url),
+            "pub_date": pub_date,
+            "link": fields.get("link") or '',
+            "guid": fields.get("guid") or '',
+            "duration": duration,
+            "author": fields.get("author", ''),
+            # Parsed here once, so sorting and filtering compare numbers.
+            "published_at": parse_pub_date(pub_date),
+            "duration_seconds": parse_duration(duration),
+        }
+
+
+def parse_feed_body(body):
+    """
+    Parses a whole feed document and returns (episodes, channel, item_count), with every
+    description already cleaned to text. Runs in worker processes for feed_manager.refresh_all,
+    so the per-item notes go to stderr and never mix with the caller's stdout.
+    """
+    with contextlib.redirect_stdout(sys.stderr):
+        feed = FeedStream(io.BytesIO(body))
+        episodes = list(feed)
+    for episode in episodes:
+        episode["description"] = str(episode["description"])
+    return episodes, feed.channel, feed.item_count
+
+
+def finalize_episode_numbers(episodes, item_count):
+    """Gives episodes without a number in their title the feed-position fallback (total - index)."""
+    for episode in episodes:
+        if episode["ep_number"] <= 0:
+            episode["ep_number"] = item_count - episode["position"]
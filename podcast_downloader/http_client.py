@@ -0,0 +1,72 @@
+import threading
+
+from .utils import HEADERS
+
+DEFAULT_POOL_CONNECTIONS = 16
+DEFAULT_POOL_MAXSIZE = 8
+DEFAULT_TIMEOUT = 30
+
+_settings = {
+    "pool_connections": DEFAULT_POOL_CONNECTIONS,
+    "pool_maxsize": DEFAULT_POOL_MAXSIZE,
+    "timeout": DEFAULT_TIMEOUT,
+}
+_adapter = None
+_adapter_lock = threading.Lock()
+_local = threading.local()
+
+
+def configure(pool_connections=None, pool_maxsize=None, timeout=None):
+    """
+    Changes the connection pool sizes and default timeout.
+    pool_connections is how many hosts keep a pool, pool_maxsize how many idle keep-alive
+    connections each host pool holds. Sessions created afterwards use the new pools.
+    """
+    global _adapter
+    with _adapter_lock:
+        if pool_connections is not None:
+            _settings["pool_connections"] = pool_connections
+        if pool_maxsize is not None:
+            _settings["pool_maxsize"] = pool_maxsize
+        if timeout is not None:
+            _settings["timeout"] = timeout
+        _adapter = None
+
+
+def _shared_adapter():
+    global _adapter
+    # requests is imported on first use: scripts and the GUI start without paying for it.
+    from requests.adapters import HTTPAdapter
+
+    with _adapter_lock:
+        if _adapter is None:
+            _adapter = HTTPAdapter(
+                pool_connections=_settings["pool_connections"],
+                pool_maxsize=_settings["pool_maxsize"],
+            )
+        return _adapter
+
+
+def get_session():
+    """
+    Returns this thread's Session. Every thread gets its own Session (cookies and headers
+    are not thread-safe) but all of them mount the same adapter, so TCP/TLS connections
+    are pooled per host and kept alive across the feed fetcher, downloads and artwork.
+    """
+    adapter = _shared_adapter()
+    session = getattr(_local, "session", None)
+    if session is None or getattr(_local, "adapter", None) is not adapter:
+        import requests
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _local.session = session
+        _local.adapter = adapter
+    return session
+
+
+def get(url, **kwargs):
+    """requests.get through the shared pools, with the configured default timeout."""
+    kwargs.setdefault("timeout", _settings["timeout"])
+    return get_session().get(url, **kwargs)
@@ -0,0 +1,234 @@
+import json
+import os
+import socket
+import threading
+import time
+
+from . import data_manager as db
+from . import retry
+from .bandwidth import PRIORITY_BATCH
+from .download_manager import (
+    DownloadScheduler, DEFAULT_MAX_WORKERS, DEFAULT_PER_HOST_LIMIT, download_episode, part_path_for, host_of,
+    acquire_host_slot, release_host_slot
+)
+from .models import Episode, FINISHED_STATUSES, STATUS_FAILED, STATUS_RETRYING, STATUS_NEW, STATUS_DOWNLOADING
+from .utils import HEADERS
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+HEARTBEAT_SECONDS = 10
+# A running job whose owner stopped sending heartbeats for this long is considered orphaned.
+STALE_AFTER_SECONDS = 300
+DONE_RETENTION_SECONDS = 7 * 24 * 3600
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def job_state_for(episode):
+    """The final job state matching an episode's status after download_episode returned."""
+    if episode.status in FINISHED_STATUSES:
+        return JOB_DONE
+    if episode.status == STATUS_FAILED:
+        return JOB_FAILED
+    if episode.status == STATUS_RETRYING:
+        # Still waiting in the queue; a restart picks it up like any other queued job.
+        return JOB_QUEUED
+    return JOB_CANCELLED
+
+
+def enqueue(episodes):
+    """Adds episodes to the persistent download queue. Returns how many were (re)queued."""
+    return db.db_enqueue_jobs([
+        (episode.podcast_id, episode.download_dir, episode.filename, episode.download_url,
+         json.dumps(episode.to_mapping(include_description=episode.podcast_id is None), ensure_ascii=False))
+        for episode in episodes
+    ])
+
+
+def _owner_is_gone(owner, updated_at, now):
+    if not owner:
+        return True
+    host, _, pid = owner.rpartition(":")
+    if host == socket.gethostname() and os.name == "posix" and pid.isdigit():
+        if int(pid) == os.getpid():
+            return False
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            pass
+        else:
+            return False
+    # Another machine sharing the database, or no cheap way to ask: rely on the heartbeat.
+    return now - updated_at > STALE_AFTER_SECONDS
+
+
+def recover_interrupted():
+    """
+    Puts jobs left 'running' by a process that died (crash, closed window, reboot) back in the
+    queue and forgets old completed jobs. Returns the number of jobs now waiting.
+    """
+    now = time.time()
+    orphaned = [
+        job["id"] for job in db.db_get_jobs([JOB_RUNNING])
+        if _owner_is_gone(job["owner"], job["updated_at"], now)
+    ]
+    if orphaned:
+        db.db_set_jobs_state(orphaned, JOB_QUEUED, JOB_RUNNING)
+    db.db_delete_jobs_done_before(now - DONE_RETENTION_SECONDS)
+    return len(db.db_get_jobs([JOB_QUEUED]))
+
+
+def episode_for_job(job):
+    """Rebuilds the Episode a job row describes."""
+    return Episode.from_mapping(json.loads(job["episode"]), job["download_dir"], job["podcast_id"], keep_description=False)
+
+
+def _bytes_done(episode):
+    if episode.bytes_done:
+        return episode.bytes_done
+    try:
+        return os.path.getsize(part_path_for(episode.full_file_path))
+    except OSError:
+        return 0
+
+
+def _execute(job_id, episode, cancel_event, priority, show_cancel_button=False, attempt=None):
+    """
+    Claims a job and downloads it. Returns False when another runner already owns it.
+    With an `attempt` number, a transient failure raises retry.RetryLater (see download_episode).
+    """
+    if not db.db_claim_job(job_id, OWNER):
+        return False
+    try:
+        download_episode(episode, HEADERS, cancel_event, show_cancel_button=show_cancel_button, priority=priority,
+                         attempt=attempt)
+    finally:
+        try:
+            db.db_finish_job(job_id, job_state_for(episode), _bytes_done(episode), episode.bytes_total, episode.error)
+        except Exception as e:
+            print(f"Error recording job {job_id}: {e}")
+    return True
+
+
+def run_single(episode, cancel_event, priority, show_cancel_button=True, per_host_limit=DEFAULT_PER_HOST_LIMIT):
+    """
+    Queues one episode and downloads it right away in the calling thread, so an individual
+    download is recorded (and resumed after a restart) like a batch one. Like a batch job it
+    takes one of the host's `per_host_limit` connections, waiting while running downloads hold them all.
+    Returns False if it is already being downloaded by a runner.
+    """
+    enqueue([episode])
+    job = db.db_get_job(episode.download_dir, episode.filename)
+    if job is None or job["state"] != JOB_QUEUED:
+        return False
+
+    host = host_of(episode.download_url)
+    previous_status = episode.status
+    waited = []
+
+    def on_wait():
+        # Shown as started (and cancellable) while it waits for a connection.
+        waited.append(True)
+        episode.set_status(STATUS_DOWNLOADING, show_cancel=show_cancel_button)
+
+    if not acquire_host_slot(host, cancel_event, per_host_limit, on_wait=on_wait):
+        db.db_set_jobs_state([job["id"]], JOB_CANCELLED, JOB_QUEUED)
+        episode.set_status(STATUS_NEW)
+        return True
+    try:
+        started = _execute(job["id"], episode, cancel_event, priority, show_cancel_button)
+    finally:
+        release_host_slot(host)
+    if not started and waited:
+        # A batch runner claimed the job while this one waited for a connection.
+        episode.set_status(previous_status)
+    return started
+
+
+class QueueRunner:
+    """
+    Downloads every queued job of the shared queue through a DownloadScheduler.
+    `episode_lookup(download_dir, filename)` may return the Episode already shown in a list, so
+    its row follows the progress; other jobs are rebuilt from the queue. While jobs run, their
+    byte counts are saved every HEARTBEAT_SECONDS, which also tells other processes they are alive.
+    A job that fails for a transient reason is tried again later, up to retry.MAX_ATTEMPTS times,
+    and hosts that keep failing are paused by the shared circuit breaker (retry.breaker).
+    `on_job_done(job)` receives the scheduler job, whose payload is (job_row, episode), once it is final.
+    """
+    def __init__(self, cancel_event, max_workers=DEFAULT_MAX_WORKERS, per_host_limit=DEFAULT_PER_HOST_LIMIT,
+                 priority=PRIORITY_BATCH, episode_lookup=None, on_job_done=None, podcast_ids=None):
+        self.cancel_event = cancel_event
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.priority = priority
+        self.episode_lookup = episode_lookup
+        self.on_job_done = on_job_done
+        self.podcast_ids = set(podcast_ids) if podcast_ids is not None else None
+        self.jobs = []
+
+        self._running = {}
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+
+    def load(self):
+        """Reads the queued jobs (of `podcast_ids` only, when given); returns them as (job_row, episode) pairs."""
+        self.jobs = []
+        for job in db.db_get_jobs([JOB_QUEUED]):
+            if self.podcast_ids is not None and job["podcast_id"] not in self.podcast_ids:
+                continue
+            episode = None
+            if self.episode_lookup is not None:
+                episode = self.episode_lookup(job["download_dir"], job["filename"])
+            if episode is None:
+                episode = episode_for_job(job)
+            self.jobs.append((job, episode))
+        return self.jobs
+
+    def _run_job(self, job_id, episode):
+        with self._lock:
+            self._running[job_id] = episode
+            attempt = self._attempts[job_id] = self._attempts.get(job_id, 0) + 1
+        try:
+            _execute(job_id, episode, self.cancel_event, self.priority, attempt=attempt)
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+
+    def _heartbeat(self):
+        while not self._finished.wait(HEARTBEAT_SECONDS):
+            with self._lock:
+                progress = [(job_id, _bytes_done(episode), episode.bytes_total)
+                            for job_id, episode in self._running.items()]
+            if progress:
+                try:
+                    db.db_update_job_progress(progress)
+                except Exception as e:
+                    print(f"Error saving download progress: {e}")
+
+    def run(self):
+        """Downloads the loaded jobs (loading them first if needed). Returns the jobs that never started."""
+        if not self.jobs:
+            self.load()
+        scheduler = DownloadScheduler(self.cancel_event, max_workers=self.max_workers,
+                                      per_host_limit=self.per_host_limit, on_job_done=self.on_job_done,
+                                      breaker=retry.breaker)
+        for job, episode in self.jobs:
+            scheduler.submit(episode.download_url, self._run_job, job["id"], episode, payload=(job, episode))
+
+        heartbeat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        try:
+            not_started = scheduler.run()
+        finally:
+            self._finished.set()
+
+        if not_started:
+            db.db_set_jobs_state([job.payload[0]["id"] for job in not_started], JOB_CANCELLED, JOB_QUEUED)
+        return not_started
@@ -0,0 +1,136 @@
+import hashlib
+import os
+
+from . import data_manager as db
+from .dir_index import downloaded_files
+
+HASH_CHUNK_SIZE = 1024 * 1024
+CORRUPT_SUFFIX = ".corrupt"
+
+RESULT_OK = "ok"
+RESULT_MISSING = "missing"
+RESULT_SIZE_MISMATCH = "size_mismatch"
+RESULT_HASH_MISMATCH = "hash_mismatch"
+RESULT_ERROR = "error"
+
+
+def new_hasher():
+    return hashlib.sha256()
+
+
+def hash_file(path, hasher=None, limit=None):
+    """
+    Feeds the first `limit` bytes of a file (all of it by default) into `hasher` and returns it.
+    Runs in worker processes too, so it must stay importable without the UI.
+    """
+    hasher = hasher or new_hasher()
+    remaining = limit
+    with open(path, "rb") as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(HASH_CHUNK_SIZE if remaining is None else min(HASH_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return hasher
+
+
+def _hash_worker(path):
+    return hash_file(path).hexdigest()
+
+
+class VerifyResult:
+    def __init__(self, podcast_id, episode_key, path, outcome, detail=""):
+        self.podcast_id = podcast_id
+        self.episode_key = episode_key
+        self.path = path
+        self.outcome = outcome
+        self.detail = detail
+
+
+def _quarantine(path):
+    """Renames a damaged file out of the way so the episode is offered for download again."""
+    try:
+        os.replace(path, path + CORRUPT_SUFFIX)
+        downloaded_files.discard(path)
+    except OSError as e:
+        print(f"Error moving damaged file {path}: {e}")
+
+
+def verify_library(podcast_ids=None, max_workers=None, cancel_event=None, on_result=None, quarantine=True):
+    """
+    Re-checks downloaded episodes (of every podcast, or of `podcast_ids`) against the size and
+    SHA-256 recorded when they were downloaded.
+    Sizes are compared first (one stat per file); only files of the right size are hashed, spread
+    over a single process pool with one worker per core by default. Missing files go back to 'new',
+    damaged ones are marked 'corrupt' and, with `quarantine`, renamed to *.corrupt.
+    `on_result(VerifyResult)` is called for each file. Returns {outcome: count}.
+    """
+    rows = db.db_get_recorded_files(podcast_ids)
+    results = []
+
+    def report(result):
+        results.append(result)
+        if on_result is not None:
+            try:
+                on_result(result)
+            except Exception as e:
+                print(f"Error in verify callback: {e}")
+
+    to_hash = {}
+    for row in rows:
+        # Where the file was written, not the podcast's current folder, which may have changed since.
+        path = row["file_path"]
+        try:
+            size = os.stat(path).st_size
+        except FileNotFoundError:
+            report(VerifyResult(row["podcast_id"], row["episode_key"], path, RESULT_MISSING))
+            continue
+        except OSError as e:
+            report(VerifyResult(row["podcast_id"], row["episode_key"], path, RESULT_ERROR, str(e)))
+            continue
+        if size != row["file_size"]:
+            report(VerifyResult(row["podcast_id"], row["episode_key"], path, RESULT_SIZE_MISMATCH,
+                                f"{size} bytes, expected {row['file_size']}"))
+            continue
+        to_hash[path] = row
+
+    if to_hash:
+        # multiprocessing is only loaded when there is something to hash.
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        # Spawned, not forked: the GUI runs this next to other threads whose locks a fork would copy.
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(_hash_worker, path): path for path in to_hash}
+            for future in as_completed(futures):
+                if cancel_event is not None and cancel_event.is_set():
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                path = futures[future]
+                row = to_hash[path]
+                try:
+                    digest = future.result()
+                except Exception as e:
+                    report(VerifyResult(row["podcast_id"], row["episode_key"], path, RESULT_ERROR, str(e)))
+                    continue
+                outcome = RESULT_OK if digest == row["file_sha256"] else RESULT_HASH_MISMATCH
+                report(VerifyResult(row["podcast_id"], row["episode_key"], path, outcome))
+
+    verified = [(r.podcast_id, r.episode_key) for r in results if r.outcome == RESULT_OK]
+    failed = []
+    for r in results:
+        if r.outcome == RESULT_MISSING:
+            failed.append((r.podcast_id, r.episode_key, "new"))
+        elif r.outcome in (RESULT_SIZE_MISMATCH, RESULT_HASH_MISMATCH):
+            failed.append((r.podcast_id, r.episode_key, "corrupt"))
+            if quarantine:
+                _quarantine(r.path)
+    db.db_save_verification(verified, failed)
+
+    summary = {}
+    for r in results:
+        summary[r.outcome] = summary.get(r.outcome, 0) + 1
+    return summary
@@ -0,0 +1,199 @@
+import os
+import sqlite3
+import sys
+import threading
+
+from . import data_manager as db
+from .dir_index import downloaded_files
+
+STATUS_NEW = "new"
+STATUS_DOWNLOADED = "downloaded"
+STATUS_QUEUED = "queued"
+STATUS_DOWNLOADING = "downloading"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+# Failed for a reason that may pass (dropped connection, 503); a queue runner will try again.
+STATUS_RETRYING = "retrying"
+
+FINISHED_STATUSES = (STATUS_DOWNLOADED, STATUS_DONE)
+
+_cancel_event_lock = threading.Lock()
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class Episode:
+    """
+    Data and download state of a single episode, independent of any UI control.
+    A list row may bind itself as `view` to mirror the state; it is notified on every change.
+    Kept small because feeds hold thousands of them: slots instead of an instance dict, one
+    shared copy of the values most episodes repeat (folder, author, channel artwork), and no
+    description in memory once the catalog has it (see release_description).
+    """
+    __slots__ = (
+        "ep_number", "title", "_description", "image_src", "download_url", "filename", "download_dir",
+        "pub_date", "link", "duration", "author", "guid", "podcast_id", "published_at", "duration_seconds",
+        "status", "progress", "bytes_done", "bytes_total", "error", "show_cancel", "_cancel_event", "view",
+    )
+
+    def __init__(self, ep_number, title, description, image_src, download_url, filename, download_dir,
+                 pub_date, link, duration, author, guid, podcast_id=None, published_at=None, duration_seconds=None):
+        self.ep_number = ep_number
+        self.title = title
+        self._description = description
+        self.image_src = _intern(image_src)
+        self.download_url = download_url
+        self.filename = filename
+        self.download_dir = _intern(download_dir)
+        self.pub_date = pub_date
+        self.link = link
+        self.duration = _intern(duration)
+        self.author = _intern(author)
+        self.guid = guid
+        self.podcast_id = podcast_id
+        # pub_date and duration as numbers (timestamp, seconds), None when the feed's text could not be read.
+        self.published_at = published_at
+        self.duration_seconds = duration_seconds
+
+        self.status = STATUS_DOWNLOADED if downloaded_files.exists(self.full_file_path) else STATUS_NEW
+        self.progress = 0.0
+        self.bytes_done = 0
+        self.bytes_total = None
+        self.error = None
+        self.show_cancel = False
+        self._cancel_event = None
+        self.view = None
+
+    @classmethod
+    def from_mapping(cls, episode, download_dir, podcast_id=None, keep_description=True):
+        """
+        Builds an Episode from a parsed feed item dict or an `episodes` catalog row.
+        With keep_description=False, an episode of a saved podcast reads its description from
+        the catalog when needed, so the mapping must already be stored there.
+        """
+        return cls(
+            ep_number = episode["ep_number"],
+            title = episode["title"],
+            description = episode.get("description") if keep_description or podcast_id is None else None,
+            image_src = episode["image_src"],
+            download_url = episode["download_url"],
+            filename = episode["filename"],
+            download_dir = download_dir,
+            pub_date = episode["pub_date"],
+            link = episode["link"],
+            duration = episode["duration"],
+            author = episode["author"],
+            guid = episode["guid"],
+            podcast_id = podcast_id,
+            # Missing from download jobs queued by older versions.
+            published_at = episode.get("published_at"),
+            duration_seconds = episode.get("duration_seconds")
+        )
+
+    def to_mapping(self, include_description=True):
+        """The feed fields of this episode, as accepted by from_mapping."""
+        mapping = {
+            "ep_number": self.ep_number,
+            "title": self.title,
+            "image_src": self.image_src,
+            "download_url": self.download_url,
+            "filename": self.filename,
+            "pub_date": self.pub_date,
+            "link": self.link,
+            "duration": self.duration,
+            "author": self.author,
+            "guid": self.guid,
+            "published_at": self.published_at,
+            "duration_seconds": self.duration_seconds,
+        }
+        if include_description:
+            mapping["description"] = self.description
+        return mapping
+
+    @property
+    def key(self):
+        return db.episode_key(self.guid, self.download_url)
+
+    @property
+    def full_file_path(self):
+        return os.path.join(self.download_dir, self.filename)
+
+    @property
+    def description(self):
+        """
+        The cleaned description; read from the catalog when it is not held in memory, one
+        query per read. Use load_descriptions() for many episodes at once (list rows, scans).
+        A freshly parsed one (feed_parser.LazyDescription) is cleaned on first read.
+        """
+        if self._description is None:
+            if self.podcast_id is None:
+                return ""
+            try:
+                return db.db_get_episode_description(self.podcast_id, self.key) or ""
+            except sqlite3.Error as e:
+                print(f"Error loading description of {self.title}: {e}")
+                return ""
+        return str(self._description)
+
+    def release_description(self):
+        """Drops the in-memory description of a saved podcast's episode once the catalog holds it."""
+        if self.podcast_id is not None:
+            self._description = None
+
+    @property
+    def cancel_event(self):
+        """Created on first use: most episodes are never downloaded on their own."""
+        if self._cancel_event is None:
+            with _cancel_event_lock:
+                if self._cancel_event is None:
+                    self._cancel_event = threading.Event()
+        return self._cancel_event
+
+    @property
+    def is_downloaded(self):
+        return self.status in FINISHED_STATUSES
+
+    def set_status(self, status, show_cancel=False):
+        self.status = status
+        self.show_cancel = show_cancel
+        if status != STATUS_DOWNLOADING:
+            self.progress = 0.0
+        view = self.view
+        if view is not None:
+            view.on_status_changed(self)
+
+    def set_progress(self, value, bytes_done=None, bytes_total=None):
+        self.progress = value
+        if bytes_done is not None:
+            self.bytes_done = bytes_done
+            self.bytes_total = bytes_total
+        view = self.view
+        if view is not None:
+            view.on_progress_changed(self)
+
+
+def load_descriptions(episodes):
+    """
+    The descriptions of `episodes`, in order. Those only the catalog holds are read with one
+    query per podcast rather than one per episode.
+    """
+    descriptions = [None] * len(episodes)
+    released = {}
+    for index, episode in enumerate(episodes):
+        if episode._description is not None:
+            descriptions[index] = str(episode._description)
+        elif episode.podcast_id is None:
+            descriptions[index] = ""
+        else:
+            released.setdefault(episode.podcast_id, []).append(index)
+    for podcast_id, indexes in released.items():
+        try:
+            found = db.db_get_episode_descriptions(podcast_id, [episodes[index].key for index in indexes])
+        except sqlite3.Error as e:
+            print(f"Error loading descriptions: {e}")
+            found = {}
+        for index in indexes:
+            descriptions[index] = found.get(episodes[index].key) or ""
+    return descriptions
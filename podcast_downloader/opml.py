@@ -0,0 +1,71 @@
+import os
+import re
+import xml.etree.ElementTree as ET
+
+from . import data_manager as db
+
+OPML_VERSION = "2.0"
+
+
+class OpmlFeed:
+    def __init__(self, name, feed_url):
+        self.name = name
+        self.feed_url = feed_url
+
+
+def parse_opml(source):
+    """
+    Reads the feeds of an OPML subscription list (a path or a binary file object).
+    Every <outline> with an xmlUrl is a feed, however the outlines are nested in folders.
+    """
+    feeds = []
+    for outline in ET.parse(source).getroot().iter("outline"):
+        feed_url = (outline.get("xmlUrl") or "").strip()
+        if not feed_url:
+            continue
+        name = (outline.get("title") or outline.get("text") or feed_url).strip()
+        feeds.append(OpmlFeed(name, feed_url))
+    return feeds
+
+
+def folder_name(name):
+    """A directory name for a podcast, without characters that are invalid on common filesystems."""
+    folder = re.sub(r'[\\/*?:"<>|]', "", name).strip(" .")
+    return folder or "podcast"
+
+
+def import_opml(source, download_root):
+    """
+    Saves the feeds of an OPML file as podcasts, each downloading to its own folder under
+    `download_root`, in a single transaction. Returns (added, skipped); feeds whose name or
+    URL is already saved are skipped.
+    """
+    feeds = parse_opml(source)
+    added = db.db_import_podcasts([
+        (feed.name, feed.feed_url, os.path.join(download_root, folder_name(feed.name)))
+        for feed in feeds
+    ])
+    return added, len(feeds) - added
+
+
+def build_opml(podcasts, title="Podcast Downloader subscriptions"):
+    """The OPML document (bytes) listing `podcasts` (rows with name and feed_url). Credentials are left out."""
+    root = ET.Element("opml", version=OPML_VERSION)
+    head = ET.SubElement(root, "head")
+    ET.SubElement(head, "title").text = title
+    body = ET.SubElement(root, "body")
+    for podcast in podcasts:
+        feed_url = podcast["feed_url"]
+        if not feed_url.startswith(("http://", "https://")):
+            feed_url = f"https://{feed_url}"
+        ET.SubElement(body, "outline", type="rss", text=podcast["name"], title=podcast["name"], xmlUrl=feed_url)
+    ET.indent(root)
+    return ET.tostring(root, encoding="utf-8", xml_declaration=True)
+
+
+def export_opml(path):
+    """Writes every saved podcast to an OPML file. Returns how many were written."""
+    podcasts = db.db_get_all_podcast_details()
+    with open(path, "wb") as f:
+        f.write(build_opml(podcasts))
+    return len(podcasts)
@@ -0,0 +1,225 @@
+import json
+import random
+import threading
+import time
+
+from . import data_manager as db
+from . import feed_manager
+from . import job_queue
+from .models import Episode
+
+MIN_INTERVAL = 15 * 60
+MAX_INTERVAL = 24 * 3600
+# A <ttl> is honored up to this long; beyond it the feed would effectively never be checked.
+MAX_TTL_INTERVAL = 7 * 24 * 3600
+# Used until a feed has at least two dated episodes.
+DEFAULT_INTERVAL = 6 * 3600
+# A feed is checked about four times per typical gap between its episodes.
+CADENCE_FRACTION = 0.25
+CADENCE_SAMPLES = 10
+# A feed silent for this many typical gaps has slowed down or stopped: its silence sets the pace.
+DORMANT_GAPS = 4
+# Each poll that brings nothing new stretches the interval, up to UNCHANGED_MAX_STEPS times.
+UNCHANGED_BACKOFF = 1.5
+UNCHANGED_MAX_STEPS = 4
+ERROR_BACKOFF = 2.0
+# Every interval is randomly stretched or shortened by up to this fraction, so feeds drift
+# apart instead of being requested together.
+JITTER = 0.1
+# Podcasts seen for the first time are spread over this long instead of all polled at once.
+INITIAL_SPREAD = 10 * 60
+# The idle loop looks for new podcasts and due feeds at least this often.
+CHECK_SECONDS = 60
+
+
+def publishing_cadence(timestamps):
+    """
+    Returns (typical seconds between episodes, timestamp of the latest one) from publication
+    timestamps; the median of the last CADENCE_SAMPLES gaps, so one special or a long summer
+    break does not skew it. Either value is None when there are not enough dated episodes.
+    """
+    timestamps = sorted((ts for ts in timestamps if ts is not None), reverse=True)
+    if not timestamps:
+        return None, None
+    recent = timestamps[:CADENCE_SAMPLES + 1]
+    gaps = sorted(newer - older for newer, older in zip(recent, recent[1:]) if newer > older)
+    if not gaps:
+        return None, timestamps[0]
+    return gaps[len(gaps) // 2], timestamps[0]
+
+
+def cadence_interval(cadence, last_published, now):
+    """The polling interval a feed's publishing history calls for, before backoff and jitter."""
+    if cadence is None:
+        return DEFAULT_INTERVAL
+    interval = cadence * CADENCE_FRACTION
+    if last_published is not None and now - last_published > DORMANT_GAPS * cadence:
+        interval = max(interval, (now - last_published) * CADENCE_FRACTION)
+    return min(max(interval, MIN_INTERVAL), MAX_INTERVAL)
+
+
+def skip_hours_adjust(timestamp, skip_hours, rand=random.random):
+    """Moves a poll out of the feed's <skipHours> (GMT hours) to a few minutes into the next allowed hour."""
+    skip_hours = set(skip_hours or ())
+    if not skip_hours or len(skip_hours) >= 24:
+        return timestamp
+    moved = False
+    while time.gmtime(timestamp).tm_hour in skip_hours:
+        timestamp = (timestamp // 3600 + 1) * 3600
+        moved = True
+    return timestamp + rand() * 300 if moved else timestamp
+
+
+def plan_next_poll(base_interval, failures, unchanged, ttl_minutes, skip_hours, now, rand=random.random):
+    """Returns (next poll timestamp, interval) after backoff, <ttl>, jitter and <skipHours>."""
+    if failures:
+        interval = base_interval * ERROR_BACKOFF ** failures
+    else:
+        interval = base_interval * UNCHANGED_BACKOFF ** min(unchanged, UNCHANGED_MAX_STEPS)
+    interval = min(max(interval, MIN_INTERVAL), MAX_INTERVAL)
+    if ttl_minutes:
+        interval = max(interval, min(ttl_minutes * 60, MAX_TTL_INTERVAL))
+    interval *= 1 + JITTER * (2 * rand() - 1)
+    return skip_hours_adjust(now + interval, skip_hours, rand), interval
+
+
+class FeedPoller:
+    """
+    Refreshes saved podcasts in the background, each at its own pace: feeds that publish often
+    are checked often, quiet ones rarely, and feeds that fail or keep answering "not modified"
+    back off. The feed's own <ttl> and <skipHours> are respected. Episodes that appear in a
+    podcast with auto-download turned on go straight into the download queue.
+
+    `on_outcome(FeedOutcome)` sees every refresh; `on_new_episodes(podcast, episodes)` is called
+    with the queued Episodes. Use start()/stop() for a background thread, or poll_due() to drive
+    it from a loop of your own.
+
+    Large feeds are parsed in feed_manager.shared_parse_pool(), the same worker processes as
+    "Refresh all" and `sync`, started once (`parse_workers` of them) rather than on every poll.
+    """
+    def __init__(self, max_workers=feed_manager.DEFAULT_REFRESH_WORKERS, on_outcome=None, on_new_episodes=None,
+                 parse_workers=None):
+        self.max_workers = max_workers
+        self.parse_workers = parse_workers
+        self.on_outcome = on_outcome
+        self.on_new_episodes = on_new_episodes
+        self._stop = threading.Event()
+        self._thread = None
+
+    def seconds_until_next(self):
+        states = db.db_get_poll_states()
+        podcast_ids = [podcast_id for podcast_id, _ in db.db_get_podcasts()]
+        if not podcast_ids:
+            return CHECK_SECONDS
+        if any(podcast_id not in states for podcast_id in podcast_ids):
+            return 0
+        return max(0.0, min(states[podcast_id]["next_poll_at"] for podcast_id in podcast_ids) - time.time())
+
+    def poll_due(self):
+        """Refreshes the podcasts whose next poll is due. Returns their FeedOutcomes."""
+        now = time.time()
+        states = db.db_get_poll_states()
+        due = []
+        for podcast in db.db_get_all_podcast_details():
+            state = states.get(podcast["id"])
+            if state is None:
+                db.db_save_poll_state(podcast["id"], now + random.uniform(0, INITIAL_SPREAD), DEFAULT_INTERVAL,
+                                      0, 0, None, None, None)
+            elif state["next_poll_at"] <= now:
+                due.append(podcast)
+        if not due:
+            return []
+
+        known_keys = {podcast["id"]: db.db_get_episode_keys(podcast["id"]) for podcast in due}
+        outcomes = feed_manager.refresh_all(due, self.max_workers, self.parse_workers, on_outcome=self.on_outcome)
+        for outcome in outcomes:
+            podcast = outcome.podcast
+            try:
+                new_episodes = self._new_episodes(outcome, known_keys[podcast["id"]])
+                self._reschedule(outcome, states[podcast["id"]], bool(new_episodes))
+                # With an empty catalog before, this was the first refresh rather than a new release.
+                if new_episodes and podcast["auto_download"] and known_keys[podcast["id"]]:
+                    self._queue(podcast, new_episodes)
+            except Exception as e:
+                print(f"Error scheduling {podcast['name']}: {e}")
+                self._postpone(podcast["id"], states[podcast["id"]])
+        return outcomes
+
+    @staticmethod
+    def _new_episodes(outcome, known_keys):
+        if outcome.result is None or not outcome.result.episodes:
+            return []
+        return [
+            episode for episode in outcome.result.episodes
+            if db.episode_key(episode["guid"], episode["download_url"]) not in known_keys
+        ]
+
+    def _reschedule(self, outcome, state, found_new):
+        podcast_id = outcome.podcast["id"]
+        failures = state["failures"]
+        unchanged = state["unchanged"]
+        ttl = state["ttl"]
+        skip_hours = json.loads(state["skip_hours"]) if state["skip_hours"] else []
+
+        if outcome.error is not None:
+            failures += 1
+        else:
+            failures = 0
+            unchanged = 0 if found_new else unchanged + 1
+            if outcome.result.status == feed_manager.STATUS_FETCHED:
+                # Only a freshly fetched document carries the channel's current hints.
+                ttl = outcome.result.channel["ttl"]
+                skip_hours = outcome.result.channel["skip_hours"]
+
+        now = time.time()
+        cadence, last_published = publishing_cadence(db.db_get_publish_times(podcast_id, CADENCE_SAMPLES + 1))
+        next_poll_at, interval = plan_next_poll(cadence_interval(cadence, last_published, now),
+                                                failures, unchanged, ttl, skip_hours, now)
+        db.db_save_poll_state(podcast_id, next_poll_at, interval, failures, unchanged, ttl, skip_hours, now)
+
+    @staticmethod
+    def _postpone(podcast_id, state):
+        """Keeps a feed whose rescheduling failed from being polled again right away."""
+        try:
+            db.db_save_poll_state(podcast_id, time.time() + MIN_INTERVAL, state["interval"], state["failures"],
+                                  state["unchanged"], state["ttl"],
+                                  json.loads(state["skip_hours"]) if state["skip_hours"] else None, time.time())
+        except Exception as e:
+            print(f"Error postponing podcast {podcast_id}: {e}")
+
+    def _queue(self, podcast, mappings):
+        episodes = [
+            episode for episode in (
+                Episode.from_mapping(mapping, podcast["download_dir"], podcast["id"], keep_description=False)
+                for mapping in mappings
+            )
+            if not episode.is_downloaded
+        ]
+        if not episodes:
+            return
+        job_queue.enqueue(episodes)
+        if self.on_new_episodes is not None:
+            try:
+                self.on_new_episodes(podcast, episodes)
+            except Exception as e:
+                print(f"Error in new-episodes callback: {e}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="feed-poller", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the background thread; the shared parse pool stays up for other refreshes and is closed at exit."""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_due()
+                wait = min(max(self.seconds_until_next(), 1.0), CHECK_SECONDS)
+            except Exception as e:
+                print(f"Error polling feeds: {e}")
+                wait = CHECK_SECONDS
+            self._stop.wait(wait)
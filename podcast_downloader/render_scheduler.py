@@ -0,0 +1,60 @@
+import threading
+import time
+
+DEFAULT_FPS = 10
+
+
+class RenderScheduler:
+    """
+    Coalesces UI updates coming from any thread and sends them to the page at a fixed rate.
+    Callers change control properties as usual and then call `mark_dirty(control)`.
+    Every tick, the controls marked since the last tick are sent in a single `page.update()`.
+    A control marked many times between two ticks is only sent once.
+    """
+    def __init__(self, page, fps=DEFAULT_FPS):
+        self.page = page
+        self.interval = 1.0 / fps
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._loop, name="render-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self.flush()
+
+    def mark_dirty(self, *controls):
+        with self._lock:
+            for control in controls:
+                if control is not None:
+                    self._dirty[id(control)] = control
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            controls = list(self._dirty.values())
+            self._dirty.clear()
+
+        try:
+            self.page.update(*controls)
+        except Exception:
+            # One detached control (e.g. a row filtered out of the list) fails the whole batch.
+            for control in controls:
+                try:
+                    control.update()
+                except Exception:
+                    pass
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            self.flush()
+            elapsed = time.monotonic() - started
+            self._stop_event.wait(max(0.0, self.interval - elapsed))
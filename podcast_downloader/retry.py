@@ -0,0 +1,215 @@
+import email.utils
+import random
+import threading
+import time
+
+# Answers that usually mean "not now" rather than "never": worth another attempt later.
+RETRY_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+# Attempts per download in one batch, the first one included.
+MAX_ATTEMPTS = 5
+BASE_DELAY = 2.0
+MAX_DELAY = 5 * 60
+# A Retry-After longer than this is not waited for; the download fails and can be retried by hand.
+MAX_RETRY_AFTER = 60 * 60
+
+# Transient failures in a row after which a host's downloads are paused.
+FAILURE_THRESHOLD = 3
+# The first pause is this long; each further trip without a success in between doubles it.
+OPEN_SECONDS = 30
+MAX_OPEN_SECONDS = 10 * 60
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half-open"
+
+
+class TransientError(IOError):
+    """A failure that another attempt may not hit, e.g. a connection dropped halfway through."""
+
+
+class RetryLater(Exception):
+    """Raised by a scheduler job that wants to run again after `delay` seconds."""
+    def __init__(self, delay, error=None):
+        super().__init__(str(error) if error is not None else f"retry in {delay:.0f}s")
+        self.delay = delay
+        self.error = error
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delta-seconds or an HTTP date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+    return max(0.0, moment - (time.time() if now is None else now))
+
+
+def classify(error):
+    """
+    Returns (transient, retry_after) for an exception raised by a download: whether trying again
+    later may succeed, and the server's Retry-After in seconds if it sent one.
+    """
+    # Imported here: only needed once something failed, by which time requests is loaded.
+    from requests import exceptions as requests_errors
+    from urllib3 import exceptions as urllib3_errors
+
+    if isinstance(error, requests_errors.HTTPError):
+        response = error.response
+        if response is None or response.status_code not in RETRY_STATUS_CODES:
+            return False, None
+        return True, parse_retry_after(response.headers.get("Retry-After"))
+    transient = (
+        TransientError,
+        requests_errors.ConnectionError,
+        requests_errors.Timeout,
+        requests_errors.ChunkedEncodingError,
+        urllib3_errors.ProtocolError,
+        urllib3_errors.TimeoutError,
+        ConnectionError,
+        TimeoutError,
+    )
+    return isinstance(error, transient), None
+
+
+def backoff_delay(attempt, base=BASE_DELAY, rand=random.random):
+    """
+    Seconds to wait after the `attempt`-th failure: doubling from `base` up to MAX_DELAY, of which
+    a random half is taken off so that downloads failing together do not come back together.
+    """
+    delay = min(base * 2 ** (attempt - 1), MAX_DELAY)
+    return delay / 2 + rand() * delay / 2
+
+
+def retry_delay(attempt, retry_after=None, rand=random.random):
+    """The wait before the next attempt; never shorter than what the server asked for."""
+    delay = backoff_delay(attempt, rand=rand)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker. After FAILURE_THRESHOLD transient failures in a row, or when the
+    server asks to be left alone with a Retry-After, the host is "open": its queued downloads
+    wait while those of other hosts go on. Once the pause is over one download is let through
+    as a probe ("half-open"); its success closes the breaker, its failure opens it again for
+    twice as long.
+
+    `add_listener(callback)` registers `callback(host, state, reopens_at)`, called on every change.
+    Listeners are never called while a lock is held: changes are queued and delivered by flush(),
+    which record_success()/record_failure() call themselves. allow() is meant to be called under
+    the caller's own lock, so it only queues; the caller flushes once that lock is released.
+    """
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, open_seconds=OPEN_SECONDS,
+                 max_open_seconds=MAX_OPEN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self._hosts = {}
+        self._listeners = []
+        self._changes = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback):
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def flush(self):
+        """Delivers the queued state changes to the listeners. Call without holding any lock."""
+        with self._lock:
+            changes, self._changes = self._changes, []
+            listeners = list(self._listeners)
+        for host, state, reopens_at in changes:
+            for callback in listeners:
+                try:
+                    callback(host, state, reopens_at)
+                except Exception as e:
+                    print(f"Error in circuit breaker listener: {e}")
+
+    def allow(self, host, now=None):
+        """
+        True if a download from `host` may start now. The first call after a pause turns the
+        breaker half-open and lets that one download through; others wait for its outcome.
+        The change is only queued: call flush() afterwards, outside your own locks.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is None or entry["state"] == BREAKER_CLOSED:
+                return True
+            if entry["state"] == BREAKER_HALF_OPEN or now < entry["reopens_at"]:
+                return False
+            entry["state"] = BREAKER_HALF_OPEN
+            self._changes.append((host, BREAKER_HALF_OPEN, None))
+        return True
+
+    def record_success(self, host):
+        with self._lock:
+            entry = self._hosts.pop(host, None)
+            if entry is not None and entry["state"] != BREAKER_CLOSED:
+                self._changes.append((host, BREAKER_CLOSED, None))
+        self.flush()
+
+    def release(self, host):
+        """A download ended without telling anything about the host (cancelled, file already there): let another probe through."""
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is not None and entry["state"] == BREAKER_HALF_OPEN:
+                entry["state"] = BREAKER_OPEN
+                entry["reopens_at"] = time.time()
+
+    def record_failure(self, host, retry_after=None, now=None):
+        """Counts a transient failure of `host`. Returns the time it reopens if this opened the breaker."""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._hosts.setdefault(host, {"state": BREAKER_CLOSED, "failures": 0, "trips": 0, "reopens_at": 0.0})
+            entry["failures"] += 1
+            if entry["state"] == BREAKER_OPEN:
+                # Downloads that were already running when it opened: at most push the reopening back.
+                if retry_after is not None:
+                    entry["reopens_at"] = max(entry["reopens_at"], now + min(retry_after, MAX_RETRY_AFTER))
+                return None
+            if (entry["state"] == BREAKER_CLOSED and entry["failures"] < self.failure_threshold
+                    and retry_after is None):
+                return None
+            entry["trips"] += 1
+            pause = min(self.open_seconds * 2 ** (entry["trips"] - 1), self.max_open_seconds)
+            if retry_after is not None:
+                pause = max(pause, min(retry_after, MAX_RETRY_AFTER))
+            entry["state"] = BREAKER_OPEN
+            entry["reopens_at"] = now + pause
+            reopens_at = entry["reopens_at"]
+            self._changes.append((host, BREAKER_OPEN, reopens_at))
+        self.flush()
+        return reopens_at
+
+    def reopens_at(self, host):
+        """When a paused host's downloads may start again, or None if it is not paused."""
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is None or entry["state"] != BREAKER_OPEN:
+                return None
+            return entry["reopens_at"]
+
+    def snapshot(self):
+        """{host: (state, reopens_at, failures)} for every host that is not healthy."""
+        with self._lock:
+            return {
+                host: (entry["state"], entry["reopens_at"] if entry["state"] == BREAKER_OPEN else None, entry["failures"])
+                for host, entry in self._hosts.items()
+            }
+
+
+# Shared by every download in the process, like bandwidth.limiter.
+breaker = CircuitBreaker()
@@ -0,0 +1,93 @@
+import errno
+import os
+import shutil
+import time
+
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+# Each read should carry about this much time's worth of data: large enough to keep the
+# per-chunk Python overhead negligible on fast links, small enough that progress, cancels
+# and the bandwidth limiter still react quickly on slow ones.
+TARGET_CHUNK_SECONDS = 0.05
+SMOOTHING = 0.3
+
+
+class AdaptiveChunkSize:
+    """
+    Picks the read size from the measured throughput (a moving average), as a power of two
+    between MIN_CHUNK_SIZE and MAX_CHUNK_SIZE. `cap` further limits it, e.g. under a speed limit,
+    and always wins: read_size() may go below MIN_CHUNK_SIZE to respect it.
+    """
+    def __init__(self, initial=MIN_CHUNK_SIZE):
+        self.size = initial
+        self.cap = None
+        self._throughput = None
+
+    def update(self, nbytes, seconds):
+        if nbytes <= 0:
+            return
+        sample = nbytes / max(seconds, 1e-6)
+        if self._throughput is None:
+            self._throughput = sample
+        else:
+            self._throughput += SMOOTHING * (sample - self._throughput)
+
+        wanted = self._throughput * TARGET_CHUNK_SECONDS
+        size = MIN_CHUNK_SIZE
+        while size < wanted and size < MAX_CHUNK_SIZE:
+            size *= 2
+        # Rounding up to a power of two may overshoot the cap, so it is applied last.
+        self.size = min(size, self.cap) if self.cap else size
+
+    def read_size(self):
+        """The size of the next read: `size`, clamped to the current `cap` after rounding."""
+        if self.cap:
+            return max(1, min(self.size, self.cap))
+        return self.size
+
+
+def iter_chunks(raw, sizer=None):
+    """
+    Reads a binary stream into one reused buffer and yields memoryviews of the bytes read.
+    Each view is only valid until the next iteration: consume it (write, hash) before moving on.
+    `raw` needs readinto(), as urllib3 and http.client responses and files have.
+    """
+    sizer = sizer or AdaptiveChunkSize()
+    buffer = bytearray(MAX_CHUNK_SIZE)
+    view = memoryview(buffer)
+    while True:
+        started = time.perf_counter()
+        count = raw.readinto(view[:sizer.read_size()])
+        if not count:
+            return
+        sizer.update(count, time.perf_counter() - started)
+        yield view[:count]
+
+
+def ensure_free_space(directory, needed):
+    """Raises OSError(ENOSPC) up front when the target disk cannot hold `needed` more bytes."""
+    if needed <= 0:
+        return
+    try:
+        free = shutil.disk_usage(directory).free
+    except OSError:
+        return
+    if free < needed:
+        raise OSError(errno.ENOSPC, f"Not enough disk space: {needed} bytes needed, {free} free", directory)
+
+
+def preallocate(f, offset, length):
+    """
+    Reserves `length` bytes from `offset` for an open file, so large episodes are laid out
+    contiguously and a full disk is reported before the transfer starts. Extends the file.
+    Returns False where the platform or filesystem cannot do it; a full disk still raises.
+    """
+    if length <= 0 or not hasattr(os, "posix_fallocate"):
+        return False
+    try:
+        os.posix_fallocate(f.fileno(), offset, length)
+        return True
+    except OSError as e:
+        if e.errno in (errno.ENOSPC, errno.EFBIG):
+            raise
+        return False
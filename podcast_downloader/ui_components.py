@@ -1,52 +1,30 @@
 import flet as ft
-import threading
-import requests
-import html
-import os
-from time import sleep
+import math
 
-from .utils import HEADERS
-from . import app as logic
+from .models import (
+    load_descriptions, STATUS_DOWNLOADED, STATUS_QUEUED, STATUS_DOWNLOADING, STATUS_DONE, STATUS_FAILED, STATUS_RETRYING
+)
 
-class EpisodeControl(ft.Container):
+ROW_HEIGHT = 111
+BUFFER_ROWS = 5
+DEFAULT_VIEWPORT_HEIGHT = 900
+
+
+class EpisodeRow(ft.Container):
     """
-    A custom Flet control representing a single podcast episode in the list.
-    Manages its own download state and UI updates. Triggers sidebar display on click.
+    A reusable list row that displays whichever Episode is currently bound to it.
+    Rows are recycled while scrolling: `bind()` swaps the episode and refreshes every field.
+    The description is read once per bind and kept in the row while the episode stays bound.
+    Download state changes on the bound episode are mirrored through the render scheduler.
+    Triggers sidebar display on click.
+    `handlers` provides artwork_src(url), schedule_render(*controls), update_sidebar(episode, description)
+    and individual_download_clicked(episode); rows never import the application logic themselves.
     """
-    def __init__(self, page: ft.Page, ep_number: int, title, description, image_src, download_url, filename, download_dir,
-                 global_cancel_event: threading.Event,
-                 global_controls: dict,
-                 episode_list_ref: ft.ListView,
-                 pub_date: str,
-                 link: str,
-                 duration: str,
-                 author: str,
-                 guid: str):
-
+    def __init__(self, handlers):
         super().__init__()
 
-        self.page = page
-        self.ep_number = ep_number
-        self.title = title
-        self.description = description
-        self.image_src = image_src
-        self.download_url = download_url
-        self.filename = filename
-        self.download_dir = download_dir
-
-        self.pub_date = pub_date
-        self.link = link
-        self.duration = duration
-        self.author = author
-        self.guid = guid
-
-        self.global_cancel_event = global_cancel_event
-        self.individual_cancel_event = threading.Event()
-
-        self.global_controls = global_controls
-        self.episode_list_ref = episode_list_ref
-
-        self.full_file_path = os.path.join(self.download_dir, self.filename)
+        self.handlers = handlers
+        self.episode = None
 
         self.download_button = ft.IconButton(
             icon=ft.Icons.DOWNLOAD,
@@ -55,34 +33,24 @@ class EpisodeControl(ft.Container):
             on_click=self.individual_download_task_prevent_sidebar,
             expand=True
         )
-
-        status_content = None
-        if os.path.exists(self.full_file_path):
-            status_content = ft.Icon(name=ft.Icons.FOLDER_ZIP, color=ft.Colors.YELLOW)
-        else:
-            status_content = ft.Row(
-                [self.download_button],
-                spacing=5,
-                vertical_alignment=ft.CrossAxisAlignment.CENTER,
-                alignment=ft.MainAxisAlignment.CENTER
-            )
-
-        initial_trailing_content = ft.Container(
-            content=status_content,
-            width=80,
-            alignment=ft.alignment.center
+        self.cancel_button = ft.IconButton(
+            icon=ft.Icons.CANCEL,
+            icon_color=ft.Colors.RED,
+            on_click=self.cancel_clicked,
+            tooltip="Cancel download"
         )
+        self.progress_control = ft.ProgressRing(value=0, width=20, height=20, stroke_width=3, color=ft.Colors.BLUE)
 
         self.trailing_control = ft.AnimatedSwitcher(
-            content=initial_trailing_content,
+            content=ft.Container(width=80),
             transition=ft.AnimatedSwitcherTransition.SCALE
         )
 
+        self.title_text = ft.Text("", weight="bold", max_lines=1, overflow=ft.TextOverflow.ELLIPSIS)
+        self.description_text = ft.Text("", max_lines=3, overflow=ft.TextOverflow.ELLIPSIS)
+
         text_content = ft.Column(
-            [
-                ft.Text(self.title, weight="bold", max_lines=1, overflow=ft.TextOverflow.ELLIPSIS),
-                ft.Text(self.description, max_lines=3, overflow=ft.TextOverflow.ELLIPSIS)
-            ],
+            [self.title_text, self.description_text],
             spacing=4,
             alignment=ft.MainAxisAlignment.CENTER,
             expand=True
@@ -94,8 +62,8 @@ class EpisodeControl(ft.Container):
             width=80
         )
 
-        leading_image = ft.Image(
-            src=self.image_src,
+        self.leading_image = ft.Image(
+            src="",
             width=80,
             height=80,
             fit=ft.ImageFit.COVER,
@@ -104,7 +72,7 @@ class EpisodeControl(ft.Container):
 
         main_row = ft.Row(
             [
-                leading_image,
+                self.leading_image,
                 text_content,
                 trailing_content_container
             ],
@@ -113,121 +81,174 @@ class EpisodeControl(ft.Container):
         )
 
         self.content = main_row
-        self.height = 110
+        self.height = ROW_HEIGHT
         self.border_radius = 5
+        self.border = ft.border.only(bottom=ft.BorderSide(1, ft.Colors.with_opacity(0.5, ft.Colors.GREY)))
         self.ink = True
         self.on_click = self.handle_click
         self.padding = ft.padding.symmetric(horizontal=16)
 
+    def bind(self, episode, description=None):
+        """Shows `episode`; pass its `description` when it was already loaded (see load_descriptions)."""
+        if self.episode is episode:
+            return
+        if self.episode is not None and self.episode.view is self:
+            self.episode.view = None
+        self.episode = episode
+        episode.view = self
+
+        self.title_text.value = episode.title
+        self.description_text.value = episode.description if description is None else description
+        self.leading_image.src = self.handlers.artwork_src(episode.image_src)
+        self.trailing_control.content = self._trailing_for(episode)
+
+    def refresh_artwork(self, url):
+        if self.episode is not None and self.episode.image_src == url:
+            self.leading_image.src = self.handlers.artwork_src(url)
+            self.handlers.schedule_render(self.leading_image)
+
+    def unbind(self):
+        if self.episode is not None and self.episode.view is self:
+            self.episode.view = None
+        self.episode = None
+
+    def _trailing_for(self, episode):
+        status = episode.status
+        if status == STATUS_DOWNLOADED:
+            content = ft.Icon(name=ft.Icons.FOLDER_ZIP, color=ft.Colors.YELLOW)
+        elif status == STATUS_QUEUED:
+            content = ft.Icon(name=ft.Icons.SCHEDULE, color=ft.Colors.GREY)
+        elif status == STATUS_DOWNLOADING:
+            self.progress_control.value = episode.progress
+            if episode.show_cancel:
+                content = ft.Row(
+                    [self.progress_control, self.cancel_button],
+                    spacing=10,
+                    vertical_alignment=ft.CrossAxisAlignment.CENTER,
+                    alignment=ft.MainAxisAlignment.CENTER
+                )
+            else:
+                content = self.progress_control
+        elif status == STATUS_DONE:
+            content = ft.Icon(name=ft.Icons.CHECK_CIRCLE, color=ft.Colors.GREEN)
+        elif status == STATUS_RETRYING:
+            content = ft.Icon(name=ft.Icons.REPLAY, color=ft.Colors.ORANGE, tooltip=f"Will retry: {episode.error}")
+        elif status == STATUS_FAILED:
+            content = ft.Row([ft.Icon(name=ft.Icons.ERROR, color=ft.Colors.RED, tooltip=episode.error), self.download_button], spacing=5, vertical_alignment=ft.CrossAxisAlignment.CENTER, alignment=ft.MainAxisAlignment.CENTER)
+        else:
+            content = ft.Row([self.download_button], spacing=5, vertical_alignment=ft.CrossAxisAlignment.CENTER, alignment=ft.MainAxisAlignment.CENTER)
+        return ft.Container(content=content, width=80, alignment=ft.alignment.center)
+
+    def on_status_changed(self, episode):
+        if episode is not self.episode:
+            return
+        self.trailing_control.content = self._trailing_for(episode)
+        self.handlers.schedule_render(self.trailing_control)
+
+    def on_progress_changed(self, episode):
+        if episode is not self.episode:
+            return
+        self.progress_control.value = episode.progress
+        self.handlers.schedule_render(self.progress_control)
+
     def handle_click(self, e):
-        logic.update_sidebar(self)
+        if self.episode is not None:
+            self.handlers.update_sidebar(self.episode, self.description_text.value)
 
     def individual_download_task_prevent_sidebar(self, e):
         e.cancel = True
-        self.individual_download_task(e)
-
-    def _set_trailing(self, control):
-        self.trailing_control.content = control
-        try:
-            self.update()
-        except Exception:
-            pass
-
-    def _toggle_global_controls(self, state: bool):
-        self.global_controls["btn_fetch_feed"].disabled = state
-        self.global_controls["btn_start_download"].disabled = state
-        self.global_controls["dd_sort"].disabled = state
-        try:
-            self.page.update()
-        except Exception:
-            pass
-
-    def individual_download_task(self, e):
-        self.page.run_thread(self.run_individual_download)
-
-    def run_individual_download(self):
-        self._toggle_global_controls(True)
-        try:
-            self.download_logic(HEADERS, self.individual_cancel_event, show_cancel_button=True)
-        finally:
-            self._toggle_global_controls(False)
-
-    def run_batch_download(self, headers):
-        if not os.path.exists(self.full_file_path):
-            self.download_logic(headers, self.global_cancel_event, show_cancel_button=False)
-
-    def download_logic(self, headers, cancel_event: threading.Event, show_cancel_button: bool):
-        cancel_event.clear()
-        progress_control = ft.ProgressRing(value=0, width=20, height=20, stroke_width=3, color=ft.Colors.BLUE)
-
-        if show_cancel_button:
-            cancel_btn = ft.IconButton(
-                icon=ft.Icons.CANCEL,
-                icon_color=ft.Colors.RED,
-                on_click=lambda _: cancel_event.set(),
-                tooltip="Cancel download"
-            )
-            progress_row = ft.Row(
-                [progress_control, cancel_btn],
-                spacing=10,
-                vertical_alignment=ft.CrossAxisAlignment.CENTER,
-                alignment=ft.MainAxisAlignment.CENTER
-            )
-            self._set_trailing(ft.Container(content=progress_row, width=80, alignment=ft.alignment.center))
-        else:
-            self._set_trailing(ft.Container(content=progress_control, alignment=ft.alignment.center, width=80))
+        if self.episode is not None:
+            self.handlers.individual_download_clicked(self.episode)
 
-        if os.path.exists(self.full_file_path):
-            self._set_trailing(ft.Container(content=ft.Icon(name=ft.Icons.FOLDER_ZIP, color=ft.Colors.YELLOW), width=80, alignment=ft.alignment.center))
-            return
+    def cancel_clicked(self, e):
+        if self.episode is not None:
+            self.episode.cancel_event.set()
 
-        try:
-            with requests.get(self.download_url, headers=headers, stream=True, timeout=30) as r:
-                r.raise_for_status()
-                total_size = int(r.headers.get('content-length', 0))
-                downloaded_size = 0
-
-                os.makedirs(self.download_dir, exist_ok=True)
-
-                with open(self.full_file_path, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        if cancel_event.is_set():
-                            break
-                        f.write(chunk)
-
-                        if total_size > 0:
-                            downloaded_size += len(chunk)
-                            new_value = downloaded_size / total_size
-                            progress_control.value = min(new_value, 1.0)
-                            try:
-                                self.update()
-                            except Exception:
-                                break
-
-            if cancel_event.is_set():
-                if os.path.exists(self.full_file_path):
-                    try:
-                        os.remove(self.full_file_path)
-                    except OSError as e:
-                        print(f"Error removing cancelled file {self.full_file_path}: {e}")
-                cancel_content = ft.Row([self.download_button], spacing=5, vertical_alignment=ft.CrossAxisAlignment.CENTER, alignment=ft.MainAxisAlignment.CENTER)
-                self._set_trailing(ft.Container(content=cancel_content, width=80, alignment=ft.alignment.center))
-            elif (total_size > 0 and downloaded_size >= total_size) or (total_size == 0 and downloaded_size > 0 and os.path.exists(self.full_file_path)):
-                 self._set_trailing(ft.Container(content=ft.Icon(name=ft.Icons.CHECK_CIRCLE, color=ft.Colors.GREEN), width=80, alignment=ft.alignment.center))
-            else:
-                 if os.path.exists(self.full_file_path):
-                     try:
-                        os.remove(self.full_file_path)
-                     except OSError as e:
-                         print(f"Error removing incomplete file {self.full_file_path}: {e}")
-                 raise IOError("Download incomplete or failed without explicit cancel.")
-
-        except Exception as e:
-            print(f"Error downloading {self.filename}: {e}")
-            if os.path.exists(self.full_file_path):
-                 try:
-                    os.remove(self.full_file_path)
-                 except OSError as err:
-                     print(f"Error removing failed download file {self.full_file_path}: {err}")
-            error_content = ft.Row([ft.Icon(name=ft.Icons.ERROR, color=ft.Colors.RED), self.download_button], spacing=5, vertical_alignment=ft.CrossAxisAlignment.CENTER, alignment=ft.MainAxisAlignment.CENTER)
-            self._set_trailing(ft.Container(content=error_content, width=80, alignment=ft.alignment.center))
\ No newline at end of file
+
+class VirtualEpisodeList:
+    """
+    Drives a ListView so that only the rows in (and just around) the viewport exist as controls.
+    Spacers above and below the window keep the scroll extent equal to the full list,
+    and a small pool of EpisodeRow controls is rebound to new episodes as the user scrolls.
+    `handlers` is passed on to the rows (see EpisodeRow).
+    """
+    def __init__(self, list_view: ft.ListView, handlers, row_height=ROW_HEIGHT, buffer_rows=BUFFER_ROWS):
+        self.list_view = list_view
+        self.handlers = handlers
+        self.row_height = row_height
+        self.buffer_rows = buffer_rows
+        self.viewport_height = DEFAULT_VIEWPORT_HEIGHT
+
+        self.items = []
+        self.rows = []
+        self.first_index = 0
+
+        self.top_spacer = ft.Container(height=0)
+        self.bottom_spacer = ft.Container(height=0)
+
+        list_view.on_scroll = self._on_scroll
+        list_view.on_scroll_interval = 50
+
+    def _window_size(self):
+        return math.ceil(self.viewport_height / self.row_height) + 2 * self.buffer_rows
+
+    def set_items(self, items, reset_scroll=False):
+        """Shows `items` (a list of Episode). Keeps the scroll position unless reset_scroll is set."""
+        self.items = items
+        if reset_scroll:
+            self.first_index = 0
+            try:
+                self.list_view.scroll_to(offset=0, duration=0)
+            except Exception:
+                pass
+        self._render_window(self.first_index)
+
+    def refresh(self):
+        """Rebinds the visible rows, e.g. after the items were reordered in place."""
+        for row in self.rows:
+            row.unbind()
+        self._render_window(self.first_index)
+
+    def refresh_artwork(self, url):
+        """Points the visible rows showing `url` at its freshly cached thumbnail."""
+        for row in self.rows:
+            row.refresh_artwork(url)
+
+    def clear(self):
+        for row in self.rows:
+            row.unbind()
+        self.items = []
+        self.first_index = 0
+
+    def _render_window(self, first_index):
+        window = self._window_size()
+        first_index = max(0, min(first_index, max(0, len(self.items) - window)))
+        visible = self.items[first_index:first_index + window]
+
+        while len(self.rows) < len(visible):
+            self.rows.append(EpisodeRow(self.handlers))
+        # Only rows that change episode need a description, read together for the whole window.
+        rebound = [(row, episode) for row, episode in zip(self.rows, visible) if row.episode is not episode]
+        descriptions = load_descriptions([episode for _, episode in rebound])
+        for (row, episode), description in zip(rebound, descriptions):
+            row.bind(episode, description)
+        for row in self.rows[len(visible):]:
+            row.unbind()
+
+        self.first_index = first_index
+        self.top_spacer.height = first_index * self.row_height
+        self.bottom_spacer.height = max(0, len(self.items) - first_index - len(visible)) * self.row_height
+        self.list_view.controls = [self.top_spacer, *self.rows[:len(visible)], self.bottom_spacer]
+
+    def _on_scroll(self, e):
+        if e.viewport_dimension:
+            self.viewport_height = e.viewport_dimension
+        if not self.items:
+            return
+        first_index = max(0, int(e.pixels // self.row_height) - self.buffer_rows)
+        rendered = len(self.list_view.controls) - 2
+        # Re-render once the viewport drifts half a buffer away, or if the window no longer covers it.
+        if abs(first_index - self.first_index) < self.buffer_rows // 2 and rendered >= min(self._window_size(), len(self.items)):
+            return
+        self._render_window(first_index)
+        self.list_view.update()
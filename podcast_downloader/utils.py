@@ -1,9 +1,45 @@
+import email.utils
+import math
+import os
 import re
+import sys
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/5.37.36 (KHTML, like Gecko) Chrome/100.0.0.0 Safari/5.37.36"
 }
 
+def data_dir():
+    """
+    The per-user folder holding the catalog and the artwork cache, the same whichever directory
+    the app or the CLI is started from. The PODCAST_DOWNLOADER_HOME environment variable overrides it.
+    """
+    override = os.environ.get("PODCAST_DOWNLOADER_HOME")
+    if override:
+        return os.path.abspath(os.path.expanduser(override))
+    if sys.platform == "win32":
+        return os.path.join(os.environ.get("APPDATA") or os.path.expanduser("~"), "PodcastDownloader")
+    if sys.platform == "darwin":
+        return os.path.expanduser("~/Library/Application Support/PodcastDownloader")
+    return os.path.join(os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share"), "podcast-downloader")
+
+def adopt_legacy_path(path, legacy_name):
+    """
+    Moves a file or folder that older versions kept in the working directory (`legacy_name`) to
+    `path`, unless something is there already. Returns True if it was moved.
+    """
+    legacy = os.path.abspath(legacy_name)
+    if legacy == os.path.abspath(path) or os.path.exists(path) or not os.path.exists(legacy):
+        return False
+    import shutil
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.move(legacy, path)
+    except OSError as e:
+        print(f"Could not move {legacy} to {path}: {e}")
+        return False
+    print(f"Moved {legacy} to {path}")
+    return True
+
 def extract_episode_number(title_str):
     """
     Extracts the episode number from a title string.
@@ -20,4 +56,35 @@ def extract_episode_number(title_str):
             return int(match.group(1))
         if match.group(3):
             return int(match.group(3))
-    return 0
\ No newline at end of file
+    return 0
+
+def parse_pub_date(value):
+    """An RFC 822 pubDate ("Mon, 01 Jan 2024 10:00:00 +0000") as a Unix timestamp, or None if it cannot be read."""
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+def parse_duration(value):
+    """
+    An itunes:duration as whole seconds: "HH:MM:SS", "MM:SS" or plain seconds ("3723", "3723.5").
+    Returns None for an empty or unreadable value.
+    """
+    if not value:
+        return None
+    parts = value.strip().split(":")
+    if len(parts) > 3:
+        return None
+    seconds = 0.0
+    try:
+        for part in parts:
+            number = float(part)
+            # float() also accepts "nan", "inf" and "1e999", which int() cannot convert.
+            if number < 0 or not math.isfinite(number):
+                return None
+            seconds = seconds * 60 + number
+        return int(seconds)
+    except (ValueError, OverflowError):
+        return None
\ No newline at end of file